@@ -0,0 +1,100 @@
+"""
+Analytics Response Cache
+Short-TTL per-process cache for dashboard aggregates.
+
+Entries are dropped as soon as a session in this process commits a change
+to one of the watched tables (ORM flushes as well as bulk UPDATE/DELETE).
+Writes made by other worker processes are bounded by the TTL.
+"""
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Iterable, Optional
+import os
+import threading
+import time
+
+import models
+
+DASHBOARD_CACHE_TTL_SECONDS = int(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "30"))
+
+DIRTY_TABLES_KEY = "analytics_cache_dirty_tables"
+
+
+class ResponseCache:
+    """TTL cache of computed responses, cleared when watched tables change"""
+
+    def __init__(self, ttl_seconds: int, tables: Iterable[str]):
+        self.ttl_seconds = ttl_seconds
+        self.tables = frozenset(tables)
+        self._entries = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Any, compute: Callable[[], Any]) -> Any:
+        if self.ttl_seconds <= 0:
+            return compute()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+            generation = self._generation
+        value = compute()
+        with self._lock:
+            # Skip storing a value computed while a write was being committed
+            if generation == self._generation:
+                now = time.monotonic()
+                self._entries = {k: e for k, e in self._entries.items() if e[0] > now}
+                self._entries[key] = (now + self.ttl_seconds, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+
+dashboard_cache = ResponseCache(
+    DASHBOARD_CACHE_TTL_SECONDS,
+    tables=[
+        models.Enquiry.__tablename__,
+        models.Order.__tablename__,
+        models.Complaint.__tablename__
+    ]
+)
+
+CACHES = [dashboard_cache]
+
+
+def _mark_dirty(session: Session, table_name: Optional[str]) -> None:
+    if table_name:
+        session.info.setdefault(DIRTY_TABLES_KEY, set()).add(table_name)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_tables(session: Session, flush_context) -> None:
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        _mark_dirty(session, getattr(instance, "__tablename__", None))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_writes(orm_execute_state) -> None:
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            _mark_dirty(orm_execute_state.session, mapper.local_table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    tables = session.info.pop(DIRTY_TABLES_KEY, None)
+    if not tables:
+        return
+    for cache in CACHES:
+        if cache.tables & tables:
+            cache.clear()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(DIRTY_TABLES_KEY, None)
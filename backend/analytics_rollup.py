@@ -0,0 +1,539 @@
+"""
+Daily Analytics Rollups
+Maintains daily_sales_facts, daily_service_facts and daily_attendance_facts,
+one row per (date, employee), so range analytics read a few hundred
+pre-aggregated rows instead of scanning enquiries, complaints, feedback and
+attendance on every request.
+
+Facts are rebuilt per day from the source tables:
+- Every flush that creates, deletes or changes a source row notes the fact
+  day(s) it affects, however old the row is (an enquiry converted months
+  after it was created, a job reassigned, ...). Bulk updates that bypass
+  the ORM call mark_days_dirty() themselves. The days are written to
+  fact_dirty_days once the transaction commits, in a short transaction of
+  their own, so business writes never wait on the shared queue rows.
+- Fact readers rebuild up to FACT_CHUNK_DAYS queued days of their range
+  before reading, and the scheduler leader drains the queue every
+  FACT_REFRESH_MINUTES so reads rarely have work to do.
+- An empty fact store is backfilled in the background on app startup.
+- `python -m analytics_rollup backfill [--start YYYY-MM-DD] [--end YYYY-MM-DD]`
+  rebuilds a range directly, e.g. after data was changed outside the app.
+"""
+
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event, func, case, delete, insert, inspect, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+import argparse
+import logging
+import os
+
+from models import (
+    Attendance, Complaint, Enquiry, Feedback, Order, ShopVisit,
+    DailyAttendanceFact, DailySalesFact, DailyServiceFact, FactDirtyDay
+)
+
+logger = logging.getLogger(__name__)
+
+FACT_REFRESH_MINUTES = int(os.getenv("FACT_REFRESH_MINUTES", "15"))
+# Days rebuilt per transaction when draining the dirty-day queue, and at
+# most per analytics read
+FACT_CHUNK_DAYS = 31
+# Session.info key holding the days marked in the current transaction
+DIRTY_DAYS_KEY = "analytics_rollup_dirty_days"
+
+FACT_MODELS = (DailySalesFact, DailyServiceFact, DailyAttendanceFact)
+
+# Source model -> (attribute that dates its fact rows, other attributes the facts read)
+FACT_SOURCES = {
+    Enquiry: ("created_at", ("assigned_to", "status", "last_follow_up")),
+    Order: ("created_at", ("enquiry_id", "status", "total_amount")),
+    ShopVisit: ("visit_date", ("salesman_id",)),
+    Complaint: ("created_at", ("assigned_to", "status", "completed_at",
+                               "sla_warning_sent", "sla_breach_sent")),
+    Feedback: ("created_at", ("service_request_id", "rating", "is_negative")),
+    Attendance: ("attendance_date", ("employee_id", "status")),
+}
+
+
+def seconds_between(db: Session, start_col, end_col):
+    """SQL expression for (end_col - start_col) in seconds on the bound dialect"""
+    if db.bind.dialect.name == "sqlite":
+        return (func.julianday(end_col) - func.julianday(start_col)) * 86400
+    return func.extract("epoch", end_col - start_col)
+
+
+def _day(value) -> date:
+    """func.date() returns a string on SQLite and a date on PostgreSQL"""
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _in_days(column, start: date, end: date):
+    """Index-friendly [start 00:00, end + 1 day) range on a DateTime column"""
+    return (
+        (column >= datetime.combine(start, time.min)) &
+        (column < datetime.combine(end + timedelta(days=1), time.min))
+    )
+
+
+def _collect(facts: Dict[Tuple[date, int], dict], rows, fields) -> None:
+    """Merge grouped (day, employee_id, *values) rows into facts"""
+    for row in rows:
+        day, employee_id = _day(row[0]), row[1]
+        if employee_id is None:
+            continue
+        fact = facts.setdefault((day, employee_id), {})
+        for field, value in zip(fields, row[2:]):
+            fact[field] = fact.get(field, 0) + (value or 0)
+
+
+def _sales_facts(db: Session, start: date, end: date) -> Dict:
+    facts = {}
+    day = func.date(Enquiry.created_at)
+    is_converted = Enquiry.status == "CONVERTED"
+    closing_seconds = seconds_between(
+        db, Enquiry.created_at, func.coalesce(Enquiry.last_follow_up, Enquiry.created_at)
+    )
+    _collect(facts, db.query(
+        day, Enquiry.assigned_to,
+        func.count(Enquiry.id),
+        func.sum(case((is_converted, 1), else_=0)),
+        func.sum(case((Enquiry.status == "LOST", 1), else_=0)),
+        func.sum(case((is_converted, closing_seconds), else_=0))
+    ).filter(
+        _in_days(Enquiry.created_at, start, end)
+    ).group_by(day, Enquiry.assigned_to).all(),
+        ("enquiries_assigned", "enquiries_converted", "enquiries_lost", "closing_seconds"))
+
+    day = func.date(Order.created_at)
+    _collect(facts, db.query(
+        day, Enquiry.assigned_to, func.sum(Order.total_amount)
+    ).join(
+        Enquiry, Order.enquiry_id == Enquiry.id
+    ).filter(
+        Order.status == "APPROVED",
+        _in_days(Order.created_at, start, end)
+    ).group_by(day, Enquiry.assigned_to).all(), ("approved_revenue",))
+
+    day = func.date(ShopVisit.visit_date)
+    _collect(facts, db.query(
+        day, ShopVisit.salesman_id, func.count(ShopVisit.id)
+    ).filter(
+        _in_days(ShopVisit.visit_date, start, end)
+    ).group_by(day, ShopVisit.salesman_id).all(), ("shop_visits",))
+    return facts
+
+
+def _service_facts(db: Session, start: date, end: date) -> Dict:
+    facts = {}
+    day = func.date(Complaint.created_at)
+    is_completed = Complaint.status == "COMPLETED"
+    is_breached = Complaint.sla_breach_sent == True
+    is_resolved = is_completed & Complaint.completed_at.isnot(None)
+    _collect(facts, db.query(
+        day, Complaint.assigned_to,
+        func.count(Complaint.id),
+        func.sum(case((is_completed, 1), else_=0)),
+        func.sum(case((Complaint.status.in_(["ASSIGNED", "ON_THE_WAY", "IN_PROGRESS"]), 1), else_=0)),
+        func.sum(case((Complaint.status == "ON_HOLD", 1), else_=0)),
+        func.sum(case(((Complaint.sla_warning_sent == True) & ~is_breached, 1), else_=0)),
+        func.sum(case((is_breached, 1), else_=0)),
+        func.sum(case((is_resolved, 1), else_=0)),
+        func.sum(case((is_resolved, seconds_between(db, Complaint.created_at, Complaint.completed_at)), else_=0))
+    ).filter(
+        _in_days(Complaint.created_at, start, end)
+    ).group_by(day, Complaint.assigned_to).all(),
+        ("jobs_assigned", "jobs_completed", "jobs_in_progress", "jobs_on_hold",
+         "sla_warnings", "sla_breaches", "resolved_jobs", "resolution_seconds"))
+
+    day = func.date(Feedback.created_at)
+    _collect(facts, db.query(
+        day, Complaint.assigned_to,
+        func.count(Feedback.id),
+        func.sum(case((Feedback.is_negative == True, 1), else_=0)),
+        *[func.sum(case((Feedback.rating == stars, 1), else_=0)) for stars in range(1, 6)]
+    ).join(
+        Complaint, Feedback.service_request_id == Complaint.id
+    ).filter(
+        _in_days(Feedback.created_at, start, end)
+    ).group_by(day, Complaint.assigned_to).all(),
+        ("feedback_count", "negative_feedbacks",
+         "rating_1", "rating_2", "rating_3", "rating_4", "rating_5"))
+    return facts
+
+
+def _attendance_facts(db: Session, start: date, end: date) -> Dict:
+    facts = {}
+    _collect(facts, db.query(
+        Attendance.attendance_date, Attendance.employee_id,
+        func.count(Attendance.id),
+        func.sum(case((Attendance.status == "Present", 1), else_=0)),
+        func.sum(case((Attendance.status == "Late", 1), else_=0))
+    ).filter(
+        Attendance.attendance_date >= start,
+        Attendance.attendance_date <= end
+    ).group_by(Attendance.attendance_date, Attendance.employee_id).all(),
+        ("records", "present", "late"))
+    return facts
+
+
+def refresh_facts(db: Session, start: date, end: date, commit: bool = True) -> int:
+    """
+    Rebuild all fact rows dated start..end (inclusive) from the source
+    tables in one transaction. Returns the number of fact rows written.
+    """
+    refreshed_at = datetime.utcnow()
+    written = 0
+    # Rebuilt from scratch, so days queued in the range are done
+    dirty = FactDirtyDay.__table__
+    db.execute(delete(dirty).where(dirty.c.day >= start, dirty.c.day <= end))
+    for model, build in (
+        (DailySalesFact, _sales_facts),
+        (DailyServiceFact, _service_facts),
+        (DailyAttendanceFact, _attendance_facts)
+    ):
+        facts = build(db, start, end)
+        db.query(model).filter(
+            model.date >= start, model.date <= end
+        ).delete(synchronize_session=False)
+        fields = [
+            column.key for column in model.__table__.columns
+            if column.key not in ("date", "employee_id", "refreshed_at")
+        ]
+        rows = [
+            {
+                "date": day, "employee_id": employee_id, "refreshed_at": refreshed_at,
+                **{field: values.get(field, 0) for field in fields}
+            }
+            for (day, employee_id), values in facts.items()
+        ]
+        if rows:
+            db.execute(insert(model), rows)
+        written += len(rows)
+    if commit:
+        db.commit()
+    return written
+
+
+def history_start(db: Session) -> Optional[date]:
+    """Earliest day that has source rows for any fact table"""
+    candidates = [
+        _day(db.query(func.min(func.date(Enquiry.created_at))).scalar()),
+        _day(db.query(func.min(func.date(Complaint.created_at))).scalar()),
+        _day(db.query(func.min(func.date(ShopVisit.visit_date))).scalar()),
+        db.query(func.min(Attendance.attendance_date)).scalar()
+    ]
+    candidates = [day for day in candidates if day]
+    return min(candidates) if candidates else None
+
+
+def backfill(db: Session, start: Optional[date] = None, end: Optional[date] = None,
+             chunk_days: int = 31) -> int:
+    """Rebuild facts for start..end (default: all history) in chunks of days"""
+    start = start or history_start(db)
+    end = end or date.today()
+    if start is None:
+        return 0
+    written = 0
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end)
+        written += refresh_facts(db, chunk_start, chunk_end)
+        logger.info(f"Rolled up facts for {chunk_start} → {chunk_end}")
+        chunk_start = chunk_end + timedelta(days=1)
+    return written
+
+
+# ============================================
+# DIRTY-DAY QUEUE
+# ============================================
+
+def mark_days_dirty(db: Session, days: Iterable) -> None:
+    """Queue fact days (dates or datetimes) for rebuilding once db's transaction commits"""
+    days = {_day(day) for day in days if day}
+    if days:
+        db.info.setdefault(DIRTY_DAYS_KEY, set()).update(days)
+
+
+def _write_dirty_days(bind, days: Iterable[date]) -> None:
+    """Insert days into fact_dirty_days, 1000 per statement, in a transaction of their own"""
+    days = sorted(days)
+    upsert = pg_insert if bind.dialect.name == "postgresql" else sqlite_insert
+    now = datetime.utcnow()
+    with bind.begin() as connection:
+        for offset in range(0, len(days), 1000):
+            connection.execute(
+                upsert(FactDirtyDay.__table__)
+                .values([{"day": day, "marked_at": now} for day in days[offset:offset + 1000]])
+                .on_conflict_do_nothing()
+            )
+
+
+def _attribute_days(instance, attribute: str) -> set:
+    """Old and new values of a date attribute (today for a row not yet defaulted)"""
+    values = [value for value in inspect(instance).attrs[attribute].history.sum() if value is not None]
+    if not values:
+        values = [getattr(instance, attribute) or datetime.utcnow()]
+    return {_day(value) for value in values}
+
+
+def _changed_days(session: Session, instance, created_or_deleted: bool) -> set:
+    day_attribute, attributes = FACT_SOURCES[type(instance)]
+    state = inspect(instance)
+    if not created_or_deleted and not any(
+        state.attrs[attribute].history.has_changes() for attribute in (day_attribute, *attributes)
+    ):
+        return set()
+    days = _attribute_days(instance, day_attribute)
+
+    # Revenue and feedback are credited to the enquiry's / job's assignee
+    if isinstance(instance, (Enquiry, Complaint)) and instance.id is not None and (
+        created_or_deleted or state.attrs.assigned_to.history.has_changes()
+    ):
+        if isinstance(instance, Enquiry):
+            dependents = session.query(Order.created_at).filter(
+                Order.enquiry_id == instance.id, Order.status == "APPROVED"
+            )
+        else:
+            dependents = session.query(Feedback.created_at).filter(
+                Feedback.service_request_id == instance.id
+            )
+        days.update(_day(created_at) for (created_at,) in dependents if created_at)
+    return days
+
+
+@event.listens_for(Session, "before_flush")
+def _queue_flushed_days(session: Session, flush_context, instances) -> None:
+    days = set()
+    for changed, created_or_deleted in (
+        (session.new, True), (session.dirty, False), (session.deleted, True)
+    ):
+        for instance in changed:
+            if type(instance) in FACT_SOURCES:
+                days |= _changed_days(session, instance, created_or_deleted)
+    mark_days_dirty(session, days)
+
+
+@event.listens_for(Session, "after_commit")
+def _write_committed_days(session: Session) -> None:
+    days = session.info.pop(DIRTY_DAYS_KEY, None)
+    if not days:
+        return
+    try:
+        _write_dirty_days(session.get_bind(), days)
+    except Exception as e:
+        # The source change is committed; its facts catch up on the next backfill
+        logger.error(f"❌ Could not queue {len(days)} analytics fact days: {str(e)}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_days(session: Session) -> None:
+    session.info.pop(DIRTY_DAYS_KEY, None)
+
+
+def _claim_dirty_days(db: Session, start: Optional[date], end: Optional[date],
+                      limit: int) -> List[date]:
+    """
+    Remove up to limit queued days from the queue and return them. Concurrent
+    claimers get disjoint days; a day re-marked while it is being rebuilt is
+    queued again once the claim commits.
+    """
+    table = FactDirtyDay.__table__
+    # Newest first: recent days are what reads ask for
+    query = select(table.c.day).order_by(table.c.day.desc()).limit(limit)
+    if start:
+        query = query.where(table.c.day >= start)
+    if end:
+        query = query.where(table.c.day <= end)
+    days = db.execute(query).scalars().all()
+    if not days:
+        return []
+    claimed = db.execute(
+        delete(table).where(table.c.day.in_(days)).returning(table.c.day)
+    ).scalars().all()
+    return sorted(_day(day) for day in claimed)
+
+
+def _consecutive_runs(days: List[date]) -> List[Tuple[date, date]]:
+    runs = []
+    for day in days:
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
+
+
+def refresh_dirty_facts(db: Session, start: Optional[date] = None,
+                        end: Optional[date] = None, chunk_days: int = FACT_CHUNK_DAYS,
+                        max_chunks: Optional[int] = None) -> int:
+    """
+    Rebuild the queued days (only those in start..end when given), up to
+    chunk_days per transaction and max_chunks transactions (default: until
+    the queue is empty). Returns the number of fact rows written.
+    """
+    written = 0
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        try:
+            days = _claim_dirty_days(db, start, end, chunk_days)
+            for run_start, run_end in _consecutive_runs(days):
+                written += refresh_facts(db, run_start, run_end, commit=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        if not days:
+            break
+        chunks += 1
+    return written
+
+
+def queue_history(db: Session) -> int:
+    """Queue every day from the first source record to today; returns the day count"""
+    start = history_start(db)
+    if start is None:
+        return 0
+    days = [start + timedelta(days=offset) for offset in range((date.today() - start).days + 1)]
+    _write_dirty_days(db.get_bind(), days)
+    return len(days)
+
+
+def refresh_pending_facts(db: Session) -> int:
+    """Scheduler entry point: drain the queue, after queuing all history on an empty store"""
+    if not any(db.query(model.date).first() for model in FACT_MODELS):
+        queue_history(db)
+    return refresh_dirty_facts(db)
+
+
+def backfill_on_startup() -> None:
+    """Fill an empty fact store when the app starts (run in a background thread)"""
+    from database import SessionLocal
+    db = SessionLocal()
+    try:
+        if any(db.query(model.date).first() for model in FACT_MODELS):
+            return
+        written = refresh_pending_facts(db)
+        logger.info(f"✅ Analytics facts backfilled: {written} rows")
+    except Exception as e:
+        logger.error(f"❌ Analytics fact backfill failed: {str(e)}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def _refresh_before_read(db: Session, start: Optional[date], end: Optional[date]) -> None:
+    """
+    Rebuild queued days a reader is about to sum, in a session of its own so
+    the caller's transaction is left alone. Capped at one chunk so a large
+    queue (e.g. the startup backfill) is left to the background drain instead
+    of stalling the request; on failure the reader serves the facts as they are.
+    """
+    try:
+        with Session(bind=db.get_bind()) as session:
+            refresh_dirty_facts(session, start, end, max_chunks=1)
+    except Exception as e:
+        logger.error(f"❌ Analytics fact refresh before read failed: {str(e)}")
+
+
+# ============================================
+# FACT READERS
+# ============================================
+
+def service_fact_totals(db: Session, start: date, end: date,
+                        engineer_id: Optional[int] = None):
+    """Subquery of service fact sums per engineer for start..end"""
+    _refresh_before_read(db, start, end)
+    columns = [
+        DailyServiceFact.jobs_assigned, DailyServiceFact.jobs_completed,
+        DailyServiceFact.jobs_in_progress, DailyServiceFact.jobs_on_hold,
+        DailyServiceFact.sla_warnings, DailyServiceFact.sla_breaches,
+        DailyServiceFact.resolved_jobs, DailyServiceFact.resolution_seconds,
+        DailyServiceFact.feedback_count, DailyServiceFact.negative_feedbacks,
+        DailyServiceFact.rating_1, DailyServiceFact.rating_2, DailyServiceFact.rating_3,
+        DailyServiceFact.rating_4, DailyServiceFact.rating_5
+    ]
+    query = db.query(
+        DailyServiceFact.employee_id,
+        *[func.sum(column).label(column.key) for column in columns]
+    ).filter(
+        DailyServiceFact.date >= start,
+        DailyServiceFact.date <= end
+    )
+    if engineer_id:
+        query = query.filter(DailyServiceFact.employee_id == engineer_id)
+    return query.group_by(DailyServiceFact.employee_id).subquery()
+
+
+def attendance_fact_totals(db: Session, start: date, end: date,
+                           employee_id: Optional[int] = None):
+    """Subquery of attendance fact sums per employee for start..end"""
+    _refresh_before_read(db, start, end)
+    query = db.query(
+        DailyAttendanceFact.employee_id,
+        func.sum(DailyAttendanceFact.records).label("records"),
+        func.sum(DailyAttendanceFact.present).label("present"),
+        func.sum(DailyAttendanceFact.late).label("late")
+    ).filter(
+        DailyAttendanceFact.date >= start,
+        DailyAttendanceFact.date <= end
+    )
+    if employee_id:
+        query = query.filter(DailyAttendanceFact.employee_id == employee_id)
+    return query.group_by(DailyAttendanceFact.employee_id).subquery()
+
+
+def sales_fact_totals(db: Session, start: Optional[date] = None,
+                      end: Optional[date] = None, salesman_id: Optional[int] = None):
+    """Subquery of sales fact sums per salesman (open-ended when dates are omitted)"""
+    _refresh_before_read(db, start, end)
+    query = db.query(
+        DailySalesFact.employee_id.label("salesman_id"),
+        func.sum(DailySalesFact.enquiries_assigned).label("assigned"),
+        func.sum(DailySalesFact.enquiries_converted).label("converted"),
+        func.sum(DailySalesFact.enquiries_lost).label("lost"),
+        func.sum(DailySalesFact.closing_seconds).label("closing_seconds"),
+        func.sum(DailySalesFact.approved_revenue).label("revenue")
+    )
+    if start:
+        query = query.filter(DailySalesFact.date >= start)
+    if end:
+        query = query.filter(DailySalesFact.date <= end)
+    if salesman_id:
+        query = query.filter(DailySalesFact.employee_id == salesman_id)
+    return query.group_by(DailySalesFact.employee_id).subquery()
+
+
+def run_cli():
+    parser = argparse.ArgumentParser(description="Daily analytics fact tables")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = subcommands.add_parser("backfill", help="Rebuild facts for a date range")
+    backfill_parser.add_argument("--start", type=date.fromisoformat, help="YYYY-MM-DD (default: first record)")
+    backfill_parser.add_argument("--end", type=date.fromisoformat, help="YYYY-MM-DD (default: today)")
+    subcommands.add_parser("refresh", help="Rebuild the queued dirty days")
+    args = parser.parse_args()
+
+    from database import SessionLocal, engine, Base
+    Base.metadata.create_all(
+        bind=engine, tables=[model.__table__ for model in (*FACT_MODELS, FactDirtyDay)]
+    )
+    db = SessionLocal()
+    try:
+        if args.command == "backfill":
+            written = backfill(db, args.start, args.end)
+        else:
+            written = refresh_pending_facts(db)
+        print(f"✅ Wrote {written} fact rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    run_cli()
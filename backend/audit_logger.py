@@ -3,11 +3,171 @@ Audit Trail Logger
 Logs all critical operations for compliance and tracking
 """
 
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
-from models import AuditLog
+from models import AccessCounter, AuditLog
 from datetime import datetime
+import atexit
 import json
-from typing import Any, Dict, Optional
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Buffered writer settings: rows are inserted every AUDIT_FLUSH_INTERVAL_MS
+# or as soon as AUDIT_BATCH_SIZE rows are waiting, whichever comes first
+AUDIT_FLUSH_INTERVAL_MS = int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "500"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+# Coalesced list VIEW counters are upserted into access_counters this often
+AUDIT_VIEW_FLUSH_SECONDS = int(os.getenv("AUDIT_VIEW_FLUSH_SECONDS", "60"))
+
+# Security-critical actions are written synchronously (strict mode)
+STRICT_AUDIT_ACTIONS = {"LOGIN", "FAILED_LOGIN", "LOGOUT"}
+
+
+class AuditWriter:
+    """
+    In-process audit queue drained by a background thread with multi-row
+    INSERTs in their own transactions, so request handlers never commit
+    for auditing. flush() drains the queue synchronously (app shutdown).
+    
+    Repeated list views are not queued as rows: they are counted in memory
+    per (user, module, hour) and upserted into access_counters every
+    view_flush_seconds.
+    """
+
+    def __init__(self, interval_ms: int, batch_size: int, max_queued: int,
+                 view_flush_seconds: int):
+        self.interval = interval_ms / 1000
+        self.batch_size = batch_size
+        self.view_flush_seconds = view_flush_seconds
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._views = {}
+        self._views_lock = threading.Lock()
+        self._views_flushed_at = time.monotonic()
+
+    def submit(self, bind, row: Dict[str, Any], model=AuditLog) -> None:
+        """Queue a row for the engine it belongs to; writes inline when the queue is full"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((bind, model, row))
+        except queue.Full:
+            logger.warning("Audit queue full, writing row synchronously")
+            self._write([(bind, model, row)])
+
+    def count_view(self, bind, user_id: int, username: str, module: str,
+                   ip_address: Optional[str] = None) -> None:
+        """Add one view to the in-memory counter of (user, module, current hour)"""
+        now = datetime.utcnow()
+        key = (bind, user_id, module, now.replace(minute=0, second=0, microsecond=0))
+        with self._views_lock:
+            counter = self._views.get(key)
+            if counter is None:
+                self._views[key] = {
+                    "username": username, "view_count": 1,
+                    "first_seen": now, "last_seen": now, "ip_address": ip_address
+                }
+            else:
+                counter["view_count"] += 1
+                counter["last_seen"] = now
+                counter["ip_address"] = ip_address or counter["ip_address"]
+        self._ensure_worker()
+
+    def flush(self) -> None:
+        """Stop the worker and write everything still queued"""
+        self._stopping.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=max(self.interval * 4, 5))
+        while True:
+            items = self._drain(block=False)
+            if not items:
+                break
+            self._write(items)
+        self._write_views()
+        self._stopping.clear()
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+
+    def _drain(self, block: bool) -> List:
+        items = []
+        deadline = time.monotonic() + self.interval
+        while len(items) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if block and timeout > 0:
+                    items.append(self._queue.get(timeout=timeout))
+                else:
+                    items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._write(self._drain(block=True))
+            if time.monotonic() - self._views_flushed_at >= self.view_flush_seconds:
+                self._write_views()
+
+    def _write(self, items: List) -> None:
+        batches = {}
+        for bind, model, row in items:
+            batches.setdefault((bind, model), []).append(row)
+        for (bind, model), rows in batches.items():
+            try:
+                with bind.begin() as conn:
+                    conn.execute(insert(model), rows)
+            except Exception as e:
+                logger.error(f"Failed to write {len(rows)} {model.__tablename__} rows: {e}")
+
+    def _write_views(self) -> None:
+        """Upsert the pending view counters, adding to rows already stored"""
+        with self._views_lock:
+            views, self._views = self._views, {}
+            self._views_flushed_at = time.monotonic()
+        by_bind = {}
+        for (bind, user_id, module, hour), counter in views.items():
+            by_bind.setdefault(bind, []).append(
+                {"user_id": user_id, "module": module, "hour": hour, **counter}
+            )
+        for bind, rows in by_bind.items():
+            upsert = pg_insert if bind.dialect.name == "postgresql" else sqlite_insert
+            statement = upsert(AccessCounter)
+            statement = statement.on_conflict_do_update(
+                index_elements=["user_id", "module", "hour"],
+                set_={
+                    "view_count": AccessCounter.view_count + statement.excluded.view_count,
+                    "last_seen": statement.excluded.last_seen,
+                    "ip_address": statement.excluded.ip_address
+                }
+            )
+            try:
+                with bind.begin() as conn:
+                    conn.execute(statement, rows)
+            except Exception as e:
+                logger.error(f"Failed to write {len(rows)} access counters: {e}")
+
+
+audit_writer = AuditWriter(
+    AUDIT_FLUSH_INTERVAL_MS, AUDIT_BATCH_SIZE, AUDIT_QUEUE_SIZE, AUDIT_VIEW_FLUSH_SECONDS
+)
+# Scripts and the standalone scheduler have no lifespan hook
+atexit.register(audit_writer.flush)
 
 
 def log_action(
@@ -19,11 +179,16 @@ def log_action(
     record_id: str,
     record_type: str,
     changes: Optional[Dict[str, Any]] = None,
-    ip_address: Optional[str] = None
+    ip_address: Optional[str] = None,
+    strict: Optional[bool] = None
 ):
     """
     Log an action to the audit trail
     
+    Rows are queued for the background audit writer and do not touch the
+    caller's transaction. Strict mode (default for STRICT_AUDIT_ACTIONS)
+    writes the row before returning and raises if that fails.
+    
     Args:
         db: Database session
         user_id: ID of the user performing the action
@@ -34,29 +199,30 @@ def log_action(
         record_type: Type of record
         changes: Dictionary of changes made (for UPDATE actions)
         ip_address: IP address of the user
+        strict: Write synchronously; None picks it from the action
     """
-    try:
-        audit_log = AuditLog(
-            user_id=user_id,
-            username=username,
-            action=action,
-            module=module,
-            record_id=str(record_id),
-            record_type=record_type,
-            changes=json.dumps(changes) if changes else None,
-            ip_address=ip_address,
-            timestamp=datetime.utcnow()
-        )
-        
-        db.add(audit_log)
-        db.commit()
-        
+    row = {
+        "user_id": user_id,
+        "username": username,
+        "action": action,
+        "module": module,
+        "record_id": str(record_id),
+        "record_type": record_type,
+        "changes": json.dumps(changes) if changes else None,
+        "ip_address": ip_address,
+        "timestamp": datetime.utcnow()
+    }
+    if strict is None:
+        strict = action in STRICT_AUDIT_ACTIONS
+    
+    if strict:
+        # Own transaction, so the record survives a rollback of the caller
+        with db.get_bind().begin() as conn:
+            conn.execute(insert(AuditLog), [row])
         return True
-        
-    except Exception as e:
-        print(f"Error logging audit action: {str(e)}")
-        db.rollback()
-        return False
+    
+    audit_writer.submit(db.get_bind(), row)
+    return True
 
 
 def log_login(db: Session, user_id: int, username: str, ip_address: str, success: bool = True):
@@ -134,6 +300,15 @@ def log_delete(db: Session, user_id: int, username: str, module: str,
     )
 
 
+def log_list_view(db: Session, user_id: int, username: str, module: str,
+                  ip_address: str = None):
+    """
+    Count a list/dashboard view; repeated views by the same user in the same
+    module and hour are coalesced into one access_counters row
+    """
+    audit_writer.count_view(db.get_bind(), user_id, username, module, ip_address)
+
+
 def log_view(db: Session, user_id: int, username: str, module: str,
              record_id: str, record_type: str, ip_address: str = None):
     """Log record view (for confidential data like MIF)"""
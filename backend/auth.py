@@ -4,12 +4,16 @@ from typing import Optional
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from collections import OrderedDict
 import models
 import schemas
 from database import get_db
 import bcrypt
 import os
+import threading
+import time
 
 # Security configuration - Use environment variables for production
 SECRET_KEY = os.getenv("SECRET_KEY", "yamini_infotech_secret_key_2025_change_in_production")
@@ -26,6 +30,82 @@ pwd_context = CryptContext(
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="api/auth/login", auto_error=False)
 
+# Principal cache configuration
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_MAX_SIZE = int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", "1024"))
+
+
+class PrincipalCache:
+    """
+    Per-process LRU + TTL cache of authenticated users, keyed by token subject.
+
+    Entries are detached column snapshots of ``models.User``; ``get`` merges the
+    snapshot into the caller's session with ``load=False`` so no SQL is issued.
+    Writes in ``routers/users.py`` call ``invalidate``; the TTL bounds staleness
+    for changes made by other worker processes.
+    """
+
+    def __init__(self, ttl_seconds: int, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, username: str) -> Optional[models.User]:
+        if self.ttl_seconds <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            expires_at, snapshot = entry
+            if expires_at < time.monotonic():
+                del self._entries[username]
+                return None
+            self._entries.move_to_end(username)
+        return db.merge(snapshot, load=False)
+
+    def put(self, user: models.User) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        snapshot = models.User(**{
+            attr.key: getattr(user, attr.key)
+            for attr in sa_inspect(models.User).column_attrs
+        })
+        make_transient_to_detached(snapshot)
+        with self._lock:
+            self._entries[user.username] = (time.monotonic() + self.ttl_seconds, snapshot)
+            self._entries.move_to_end(user.username)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: str) -> None:
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_TTL_SECONDS, PRINCIPAL_CACHE_MAX_SIZE)
+
+
+def invalidate_principal(username: str) -> None:
+    """Drop a cached principal after the user's row is updated or deactivated"""
+    principal_cache.invalidate(username)
+
+
+def load_principal(db: Session, username: str) -> Optional[models.User]:
+    """Resolve a token subject to a User, serving from the principal cache when possible"""
+    user = principal_cache.get(db, username)
+    if user is not None:
+        return user
+    user = db.query(models.User).filter(models.User.username == username).first()
+    if user is not None:
+        principal_cache.put(user)
+    return user
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify using bcrypt directly to avoid passlib backend detection issues on some platforms."""
     if isinstance(plain_password, str):
@@ -90,7 +170,7 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(models.User).filter(models.User.username == username).first()
+    user = load_principal(db, username)
     if user is None:
         raise credentials_exception
     
@@ -112,7 +192,7 @@ async def get_current_user_optional(
     except JWTError:
         return None
     
-    user = db.query(models.User).filter(models.User.username == username).first()
+    user = load_principal(db, username)
     return user
 
 # 🔒 SALESPERSON DISCIPLINE ENFORCEMENT
@@ -1,19 +1,21 @@
+from sqlalchemy import and_, func, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
+from collections import Counter
 from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
 import models
 import schemas
 from auth import get_password_hash
-import random
-import string
+import notification_stream
+import audit_logger
+from id_allocator import allocate_id, next_mif_id
+from stock_ledger import record_opening_stock
 
 def generate_id(prefix: str, db: Session, model, id_field: str) -> str:
-    """Generate unique ID with prefix"""
-    while True:
-        random_num = ''.join(random.choices(string.digits, k=6))
-        new_id = f"{prefix}{random_num}"
-        existing = db.query(model).filter(getattr(model, id_field) == new_id).first()
-        if not existing:
-            return new_id
+    """Generate unique ID with prefix (sequence-backed, see id_allocator)"""
+    return allocate_id(db, prefix, getattr(model, id_field))
 
 # User CRUD
 def create_user(db: Session, user: schemas.UserCreate):
@@ -162,7 +164,7 @@ def get_bookings(db: Session, skip: int = 0, limit: int = 100):
 
 # MIF CRUD (with access logging)
 def create_mif_record(db: Session, mif: schemas.MIFRecordCreate):
-    mif_id = generate_id("MIF-2025-", db, models.MIFRecord, "mif_id")
+    mif_id = next_mif_id(db)
     db_mif = models.MIFRecord(
         mif_id=mif_id,
         **mif.dict()
@@ -172,22 +174,26 @@ def create_mif_record(db: Session, mif: schemas.MIFRecordCreate):
     db.refresh(db_mif)
     return db_mif
 
-def get_mif_records(db: Session, user_id: int, ip_address: str, skip: int = 0, limit: int = 100):
-    # Log access
-    log_mif_access(db, None, user_id, "Viewed MIF Records", ip_address)
+def get_mif_records(db: Session, user_id: int, ip_address: str, skip: int = 0, limit: int = 100,
+                    username: Optional[str] = None):
+    # Log access (list views are counted per user and hour in access_counters)
+    audit_logger.log_list_view(db, user_id, username, "MIF", ip_address)
     
     return db.query(models.MIFRecord).offset(skip).limit(limit).all()
 
 def log_mif_access(db: Session, mif_record_id: int, user_id: int, action: str, ip_address: str):
-    """Log all MIF access"""
-    log = models.MIFAccessLog(
-        mif_record_id=mif_record_id,
-        user_id=user_id,
-        action=action,
-        ip_address=ip_address
+    """Log access to an individual MIF record (queued for the audit writer, no commit)"""
+    audit_logger.audit_writer.submit(
+        db.get_bind(),
+        {
+            "mif_record_id": mif_record_id,
+            "user_id": user_id,
+            "action": action,
+            "ip_address": ip_address,
+            "timestamp": datetime.utcnow()
+        },
+        model=models.MIFAccessLog
     )
-    db.add(log)
-    db.commit()
 
 def get_mif_access_logs(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.MIFAccessLog).order_by(
@@ -291,13 +297,15 @@ def get_attendance_by_employee(db: Session, employee_id: int, date: datetime = N
     return query.all()
 
 # Product & Service CRUD
-def create_product(db: Session, product: schemas.ProductCreate):
+def create_product(db: Session, product: schemas.ProductCreate, user_id: Optional[int] = None):
     product_id = generate_id("PROD", db, models.Product, "product_id")
     db_product = models.Product(
         product_id=product_id,
         **product.dict()
     )
     db.add(db_product)
+    db.flush()
+    record_opening_stock(db, db_product.id, db_product.stock_quantity, user_id)
     db.commit()
     db.refresh(db_product)
     return db_product
@@ -326,6 +334,9 @@ def get_services(db: Session, skip: int = 0, limit: int = 100):
 def create_notification(db: Session, notification: schemas.NotificationCreate):
     db_notification = models.Notification(**notification.dict())
     db.add(db_notification)
+    db.flush()
+    notification_stream.publish(db, [(db_notification.id, db_notification.user_id)])
+    adjust_unread_counts(db, [db_notification.user_id])
     db.commit()
     db.refresh(db_notification)
     return db_notification
@@ -336,11 +347,136 @@ def get_notifications_by_user(db: Session, user_id: int, unread_only: bool = Fal
         query = query.filter(models.Notification.read_status == False)
     return query.order_by(models.Notification.created_at.desc()).all()
 
-def mark_notification_read(db: Session, notification_id: int):
+def get_notifications_page(db: Session, user_id: int, limit: int = 20,
+                           cursor: Optional[Tuple[datetime, int]] = None,
+                           unread_only: bool = False):
+    """
+    Keyset page of a user's notifications, newest first, ordered by (created_at, id).
+    Returns (items, next_cursor) where next_cursor is None on the last page.
+    """
+    query = db.query(models.Notification).filter(models.Notification.user_id == user_id)
+    if unread_only:
+        query = query.filter(models.Notification.read_status == False)
+    if cursor:
+        cursor_created_at, cursor_id = cursor
+        query = query.filter(or_(
+            models.Notification.created_at < cursor_created_at,
+            and_(
+                models.Notification.created_at == cursor_created_at,
+                models.Notification.id < cursor_id
+            )
+        ))
+    items = query.order_by(
+        models.Notification.created_at.desc(),
+        models.Notification.id.desc()
+    ).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = (items[-1].created_at, items[-1].id)
+    return items, next_cursor
+
+def _seed_unread_counters(db: Session, user_ids: List[int]):
+    """
+    INSERT ... SELECT the current unread count for users that have no counter
+    row yet. Counting and inserting is one statement, so a notification
+    committed in between cannot be missed; callers choose what happens on
+    conflict (a concurrent seed or adjustment got there first).
+    """
+    unread = (
+        select(func.count(models.Notification.id))
+        .where(
+            models.Notification.user_id == models.User.id,
+            models.Notification.read_status == False
+        )
+        .scalar_subquery()
+    )
+    insert = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+    return insert(models.NotificationCounter).from_select(
+        ["user_id", "unread_count", "updated_at"],
+        select(models.User.id, unread, literal(datetime.utcnow())).where(models.User.id.in_(user_ids))
+    )
+
+def _clamped(value, db: Session):
+    return func.max(value, 0) if db.bind.dialect.name == "sqlite" else func.greatest(value, 0)
+
+def adjust_unread_counts(db: Session, user_ids: Iterable[int], delta: int = 1):
+    """
+    Apply delta to the unread counter of each user ID (once per occurrence).
+    Users without a counter row get one seeded from their unread notifications,
+    which already include the caller's uncommitted change.
+    """
+    by_delta = {}
+    for user_id, occurrences in Counter(u for u in user_ids if u is not None).items():
+        by_delta.setdefault(delta * occurrences, []).append(user_id)
+    for change, ids in by_delta.items():
+        new_count = models.NotificationCounter.unread_count + change
+        if change < 0:
+            new_count = _clamped(new_count, db)
+        updated = {
+            user_id for (user_id,) in db.execute(
+                update(models.NotificationCounter)
+                .where(models.NotificationCounter.user_id.in_(ids))
+                .values(unread_count=new_count, updated_at=datetime.utcnow())
+                .returning(models.NotificationCounter.user_id)
+            )
+        }
+        missing = [user_id for user_id in ids if user_id not in updated]
+        if missing:
+            # A concurrent seed may insert first: it could not see our rows, so add the change
+            db.execute(
+                _seed_unread_counters(db, missing).on_conflict_do_update(
+                    index_elements=["user_id"],
+                    set_={"unread_count": new_count, "updated_at": datetime.utcnow()}
+                )
+            )
+
+def get_unread_count(db: Session, user_id: int) -> int:
+    """O(1) unread count from the maintained counter, seeding it on first use"""
+    counter = db.get(models.NotificationCounter, user_id)
+    if counter is not None:
+        return counter.unread_count
+    
+    db.execute(_seed_unread_counters(db, [user_id]).on_conflict_do_nothing(index_elements=["user_id"]))
+    db.commit()
+    # Re-read: a concurrent writer may have seeded the row instead
+    return db.execute(
+        select(models.NotificationCounter.unread_count)
+        .where(models.NotificationCounter.user_id == user_id)
+    ).scalar() or 0
+
+def mark_notifications_read(db: Session, user_id: int,
+                            notification_ids: Optional[List[int]] = None,
+                            up_to_id: Optional[int] = None) -> int:
+    """
+    Mark a range of the user's unread notifications read with one UPDATE.
+    With no IDs and no upper bound, every unread notification is marked.
+    Returns the number of notifications changed.
+    """
+    stmt = update(models.Notification).where(
+        models.Notification.user_id == user_id,
+        models.Notification.read_status == False
+    )
+    if notification_ids is not None:
+        stmt = stmt.where(models.Notification.id.in_(notification_ids))
+    if up_to_id is not None:
+        stmt = stmt.where(models.Notification.id <= up_to_id)
+    result = db.execute(
+        stmt.values(read_status=True, read_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        adjust_unread_counts(db, [user_id], delta=-result.rowcount)
+    db.commit()
+    return result.rowcount
+
+def mark_notification_read(db: Session, notification_id: int, user_id: int):
     db_notification = db.query(models.Notification).filter(
-        models.Notification.id == notification_id
+        models.Notification.id == notification_id,
+        models.Notification.user_id == user_id
     ).first()
     if db_notification:
-        db_notification.read_status = True
-        db.commit()
+        mark_notifications_read(db, user_id, notification_ids=[notification_id])
+        db.refresh(db_notification)
     return db_notification
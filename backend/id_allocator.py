@@ -0,0 +1,146 @@
+"""
+Formatted ID Allocator
+Collision-free business identifiers (ORD-YYYYMMDD-NNNN, INV-YYYYMMDD-NNNN,
+SRYYYYMMDDNNNN, ENQNNNNNN, CUSTNNNNNN, MIF-YYYY-NNNNNN, ...) drawn from a
+counter row per prefix in id_sequences.
+
+PostgreSQL: hi-lo allocation. A worker reserves ID_BLOCK_SIZE numbers in
+its own short transaction (the counter row is locked only for that
+UPDATE) and hands them out from memory, so most IDs cost no query.
+Numbers of a block left unused when the worker exits are skipped.
+
+Other databases (SQLite dev setups): one number per call, reserved inside
+the caller's transaction since SQLite serialises writers anyway and a
+second connection would wait on the caller's own write lock.
+
+The first allocation for a prefix seeds the counter past the largest
+numeric suffix already stored under it, so IDs issued by the previous
+COUNT(*)/random generators are never reissued.
+"""
+
+from datetime import datetime
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+import os
+import threading
+
+import models
+
+ID_BLOCK_SIZE = int(os.getenv("ID_BLOCK_SIZE", "20"))
+
+_blocks: Dict[str, List[int]] = {}  # prefix -> [next, end)
+_lock = threading.Lock()
+
+
+def _uses_blocks(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql" and ID_BLOCK_SIZE > 1
+
+
+def _largest_suffix(conn, prefix: str, column) -> int:
+    """Largest numeric suffix stored under prefix (0 if none)"""
+    rows = conn.execute(
+        select(column).where(column.like(f"{prefix}%")).order_by(
+            func.length(column).desc(), column.desc()
+        )
+    )
+    for (value,) in rows:
+        suffix = value[len(prefix):]
+        if suffix.isdigit():
+            return int(suffix)
+    return 0
+
+
+def _reserve(conn, prefix: str, column, count: int) -> int:
+    """Advance the counter for prefix by count; returns the first reserved number"""
+    table = models.IdSequence.__table__
+    advanced = conn.execute(
+        update(table).where(table.c.prefix == prefix).values(
+            next_value=table.c.next_value + count
+        )
+    )
+    if advanced.rowcount == 0:
+        insert = pg_insert if conn.dialect.name == "postgresql" else sqlite_insert
+        conn.execute(
+            insert(table).values(
+                prefix=prefix,
+                next_value=_largest_suffix(conn, prefix, column) + 1
+            ).on_conflict_do_nothing(index_elements=["prefix"])
+        )
+        conn.execute(
+            update(table).where(table.c.prefix == prefix).values(
+                next_value=table.c.next_value + count
+            )
+        )
+    end = conn.execute(
+        select(table.c.next_value).where(table.c.prefix == prefix)
+    ).scalar_one()
+    return end - count
+
+
+def allocate_number(db: Session, prefix: str, column) -> int:
+    """Next unused counter value for prefix; column is the model attribute holding the IDs"""
+    if not _uses_blocks(db):
+        return _reserve(db.connection(), prefix, column, 1)
+
+    with _lock:
+        block = _blocks.get(prefix)
+        if block and block[0] < block[1]:
+            block[0] += 1
+            return block[0] - 1
+        with db.get_bind().begin() as conn:
+            start = _reserve(conn, prefix, column, ID_BLOCK_SIZE)
+        _blocks[prefix] = [start + 1, start + ID_BLOCK_SIZE]
+        return start
+
+
+def allocate_numbers(db: Session, prefix: str, column, count: int) -> range:
+    """count consecutive counter values for prefix, reserved with one UPDATE"""
+    if count <= 0:
+        return range(0)
+    if not _uses_blocks(db):
+        start = _reserve(db.connection(), prefix, column, count)
+    else:
+        with db.get_bind().begin() as conn:
+            start = _reserve(conn, prefix, column, count)
+    return range(start, start + count)
+
+
+def allocate_id(db: Session, prefix: str, column, width: int = 6) -> str:
+    """Formatted ID: prefix followed by the zero-padded counter"""
+    return f"{prefix}{allocate_number(db, prefix, column):0{width}d}"
+
+
+def _day(now: Optional[datetime]) -> str:
+    return (now or datetime.now()).strftime('%Y%m%d')
+
+
+def next_order_id(db: Session, now: Optional[datetime] = None) -> str:
+    """ORD-YYYYMMDD-NNNN"""
+    return allocate_id(db, f"ORD-{_day(now)}-", models.Order.order_id, 4)
+
+
+def next_invoice_number(db: Session, now: Optional[datetime] = None) -> str:
+    """INV-YYYYMMDD-NNNN"""
+    return allocate_id(db, f"INV-{_day(now)}-", models.Order.invoice_number, 4)
+
+
+def next_invoice_numbers(db: Session, count: int, now: Optional[datetime] = None) -> List[str]:
+    """A consecutive block of INV-YYYYMMDD-NNNN numbers (bulk approvals)"""
+    prefix = f"INV-{_day(now)}-"
+    return [
+        f"{prefix}{number:04d}"
+        for number in allocate_numbers(db, prefix, models.Order.invoice_number, count)
+    ]
+
+
+def next_ticket_no(db: Session, now: Optional[datetime] = None) -> str:
+    """SRYYYYMMDDNNNN (service request tickets)"""
+    return allocate_id(db, f"SR{_day(now)}", models.Complaint.ticket_no, 4)
+
+
+def next_mif_id(db: Session, now: Optional[datetime] = None) -> str:
+    """MIF-YYYY-NNNNNN"""
+    return allocate_id(db, f"MIF-{(now or datetime.now()).year}-", models.MIFRecord.mif_id)
@@ -6,6 +6,7 @@ from pathlib import Path
 import os
 import sys
 import logging
+import threading
 
 # Configure logging for Render
 logging.basicConfig(
@@ -86,6 +87,9 @@ async def lifespan(app: FastAPI):
                 logger.info("✅ Database connection verified")
                 models.Base.metadata.create_all(bind=engine)
                 logger.info("✅ Database tables created/verified")
+                # Fill empty analytics fact tables without delaying startup
+                from analytics_rollup import backfill_on_startup
+                threading.Thread(target=backfill_on_startup, name="fact-backfill", daemon=True).start()
             else:
                 logger.warning("⚠️ Database connection failed - app will start anyway")
         except Exception as e:
@@ -116,6 +120,12 @@ async def lifespan(app: FastAPI):
             logger.info("✅ Scheduler stopped")
         except Exception as e:
             logger.warning(f"⚠️ Scheduler stop error: {e}")
+    try:
+        from audit_logger import audit_writer
+        audit_writer.flush()
+        logger.info("✅ Audit log flushed")
+    except Exception as e:
+        logger.warning(f"⚠️ Audit log flush error: {e}")
     logger.info("👋 Shutdown complete")
 
 
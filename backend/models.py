@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, Float, DateTime, Date, Text, ForeignKey, Enum
+from sqlalchemy import Boolean, Column, Integer, String, Float, DateTime, Date, Text, ForeignKey, Enum, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime, date
@@ -79,6 +79,9 @@ class Customer(Base):
     bookings = relationship("Booking", back_populates="customer")
     mif_records = relationship("MIFRecord", back_populates="customer")
 
+# Enquiry statuses that still receive scheduled follow-up reminders
+FOLLOW_UP_ACTIVE_STATUSES = ["NEW", "IN_PROGRESS", "FOLLOW_UP"]
+
 class Enquiry(Base):
     __tablename__ = "enquiries"
     
@@ -115,6 +118,17 @@ class Enquiry(Base):
     # Explicitly define the order relationships to avoid ambiguity
     orders = relationship("Order", foreign_keys="Order.enquiry_id", back_populates="enquiry")
     converted_order = relationship("Order", foreign_keys=[order_id], back_populates="source_enquiry")
+    
+    __table_args__ = (
+        # Due queue for scheduler follow-up reminders (range scan on next_follow_up).
+        # Partial on open, assigned enquiries so closed ones with a past
+        # next_follow_up never enter the scan.
+        Index(
+            "ix_enquiries_next_follow_up", "next_follow_up", "id",
+            postgresql_where=status.in_(FOLLOW_UP_ACTIVE_STATUSES) & assigned_to.isnot(None),
+            sqlite_where=status.in_(FOLLOW_UP_ACTIVE_STATUSES) & assigned_to.isnot(None)
+        ),
+    )
 
 # FollowUpHistory removed - using SalesFollowUp as single source of truth
 
@@ -372,6 +386,105 @@ class Notification(Base):
     read_status = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     read_at = Column(DateTime)
+    
+    __table_args__ = (
+        # Keyset pagination of a user's feed on (created_at, id)
+        Index("ix_notifications_user_created_id", "user_id", "created_at", "id"),
+    )
+
+class SchedulerRun(Base):
+    """One execution of a scheduled job (timing and outcome)"""
+    __tablename__ = "scheduler_runs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, nullable=False)
+    started_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+    duration_ms = Column(Float)
+    rows_scanned = Column(Integer, default=0)
+    notifications_emitted = Column(Integer, default=0)
+    status = Column(String, default="success")  # success, error
+    error = Column(Text)
+    exceeded_interval = Column(Boolean, default=False)
+    worker = Column(String)  # pid@hostname that ran the job
+    
+    __table_args__ = (
+        Index("ix_scheduler_runs_job_started", "job_id", "started_at"),
+    )
+
+class NotificationCounter(Base):
+    """Maintained per-user unread notification count (header badge)"""
+    __tablename__ = "notification_counters"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    unread_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class IdSequence(Base):
+    """Next free counter per formatted-ID prefix (see id_allocator.py)"""
+    __tablename__ = "id_sequences"
+
+    prefix = Column(String, primary_key=True)  # e.g. ORD-20250101-, CUST
+    next_value = Column(Integer, nullable=False, default=1)
+
+# ============================================
+# DAILY ANALYTICS FACTS (maintained by analytics_rollup.py)
+# ============================================
+
+class DailySalesFact(Base):
+    """Per-salesman enquiry, revenue and visit totals for one day"""
+    __tablename__ = "daily_sales_facts"
+    
+    date = Column(Date, primary_key=True)  # Enquiry/Order created_at, ShopVisit visit_date
+    employee_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    enquiries_assigned = Column(Integer, nullable=False, default=0)
+    enquiries_converted = Column(Integer, nullable=False, default=0)
+    enquiries_lost = Column(Integer, nullable=False, default=0)
+    closing_seconds = Column(Float, nullable=False, default=0)  # Sum over converted enquiries
+    approved_revenue = Column(Float, nullable=False, default=0)
+    shop_visits = Column(Integer, nullable=False, default=0)
+    refreshed_at = Column(DateTime, default=datetime.utcnow)
+
+class DailyServiceFact(Base):
+    """Per-engineer job, SLA and feedback totals for one day"""
+    __tablename__ = "daily_service_facts"
+    
+    date = Column(Date, primary_key=True)  # Complaint created_at, Feedback created_at
+    employee_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    jobs_assigned = Column(Integer, nullable=False, default=0)
+    jobs_completed = Column(Integer, nullable=False, default=0)
+    jobs_in_progress = Column(Integer, nullable=False, default=0)  # ASSIGNED, ON_THE_WAY, IN_PROGRESS
+    jobs_on_hold = Column(Integer, nullable=False, default=0)
+    sla_warnings = Column(Integer, nullable=False, default=0)  # Warned but not breached
+    sla_breaches = Column(Integer, nullable=False, default=0)
+    resolved_jobs = Column(Integer, nullable=False, default=0)  # Completed with completed_at
+    resolution_seconds = Column(Float, nullable=False, default=0)
+    feedback_count = Column(Integer, nullable=False, default=0)
+    negative_feedbacks = Column(Integer, nullable=False, default=0)
+    rating_1 = Column(Integer, nullable=False, default=0)
+    rating_2 = Column(Integer, nullable=False, default=0)
+    rating_3 = Column(Integer, nullable=False, default=0)
+    rating_4 = Column(Integer, nullable=False, default=0)
+    rating_5 = Column(Integer, nullable=False, default=0)
+    refreshed_at = Column(DateTime, default=datetime.utcnow)
+
+class DailyAttendanceFact(Base):
+    """Per-employee attendance records for one business day"""
+    __tablename__ = "daily_attendance_facts"
+    
+    date = Column(Date, primary_key=True)  # Attendance.attendance_date
+    employee_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    records = Column(Integer, nullable=False, default=0)
+    present = Column(Integer, nullable=False, default=0)
+    late = Column(Integer, nullable=False, default=0)
+    refreshed_at = Column(DateTime, default=datetime.utcnow)
+
+class FactDirtyDay(Base):
+    """Day whose fact rows are out of date (queued by source writes, drained by analytics_rollup)"""
+    __tablename__ = "fact_dirty_days"
+
+    day = Column(Date, primary_key=True)
+    marked_at = Column(DateTime, default=datetime.utcnow)
 
 # NEW MODELS FOR ENHANCED ERP FEATURES
 
@@ -393,6 +506,19 @@ class AuditLog(Base):
     
     user = relationship("User")
 
+class AccessCounter(Base):
+    """Coalesced list/dashboard VIEW events: one row per user, module and hour"""
+    __tablename__ = "access_counters"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    module = Column(String, primary_key=True)
+    hour = Column(DateTime, primary_key=True)  # UTC, truncated to the hour
+    username = Column(String)
+    view_count = Column(Integer, nullable=False, default=0)
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime)
+    ip_address = Column(String)  # Most recent
+
 class ServiceEngineerHierarchy(Base):
     __tablename__ = "service_engineer_hierarchy"
     
@@ -511,6 +637,7 @@ class StockMovement(Base):
     id = Column(Integer, primary_key=True, index=True)
     movement_type = Column(String, nullable=False)  # IN, OUT
     item_name = Column(String, nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"))  # Catalogue item, if any
     quantity = Column(Integer, nullable=False)
     reference = Column(String)  # Service ticket, Order, etc.
     status = Column(String, default="Pending")  # Pending, Approved, Rejected
@@ -522,6 +649,37 @@ class StockMovement(Base):
     logged_by_user = relationship("User", foreign_keys=[logged_by])
     approved_by_user = relationship("User", foreign_keys=[approved_by])
 
+class StockLedgerEntry(Base):
+    """Append-only record of every change to Product.stock_quantity (see stock_ledger.py)"""
+    __tablename__ = "stock_ledger"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    change = Column(Integer, nullable=False)  # Signed quantity
+    balance_after = Column(Integer, nullable=False)
+    reason = Column(String, nullable=False)  # ORDER_APPROVED, MOVEMENT_IN, MOVEMENT_OUT, ADJUSTMENT
+    reference = Column(String)  # Order ID, stock movement ID, ...
+    created_by = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_stock_ledger_product_id", "product_id", "id"),
+    )
+
+class StockSnapshot(Base):
+    """Periodic copy of every product's stock, tagged with the last ledger entry it includes"""
+    __tablename__ = "stock_snapshots"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    stock_quantity = Column(Integer, nullable=False)
+    last_entry_id = Column(Integer, nullable=False, default=0)
+    taken_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_stock_snapshots_product_taken", "product_id", "taken_at"),
+    )
+
 class ServiceEngineerDailyReport(Base):
     """Service Engineer Daily Report - End-of-day activity log"""
     __tablename__ = "service_engineer_daily_reports"
@@ -561,14 +719,21 @@ class ChatbotKnowledge(Base):
     subcategory = Column(String)  # More specific categorization
     keywords = Column(Text)  # Comma-separated keywords for search
     
-    # Vector embedding (stored as JSON array)
-    embedding_en = Column(Text)  # FAISS vector for English (JSON)
-    embedding_ta = Column(Text)  # FAISS vector for Tamil (JSON)
+    # Vector embeddings (little-endian float32 bytes) with the content they were computed from
+    embedding_en = Column(LargeBinary)  # FAISS vector for English
+    embedding_ta = Column(LargeBinary)  # FAISS vector for Tamil
+    embedding_en_hash = Column(String(64))  # sha256 of the embedded English text
+    embedding_ta_hash = Column(String(64))  # sha256 of the embedded Tamil text
+    embedding_model = Column(String)  # Model that produced the embeddings
     
     # Control flags
     is_active = Column(Boolean, default=True)
     priority = Column(Integer, default=0)  # Higher = more important
     
+    # Retrieval stats (not content edits, so they never touch updated_at)
+    usage_count = Column(Integer, default=0)
+    last_used_at = Column(DateTime)
+    
     # Metadata
     created_by = Column(Integer, ForeignKey("users.id"))
     updated_by = Column(Integer, ForeignKey("users.id"))
@@ -691,6 +856,9 @@ class ChatMessage(Base):
     triggered_handoff = Column(Boolean, default=False)
     handoff_reason = Column(String)  # low_confidence, explicit_request, repeated_query
     
+    # Bot reply served from the answer cache (no retrieval / LLM call)
+    answer_cached = Column(Boolean, default=False)
+    
     # Timestamps
     sent_at = Column(DateTime, default=datetime.utcnow)
     
@@ -9,11 +9,14 @@ PHASE 4: NOTIFICATION SYSTEM ALIGNMENT
 - Action URL generation with notification_routes.py
 """
 
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Iterable, Optional, List
 import models
 import logging
+import crud
+import notification_stream
 from notification_routes import NotificationType, NotificationRouter
 
 logger = logging.getLogger(__name__)
@@ -61,6 +64,9 @@ class NotificationService:
                 created_at=datetime.utcnow()
             )
             db.add(notification)
+            db.flush()
+            notification_stream.publish(db, [(notification.id, user_id)])
+            crud.adjust_unread_counts(db, [user_id])
             db.commit()
             db.refresh(notification)
             logger.info(f"Notification created for user {user_id}: {title}")
@@ -70,6 +76,144 @@ class NotificationService:
             logger.error(f"Failed to create notification: {e}")
             raise
     
+    @staticmethod
+    def build_notification_rows(
+        user_ids: Iterable[int],
+        title: str,
+        message: str,
+        notification_type: str,
+        priority: str = "medium",
+        module: str = None,
+        action_url: str = None
+    ) -> List[dict]:
+        """
+        Expand one message template into notification rows, one per recipient
+        
+        Duplicate recipient IDs are dropped; the rows can be combined with rows
+        built from other templates and written with create_notifications_bulk.
+        """
+        created_at = datetime.utcnow()
+        rows = []
+        seen = set()
+        for user_id in user_ids:
+            if user_id is None or user_id in seen:
+                continue
+            seen.add(user_id)
+            rows.append({
+                "user_id": user_id,
+                "title": title,
+                "message": message,
+                "notification_type": notification_type,
+                "priority": priority,
+                "module": module,
+                "action_url": action_url,
+                "read_status": False,
+                "created_at": created_at
+            })
+        return rows
+    
+    @staticmethod
+    def create_notifications_bulk(
+        db: Session,
+        rows: List[dict],
+        commit: bool = True
+    ) -> List[int]:
+        """
+        Insert many notifications with a single multi-row INSERT
+        
+        Args:
+            db: Database session
+            rows: Rows from build_notification_rows
+            commit: Commit immediately; pass False to join the caller's transaction
+        
+        Returns:
+            IDs of the created notifications
+        """
+        if not rows:
+            return []
+        try:
+            result = db.execute(
+                insert(models.Notification).returning(
+                    models.Notification.id, models.Notification.user_id
+                ),
+                rows
+            )
+            events = [(row.id, row.user_id) for row in result]
+            notification_stream.publish(db, events)
+            crud.adjust_unread_counts(db, [user_id for _, user_id in events])
+            notification_ids = [notification_id for notification_id, _ in events]
+            if commit:
+                db.commit()
+            logger.info(f"Created {len(notification_ids)} notifications in one batch")
+            return notification_ids
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to create notifications batch: {e}")
+            raise
+    
+    @staticmethod
+    def get_user_ids_by_role(
+        db: Session,
+        roles: List[models.UserRole]
+    ) -> Dict[models.UserRole, List[int]]:
+        """Resolve active users for several roles with one query"""
+        user_ids = {role: [] for role in roles}
+        if not roles:
+            return user_ids
+        users = db.query(models.User.id, models.User.role).filter(
+            models.User.role.in_(roles),
+            models.User.is_active == True
+        ).all()
+        for user_id, role in users:
+            user_ids[role].append(user_id)
+        return user_ids
+    
+    @staticmethod
+    def fan_out(
+        db: Session,
+        title: str,
+        message: str,
+        notification_type: str,
+        priority: str = "medium",
+        module: str = None,
+        action_url: str = None,
+        user_ids: Optional[Iterable[int]] = None,
+        roles: Optional[List[models.UserRole]] = None,
+        commit: bool = True
+    ) -> List[int]:
+        """
+        Send one message template to a recipient set and/or role selector
+        
+        Args:
+            db: Database session
+            title: Notification title
+            message: Notification message
+            notification_type: Type of notification
+            priority: Priority level
+            module: Module name
+            action_url: Action URL
+            user_ids: Explicit recipient user IDs
+            roles: Notify every active user holding one of these roles
+            commit: Commit immediately; pass False to join the caller's transaction
+        
+        Returns:
+            IDs of the created notifications
+        """
+        recipients = list(user_ids or [])
+        if roles:
+            for role_ids in NotificationService.get_user_ids_by_role(db, roles).values():
+                recipients.extend(role_ids)
+        rows = NotificationService.build_notification_rows(
+            recipients,
+            title=title,
+            message=message,
+            notification_type=notification_type,
+            priority=priority,
+            module=module,
+            action_url=action_url
+        )
+        return NotificationService.create_notifications_bulk(db, rows, commit=commit)
+    
     @staticmethod
     def notify_enquiry_created(
         db: Session,
@@ -80,14 +224,18 @@ class NotificationService:
         Notify when a new enquiry is created
         - Notify assigned salesman
         - Notify admin
+        - Notify reception
+        All rows are written with one INSERT and one commit.
         """
-        notifications_created = []
+        recipients = NotificationService.get_user_ids_by_role(
+            db, [models.UserRole.ADMIN, models.UserRole.RECEPTION]
+        )
+        rows = []
         
         # Notify assigned salesman
         if enquiry.assigned_to:
-            notification = NotificationService.create_notification(
-                db=db,
-                user_id=enquiry.assigned_to,
+            rows += NotificationService.build_notification_rows(
+                [enquiry.assigned_to],
                 title=f"New Enquiry Assigned: {enquiry.customer_name}",
                 message=f"A new enquiry from {enquiry.customer_name} has been assigned to you by {created_by_name}. "
                        f"Priority: {enquiry.priority}. Follow up required.",
@@ -96,49 +244,34 @@ class NotificationService:
                 module="enquiries",
                 action_url=f"/enquiries/{enquiry.id}"
             )
-            notifications_created.append(notification)
         
         # Notify admin about new enquiry
-        admin_users = db.query(models.User).filter(
-            models.User.role == models.UserRole.ADMIN
-        ).all()
-        
-        for admin in admin_users:
-            notification = NotificationService.create_notification(
-                db=db,
-                user_id=admin.id,
-                title=f"New Enquiry: {enquiry.customer_name}",
-                message=f"New enquiry created by {created_by_name}. "
-                       f"Assigned to: {enquiry.assigned_to or 'Unassigned'}. "
-                       f"Priority: {enquiry.priority}",
-                notification_type="enquiry",
-                priority="low",
-                module="enquiries",
-                action_url=f"/enquiries/{enquiry.id}"
-            )
-            notifications_created.append(notification)
+        rows += NotificationService.build_notification_rows(
+            recipients[models.UserRole.ADMIN],
+            title=f"New Enquiry: {enquiry.customer_name}",
+            message=f"New enquiry created by {created_by_name}. "
+                   f"Assigned to: {enquiry.assigned_to or 'Unassigned'}. "
+                   f"Priority: {enquiry.priority}",
+            notification_type="enquiry",
+            priority="low",
+            module="enquiries",
+            action_url=f"/enquiries/{enquiry.id}"
+        )
         
         # Notify RECEPTION role (office staff) about new enquiry
-        reception_users = db.query(models.User).filter(
-            models.User.role == models.UserRole.RECEPTION,
-            models.User.is_active == True
-        ).all()
-        
-        for reception in reception_users:
-            notification = NotificationService.create_notification(
-                db=db,
-                user_id=reception.id,
-                title=f"New Enquiry: {enquiry.customer_name}",
-                message=f"New enquiry submitted by {created_by_name}. "
-                       f"Customer: {enquiry.customer_name}, Phone: {enquiry.phone}. "
-                       f"Priority: {enquiry.priority}. Please review and assign.",
-                notification_type="enquiry",
-                priority="high" if created_by_name == "Website Visitor" else "medium",
-                module="enquiries",
-                action_url=f"/enquiries/{enquiry.id}"
-            )
-            notifications_created.append(notification)
+        rows += NotificationService.build_notification_rows(
+            recipients[models.UserRole.RECEPTION],
+            title=f"New Enquiry: {enquiry.customer_name}",
+            message=f"New enquiry submitted by {created_by_name}. "
+                   f"Customer: {enquiry.customer_name}, Phone: {enquiry.phone}. "
+                   f"Priority: {enquiry.priority}. Please review and assign.",
+            notification_type="enquiry",
+            priority="high" if created_by_name == "Website Visitor" else "medium",
+            module="enquiries",
+            action_url=f"/enquiries/{enquiry.id}"
+        )
         
+        notifications_created = NotificationService.create_notifications_bulk(db, rows)
         logger.info(f"Created {len(notifications_created)} notifications for enquiry {enquiry.id}")
         return notifications_created
     
@@ -153,32 +286,25 @@ class NotificationService:
         - Notify admin for approval
         - Notify salesman (if different from creator)
         """
-        notifications_created = []
-        
         # Notify admin for order approval
-        admin_users = db.query(models.User).filter(
-            models.User.role == models.UserRole.ADMIN
-        ).all()
-        
-        for admin in admin_users:
-            notification = NotificationService.create_notification(
-                db=db,
-                user_id=admin.id,
-                title=f"New Order Pending Approval: #{order.id}",
-                message=f"Order created by {created_by_user.full_name} for customer ID {order.customer_id}. "
-                       f"Amount: ₹{order.total_amount:.2f}. Requires approval.",
-                notification_type="order",
-                priority="high",
-                module="orders",
-                action_url=f"/orders/{order.id}/approve"
-            )
-            notifications_created.append(notification)
+        admin_ids = NotificationService.get_user_ids_by_role(
+            db, [models.UserRole.ADMIN]
+        )[models.UserRole.ADMIN]
+        rows = NotificationService.build_notification_rows(
+            admin_ids,
+            title=f"New Order Pending Approval: #{order.id}",
+            message=f"Order created by {created_by_user.full_name} for customer ID {order.customer_id}. "
+                   f"Amount: ₹{order.total_amount:.2f}. Requires approval.",
+            notification_type="order",
+            priority="high",
+            module="orders",
+            action_url=f"/orders/{order.id}/approve"
+        )
         
         # Notify salesman if order was created by someone else
         if order.salesman_id and order.salesman_id != created_by_user.id:
-            notification = NotificationService.create_notification(
-                db=db,
-                user_id=order.salesman_id,
+            rows += NotificationService.build_notification_rows(
+                [order.salesman_id],
                 title=f"Order Created for Your Customer: #{order.id}",
                 message=f"An order has been created by {created_by_user.full_name} "
                        f"for customer ID {order.customer_id}. Amount: ₹{order.total_amount:.2f}",
@@ -187,8 +313,8 @@ class NotificationService:
                 module="orders",
                 action_url=f"/orders/{order.id}"
             )
-            notifications_created.append(notification)
         
+        notifications_created = NotificationService.create_notifications_bulk(db, rows)
         logger.info(f"Created {len(notifications_created)} notifications for order {order.id}")
         return notifications_created
     
@@ -203,24 +329,33 @@ class NotificationService:
         - Notify salesman
         - Notify customer (if email available)
         """
-        notifications_created = []
-        
-        # Notify salesman
-        if order.salesman_id:
-            notification = NotificationService.create_notification(
-                db=db,
-                user_id=order.salesman_id,
-                title=f"Order Approved: #{order.id}",
-                message=f"Your order #{order.id} has been approved by {approved_by.full_name}. "
-                       f"Invoice: {order.invoice_number}. Stock deducted.",
-                notification_type="order",
-                priority="high",
-                module="orders",
-                action_url=f"/orders/{order.id}"
-            )
-            notifications_created.append(notification)
-        
-        logger.info(f"Created {len(notifications_created)} notifications for order approval {order.id}")
+        return NotificationService.notify_orders_approved(db, [order], approved_by)
+    
+    @staticmethod
+    def notify_orders_approved(
+        db: Session,
+        orders: List[models.Order],
+        approved_by: models.User
+    ):
+        """
+        Notify the salesmen of several approved orders with one INSERT and one commit
+        """
+        rows = []
+        for order in orders:
+            if order.salesman_id:
+                rows.extend(NotificationService.build_notification_rows(
+                    [order.salesman_id],
+                    title=f"Order Approved: #{order.id}",
+                    message=f"Your order #{order.id} has been approved by {approved_by.full_name}. "
+                           f"Invoice: {order.invoice_number}. Stock deducted.",
+                    notification_type="order",
+                    priority="high",
+                    module="orders",
+                    action_url=f"/orders/{order.id}"
+                ))
+        notifications_created = NotificationService.create_notifications_bulk(db, rows)
+        
+        logger.info(f"Created {len(notifications_created)} notifications for {len(orders)} order approvals")
         return notifications_created
     
     @staticmethod
@@ -234,38 +369,46 @@ class NotificationService:
         Notify when an order is rejected
         - Notify salesman
         """
-        notifications_created = []
-        
-        # Notify salesman
-        if order.salesman_id:
-            notification = NotificationService.create_notification(
-                db=db,
-                user_id=order.salesman_id,
-                title=f"Order Rejected: #{order.id}",
-                message=f"Your order #{order.id} has been rejected by {rejected_by.full_name}. "
-                       f"Reason: {reason}",
-                notification_type="order",
-                priority="high",
-                module="orders",
-                action_url=f"/orders/{order.id}"
-            )
-            notifications_created.append(notification)
-        
-        logger.info(f"Created {len(notifications_created)} notifications for order rejection {order.id}")
-        return notifications_created
+        return NotificationService.notify_orders_rejected(db, [order], rejected_by, reason)
     
     @staticmethod
-    def notify_daily_report_missing(
+    def notify_orders_rejected(
         db: Session,
+        orders: List[models.Order],
+        rejected_by: models.User,
+        reason: str
+    ):
+        """
+        Notify the salesmen of several rejected orders with one INSERT and one commit
+        """
+        rows = []
+        for order in orders:
+            if order.salesman_id:
+                rows.extend(NotificationService.build_notification_rows(
+                    [order.salesman_id],
+                    title=f"Order Rejected: #{order.id}",
+                    message=f"Your order #{order.id} has been rejected by {rejected_by.full_name}. "
+                           f"Reason: {reason}",
+                    notification_type="order",
+                    priority="high",
+                    module="orders",
+                    action_url=f"/orders/{order.id}"
+                ))
+        notifications_created = NotificationService.create_notifications_bulk(db, rows)
+        
+        logger.info(f"Created {len(notifications_created)} notifications for {len(orders)} order rejections")
+        return notifications_created
+    
+    @staticmethod
+    def daily_report_missing_rows(
         salesman: models.User,
         date: datetime
-    ):
+    ) -> List[dict]:
         """
-        Notify salesman about missing daily report
+        Rows for the missing daily report reminder (combine with other rows in one bulk insert)
         """
-        notification = NotificationService.create_notification(
-            db=db,
-            user_id=salesman.id,
+        return NotificationService.build_notification_rows(
+            [salesman.id],
             title=f"Missing Daily Report for {date.strftime('%Y-%m-%d')}",
             message=f"You have not submitted your daily report for {date.strftime('%B %d, %Y')}. "
                    f"Please submit it as soon as possible.",
@@ -274,6 +417,22 @@ class NotificationService:
             module="reports",
             action_url="/salesman/daily-report"
         )
+    
+    @staticmethod
+    def notify_daily_report_missing(
+        db: Session,
+        salesman: models.User,
+        date: datetime,
+        commit: bool = True
+    ):
+        """
+        Notify salesman about missing daily report
+        """
+        notification = NotificationService.create_notifications_bulk(
+            db,
+            NotificationService.daily_report_missing_rows(salesman, date),
+            commit=commit
+        )
         
         logger.info(f"Sent missing report notification to salesman {salesman.id}")
         return notification
@@ -294,14 +453,14 @@ class NotificationService:
         if not enquiry:
             return None
         
-        notification = NotificationService.create_notification(
+        notification = NotificationService.fan_out(
             db=db,
-            user_id=salesman.id,
+            user_ids=[salesman.id],
             title=f"Follow-up Due: {enquiry.customer_name}",
             message=f"Follow-up is due for {enquiry.customer_name}. "
-                   f"Status: {followup.status}. Temperature: {enquiry.temperature}",
+                   f"Status: {followup.status}. Temperature: {enquiry.priority}",
             notification_type="reminder",
-            priority="high" if enquiry.temperature == "HOT" else "medium",
+            priority="high" if enquiry.priority == "HOT" else "medium",
             module="enquiries",
             action_url=f"/enquiries/{enquiry.id}/followups"
         )
@@ -319,7 +478,7 @@ class NotificationService:
         priority: str = "medium",
         module: str = None,
         action_url: str = None
-    ) -> List[models.Notification]:
+    ) -> List[int]:
         """
         Send notifications to all users with specific roles
         
@@ -334,27 +493,18 @@ class NotificationService:
             action_url: Action URL
         
         Returns:
-            List of created notifications
+            IDs of the created notifications
         """
-        notifications_created = []
-        
-        users = db.query(models.User).filter(
-            models.User.role.in_(roles),
-            models.User.is_active == True
-        ).all()
-        
-        for user in users:
-            notification = NotificationService.create_notification(
-                db=db,
-                user_id=user.id,
-                title=title,
-                message=message,
-                notification_type=notification_type,
-                priority=priority,
-                module=module,
-                action_url=action_url
-            )
-            notifications_created.append(notification)
+        notifications_created = NotificationService.fan_out(
+            db=db,
+            roles=roles,
+            title=title,
+            message=message,
+            notification_type=notification_type,
+            priority=priority,
+            module=module,
+            action_url=action_url
+        )
         
         logger.info(f"Created {len(notifications_created)} role-based notifications for roles {roles}")
         return notifications_created
@@ -364,7 +514,7 @@ class NotificationService:
         db: Session,
         service: models.Complaint,
         engineer_id: int
-    ) -> models.Notification:
+    ) -> List[int]:
         """
         Notify service engineer when a service request is assigned
         
@@ -374,13 +524,13 @@ class NotificationService:
             engineer_id: Engineer user ID
         
         Returns:
-            Created notification
+            IDs of the created notifications
         """
         priority_label = service.priority or "NORMAL"
         
-        return NotificationService.create_notification(
+        return NotificationService.fan_out(
             db=db,
-            user_id=engineer_id,
+            user_ids=[engineer_id],
             title=f"New {priority_label} Service Assigned",
             message=f"Service Request #{service.id} has been assigned to you. Customer: {service.customer_name}, Issue: {service.complaint_text[:100]}...",
             notification_type="service_assigned",
@@ -394,7 +544,7 @@ class NotificationService:
         db: Session,
         service: models.Complaint,
         engineer_name: str
-    ) -> List[models.Notification]:
+    ) -> List[int]:
         """
         Notify admin and reception when a service is completed
         
@@ -404,7 +554,7 @@ class NotificationService:
             engineer_name: Name of the engineer who completed the service
         
         Returns:
-            List of created notifications
+            IDs of the created notifications
         """
         return NotificationService.notify_role_based(
             db=db,
@@ -421,7 +571,7 @@ class NotificationService:
     def notify_sla_breach(
         db: Session,
         service: models.Complaint
-    ) -> List[models.Notification]:
+    ) -> List[int]:
         """
         Notify admin and reception when SLA is breached
         
@@ -430,7 +580,7 @@ class NotificationService:
             service: Service request/complaint object
         
         Returns:
-            List of created notifications
+            IDs of the created notifications
         """
         engineer_name = "Unassigned"
         if service.assigned_to:
@@ -454,7 +604,7 @@ class NotificationService:
         db: Session,
         service: models.Complaint,
         feedback
-    ) -> List[models.Notification]:
+    ) -> List[int]:
         """
         Notify admin and reception when negative feedback is received
         
@@ -464,7 +614,7 @@ class NotificationService:
             feedback: Feedback object with rating
         
         Returns:
-            List of created notifications
+            IDs of the created notifications
         """
         engineer_name = "Unknown"
         if service.assigned_to:
@@ -501,28 +651,20 @@ class NotificationService:
             message: Notification message
             params: URL parameters (e.g., {"id": "SR-123"})
         """
-        admin_users = db.query(models.User).filter(
-            models.User.role == models.UserRole.ADMIN,
-            models.User.is_active == True
-        ).all()
-        
         action_url = NotificationRouter.get_action_url(notification_type, params)
         priority = NotificationRouter.get_priority(notification_type)
         icon = NotificationRouter.get_icon(notification_type)
         
-        notifications_created = []
-        for admin in admin_users:
-            notification = NotificationService.create_notification(
-                db=db,
-                user_id=admin.id,
-                title=f"{icon} {title}",
-                message=message,
-                notification_type=notification_type.value,
-                priority=priority,
-                module="admin",
-                action_url=action_url
-            )
-            notifications_created.append(notification)
+        notifications_created = NotificationService.fan_out(
+            db=db,
+            roles=[models.UserRole.ADMIN],
+            title=f"{icon} {title}",
+            message=message,
+            notification_type=notification_type.value,
+            priority=priority,
+            module="admin",
+            action_url=action_url
+        )
         
         logger.info(f"Sent {len(notifications_created)} admin notifications: {notification_type.value}")
         return notifications_created
@@ -0,0 +1,209 @@
+"""
+Real-time Notification Push (Server-Sent Events)
+
+Delivers new Notification rows to connected users over
+/api/notifications/stream instead of having headers poll
+/api/notifications/my-notifications.
+
+Cross-worker fan-out:
+- PostgreSQL: publishers issue pg_notify() inside the same transaction that
+  inserts the notifications, so events are only delivered after commit.
+  Every worker runs one LISTEN thread and forwards events to the users
+  connected to that worker.
+- Other databases (SQLite dev setups): events are dispatched in-process
+  after the session commits, which is correct for a single worker.
+"""
+
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Set, Tuple
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+import models
+from database import engine, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "notification_events"
+# pg_notify payloads must stay below 8000 bytes
+MAX_EVENTS_PER_PAYLOAD = 200
+PENDING_EVENTS_KEY = "pending_notification_events"
+# Most notifications replayed to a reconnecting stream (older ones stay in the list)
+REPLAY_LIMIT = 100
+
+USE_PG_NOTIFY = engine.dialect.name == "postgresql"
+
+
+class NotificationBroker:
+    """Tracks SSE subscribers of this worker and hands them new notifications"""
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=100)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add((loop, queue))
+        if USE_PG_NOTIFY:
+            self._ensure_listener()
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        with self._lock:
+            remaining = {s for s in self._subscribers.get(user_id, ()) if s[1] is not queue}
+            if remaining:
+                self._subscribers[user_id] = remaining
+            else:
+                self._subscribers.pop(user_id, None)
+
+    def connected_users(self) -> Set[int]:
+        with self._lock:
+            return set(self._subscribers)
+
+    def dispatch(self, events: Iterable[Tuple[int, int]]) -> None:
+        """Load the notifications for locally connected users and push them"""
+        connected = self.connected_users()
+        notification_ids = [nid for nid, user_id in events if user_id in connected]
+        if not notification_ids:
+            return
+
+        db = SessionLocal()
+        try:
+            rows = db.query(models.Notification).filter(
+                models.Notification.id.in_(notification_ids)
+            ).order_by(models.Notification.id).all()
+            payloads = [(row.user_id, serialize_notification(row)) for row in rows]
+        finally:
+            db.close()
+
+        with self._lock:
+            targets = {user_id: list(self._subscribers.get(user_id, ())) for user_id, _ in payloads}
+        for user_id, payload in payloads:
+            for loop, queue in targets.get(user_id, ()):
+                loop.call_soon_threadsafe(_offer, queue, payload)
+
+    def _ensure_listener(self) -> None:
+        with self._lock:
+            if self._listener and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(
+                target=self._listen_forever, name="notification-listener", daemon=True
+            )
+            self._listener.start()
+
+    def _listen_forever(self) -> None:
+        """LISTEN on the Postgres channel; reconnects with backoff on failure"""
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = engine.raw_connection()
+                dbapi_conn = conn.dbapi_connection
+                dbapi_conn.autocommit = True
+                cursor = dbapi_conn.cursor()
+                cursor.execute(f"LISTEN {CHANNEL}")
+                logger.info("📡 Notification listener subscribed to Postgres channel")
+                backoff = 1
+                while True:
+                    if select.select([dbapi_conn], [], [], 30) == ([], [], []):
+                        continue
+                    dbapi_conn.poll()
+                    events = []
+                    while dbapi_conn.notifies:
+                        message = dbapi_conn.notifies.pop(0)
+                        events.extend(tuple(e) for e in json.loads(message.payload))
+                    if events:
+                        self.dispatch(events)
+            except Exception as e:
+                logger.warning(f"⚠️ Notification listener error, reconnecting in {backoff}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.invalidate()
+                    except Exception:
+                        pass
+
+
+def serialize_notification(notification: models.Notification) -> dict:
+    """JSON payload with the same fields as schemas.Notification"""
+    return {
+        "id": notification.id,
+        "notification_type": notification.notification_type,
+        "title": notification.title,
+        "message": notification.message,
+        "priority": notification.priority,
+        "module": notification.module,
+        "action_url": notification.action_url,
+        "read_status": bool(notification.read_status),
+        "created_at": notification.created_at.isoformat() if notification.created_at else None
+    }
+
+
+def latest_notification_id(db: Session, user_id: int) -> int:
+    """Highest notification ID of the user (0 when there is none)"""
+    return db.query(func.max(models.Notification.id)).filter(
+        models.Notification.user_id == user_id
+    ).scalar() or 0
+
+
+def notifications_after(db: Session, user_id: int, after_id: int,
+                        limit: int = REPLAY_LIMIT) -> List[dict]:
+    """Payloads of the user's notifications with ID above after_id (newest `limit`), oldest first"""
+    rows = db.query(models.Notification).filter(
+        models.Notification.user_id == user_id,
+        models.Notification.id > after_id
+    ).order_by(models.Notification.id.desc()).limit(limit).all()
+    return [serialize_notification(row) for row in reversed(rows)]
+
+
+def _offer(queue: asyncio.Queue, payload: dict) -> None:
+    """Drop the oldest event rather than block when a client falls behind"""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(payload)
+
+
+broker = NotificationBroker()
+
+
+def publish(db: Session, events: List[Tuple[int, int]]) -> None:
+    """
+    Announce newly inserted notifications as (notification_id, user_id) pairs.
+    Call inside the inserting transaction; delivery happens after commit.
+    """
+    if not events:
+        return
+    if USE_PG_NOTIFY:
+        for start in range(0, len(events), MAX_EVENTS_PER_PAYLOAD):
+            chunk = events[start:start + MAX_EVENTS_PER_PAYLOAD]
+            db.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": CHANNEL, "payload": json.dumps(chunk)}
+            )
+    else:
+        db.info.setdefault(PENDING_EVENTS_KEY, []).extend(events)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_after_commit(session: Session) -> None:
+    events = session.info.pop(PENDING_EVENTS_KEY, None)
+    if events:
+        try:
+            broker.dispatch(events)
+        except Exception as e:
+            logger.error(f"Failed to push notifications: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(PENDING_EVENTS_KEY, None)
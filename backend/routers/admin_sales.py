@@ -7,6 +7,7 @@ import schemas
 import models
 import auth
 from database import get_db
+from sales_analytics import FUNNEL_BUCKETS, sales_funnel, sales_funnel_trend, salesman_performance
 
 router = APIRouter(prefix="/api/admin/sales-performance", tags=["Admin Sales Performance"])
 
@@ -24,81 +25,13 @@ def get_salesman_performance(
     if current_user.role not in [models.UserRole.ADMIN, models.UserRole.RECEPTION]:
         raise HTTPException(status_code=403, detail="Only admin and reception can view sales performance")
     
-    # Get all salesmen
-    salesmen = db.query(models.User).filter(models.User.role == models.UserRole.SALESMAN).all()
-    
-    performance_data = []
-    
-    for salesman in salesmen:
-        # Base query for enquiries
-        enquiry_query = db.query(models.Enquiry).filter(models.Enquiry.assigned_to == salesman.id)
-        
-        # Apply filters
-        if start_date:
-            enquiry_query = enquiry_query.filter(models.Enquiry.created_at >= datetime.fromisoformat(start_date))
-        if end_date:
-            enquiry_query = enquiry_query.filter(models.Enquiry.created_at <= datetime.fromisoformat(end_date))
-        if product_id:
-            enquiry_query = enquiry_query.filter(models.Enquiry.product_id == product_id)
-        if priority:
-            enquiry_query = enquiry_query.filter(models.Enquiry.priority == priority)
-        
-        # Get counts
-        assigned = enquiry_query.count()
-        converted = enquiry_query.filter(models.Enquiry.status == "CONVERTED").count()
-        lost = enquiry_query.filter(models.Enquiry.status == "LOST").count()
-        
-        # Get revenue (from approved orders)
-        revenue_query = db.query(func.sum(models.Order.total_amount)).join(
-            models.Enquiry, models.Order.enquiry_id == models.Enquiry.id
-        ).filter(
-            models.Enquiry.assigned_to == salesman.id,
-            models.Order.status == "APPROVED"
-        )
-        
-        if start_date:
-            revenue_query = revenue_query.filter(models.Order.created_at >= datetime.fromisoformat(start_date))
-        if end_date:
-            revenue_query = revenue_query.filter(models.Order.created_at <= datetime.fromisoformat(end_date))
-        
-        revenue = revenue_query.scalar() or 0
-        
-        # Calculate conversion rate
-        conversion_rate = (converted / assigned * 100) if assigned > 0 else 0
-        
-        # Calculate average closing days
-        converted_enquiries = enquiry_query.filter(models.Enquiry.status == "CONVERTED").all()
-        avg_closing_days = 0
-        if converted_enquiries:
-            total_days = sum([(e.last_follow_up or e.created_at) - e.created_at for e in converted_enquiries], timedelta()).days
-            avg_closing_days = total_days / len(converted_enquiries) if len(converted_enquiries) > 0 else 0
-        
-        # Get visit count
-        visit_count = db.query(models.ShopVisit).filter(
-            models.ShopVisit.salesman_id == salesman.id
-        ).count()
-        
-        # Get missed followups
-        missed_followups = db.query(models.SalesFollowUp).filter(
-            models.SalesFollowUp.salesman_id == salesman.id,
-            models.SalesFollowUp.status == "Pending",
-            models.SalesFollowUp.followup_date < datetime.utcnow()
-        ).count()
-        
-        performance_data.append({
-            "salesman_id": salesman.id,
-            "salesman_name": salesman.full_name or salesman.username,
-            "assigned": assigned,
-            "converted": converted,
-            "conversion_rate": round(conversion_rate, 2),
-            "revenue": revenue,
-            "avg_closing_days": round(avg_closing_days, 2),
-            "missed_followups": missed_followups,
-            "visit_count": visit_count,
-            "lost_count": lost
-        })
-    
-    return performance_data
+    return salesman_performance(
+        db,
+        start_date=datetime.fromisoformat(start_date) if start_date else None,
+        end_date=datetime.fromisoformat(end_date) if end_date else None,
+        product_id=product_id,
+        priority=priority
+    )
 
 @router.get("/funnel", response_model=schemas.SalesFunnelData)
 def get_sales_funnel(
@@ -113,34 +46,45 @@ def get_sales_funnel(
     if current_user.role not in [models.UserRole.ADMIN, models.UserRole.RECEPTION]:
         raise HTTPException(status_code=403, detail="Only admin and reception can view sales funnel")
     
-    query = db.query(models.Enquiry)
+    return sales_funnel(
+        db,
+        salesman_id=salesman_id,
+        start_date=datetime.fromisoformat(start_date) if start_date else None,
+        end_date=datetime.fromisoformat(end_date) if end_date else None
+    )
+
+@router.get("/funnel/trend", response_model=List[schemas.SalesFunnelPeriod])
+def get_sales_funnel_trend(
+    bucket: str = Query("month", description="Bucket size: week or month"),
+    salesman_id: Optional[int] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Sales funnel per week or month - Admin and Reception only
     
-    # Filter by salesman if specified
-    if salesman_id:
-        query = query.filter(models.Enquiry.assigned_to == salesman_id)
+    Defaults to the last 12 buckets when no start_date is given.
+    """
     
-    # Apply date filters
-    if start_date:
-        query = query.filter(models.Enquiry.created_at >= datetime.fromisoformat(start_date))
-    if end_date:
-        query = query.filter(models.Enquiry.created_at <= datetime.fromisoformat(end_date))
+    if current_user.role not in [models.UserRole.ADMIN, models.UserRole.RECEPTION]:
+        raise HTTPException(status_code=403, detail="Only admin and reception can view sales funnel")
     
-    # Count by status
-    new = query.filter(models.Enquiry.status == "NEW").count()
-    contacted = query.filter(models.Enquiry.status == "CONTACTED").count()
-    followup = query.filter(models.Enquiry.status == "FOLLOW_UP").count()
-    quoted = query.filter(models.Enquiry.status == "QUOTED").count()
-    converted = query.filter(models.Enquiry.status == "CONVERTED").count()
-    lost = query.filter(models.Enquiry.status == "LOST").count()
+    if bucket not in FUNNEL_BUCKETS:
+        raise HTTPException(status_code=400, detail="bucket must be 'week' or 'month'")
     
-    return {
-        "new": new,
-        "contacted": contacted,
-        "followup": followup,
-        "quoted": quoted,
-        "converted": converted,
-        "lost": lost
-    }
+    if start_date:
+        start = datetime.fromisoformat(start_date)
+    else:
+        start = datetime.utcnow() - timedelta(weeks=12 if bucket == "week" else 52)
+    
+    return sales_funnel_trend(
+        db,
+        bucket=bucket,
+        salesman_id=salesman_id,
+        start_date=start,
+        end_date=datetime.fromisoformat(end_date) if end_date else None
+    )
 
 @router.get("/salesman/{salesman_id}", response_model=schemas.SalesmanPerformance)
 def get_single_salesman_performance(
@@ -3,14 +3,18 @@ Engineer Performance Analytics Router
 Provides derived analytics for service engineers and admin
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, case
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, case, cast, String
 from database import get_db
 from auth import get_current_user
-from models import User, UserRole, Complaint, Feedback, Attendance, ServiceEngineerDailyReport
+from models import User, UserRole, Complaint, Enquiry, Feedback, Attendance, ServiceEngineerDailyReport
 from datetime import datetime, timedelta, date
 from typing import Optional, List
-from sla_utils import get_engineer_sla_stats, calculate_sla_status
+from sla_utils import (
+    evaluate_sla, sla_bucket_expr, sla_deadline_expr, OPEN_SLA_STATUSES
+)
+from analytics_cache import dashboard_cache
+from analytics_rollup import attendance_fact_totals, service_fact_totals
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 
@@ -44,50 +48,47 @@ def get_my_performance(
     else:
         end = datetime.utcnow()
     
-    # Get jobs assigned to this engineer
-    jobs_query = db.query(Complaint).filter(
-        Complaint.assigned_to == current_user.id,
-        Complaint.created_at >= start,
-        Complaint.created_at <= end
-    )
-    
-    jobs = jobs_query.all()
-    total_jobs = len(jobs)
-    completed_jobs = [j for j in jobs if j.status == 'COMPLETED']
-    completed_count = len(completed_jobs)
-    
-    # Calculate resolution time
-    resolution_times = []
-    for job in completed_jobs:
-        if job.completed_at and job.created_at:
-            delta = job.completed_at - job.created_at
-            resolution_times.append(delta.total_seconds() / 3600)  # hours
+    # Job, SLA and feedback totals from the daily service facts
+    totals = service_fact_totals(db, start.date(), end.date(), engineer_id=current_user.id)
+    facts = db.query(totals).first()
     
-    avg_resolution_time = sum(resolution_times) / len(resolution_times) if resolution_times else 0
+    total_jobs = int(facts.jobs_assigned or 0) if facts else 0
+    completed_count = int(facts.jobs_completed or 0) if facts else 0
+    breached = int(facts.sla_breaches or 0) if facts else 0
+    resolved_jobs = int(facts.resolved_jobs or 0) if facts else 0
+    avg_resolution_time = (
+        facts.resolution_seconds / 3600 / resolved_jobs if resolved_jobs else 0
+    )
     
     # SLA Stats
-    sla_stats = get_engineer_sla_stats(db, current_user.id, start, end)
+    sla_stats = {
+        'total_jobs': total_jobs,
+        'sla_compliant': total_jobs - breached,
+        'sla_warnings': int(facts.sla_warnings or 0) if facts else 0,
+        'sla_breached': breached,
+        'compliance_percentage': round(
+            ((total_jobs - breached) / total_jobs * 100) if total_jobs > 0 else 100, 2
+        )
+    }
     
     # Customer ratings
-    feedbacks = db.query(Feedback).join(Complaint).filter(
-        Complaint.assigned_to == current_user.id,
-        Feedback.created_at >= start,
-        Feedback.created_at <= end
-    ).all()
-    
-    ratings = [f.rating for f in feedbacks if f.rating]
-    avg_rating = sum(ratings) / len(ratings) if ratings else 0
-    negative_feedback_count = sum(1 for f in feedbacks if f.is_negative)
+    ratings_breakdown = {
+        f"{stars}_star": int(getattr(facts, f"rating_{stars}") or 0) if facts else 0
+        for stars in range(5, 0, -1)
+    }
+    rating_count = sum(ratings_breakdown.values())
+    avg_rating = (
+        sum(int(key[0]) * count for key, count in ratings_breakdown.items()) / rating_count
+        if rating_count else 0
+    )
     
     # Attendance
-    attendance_records = db.query(Attendance).filter(
-        Attendance.employee_id == current_user.id,
-        Attendance.date >= start.date(),
-        Attendance.date <= end.date()
-    ).all()
+    attendance = db.query(
+        attendance_fact_totals(db, start.date(), end.date(), employee_id=current_user.id)
+    ).first()
     
     total_days = (end.date() - start.date()).days + 1
-    present_days = sum(1 for a in attendance_records if a.status == 'Present')
+    present_days = int(attendance.present or 0) if attendance else 0
     attendance_percentage = (present_days / total_days * 100) if total_days > 0 else 0
     
     # Daily report discipline
@@ -95,18 +96,22 @@ def get_my_performance(
         ServiceEngineerDailyReport.engineer_id == current_user.id,
         ServiceEngineerDailyReport.report_date >= start.date(),
         ServiceEngineerDailyReport.report_date <= end.date()
-    ).all()
+    ).count()
     
-    report_submission_rate = (len(daily_reports) / total_days * 100) if total_days > 0 else 0
+    report_submission_rate = (daily_reports / total_days * 100) if total_days > 0 else 0
     
     # Repeat complaints (same customer + machine within timeframe)
-    repeat_complaints = 0
-    customer_machine_map = {}
-    for job in sorted(jobs, key=lambda x: x.created_at):
-        key = f"{job.customer_id}_{job.machine_model}"
-        if key in customer_machine_map:
-            repeat_complaints += 1
-        customer_machine_map[key] = job.id
+    machine_key = (
+        func.coalesce(cast(Complaint.customer_id, String), 'None') + '_' +
+        func.coalesce(Complaint.machine_model, 'None')
+    )
+    repeat_complaints = db.query(
+        func.count(Complaint.id) - func.count(func.distinct(machine_key))
+    ).filter(
+        Complaint.assigned_to == current_user.id,
+        Complaint.created_at >= start,
+        Complaint.created_at <= end
+    ).scalar() or 0
     
     # Calculate performance score
     completion_rate = (completed_count / total_jobs * 100) if total_jobs > 0 else 100
@@ -128,24 +133,18 @@ def get_my_performance(
         "job_stats": {
             "total_assigned": total_jobs,
             "completed": completed_count,
-            "in_progress": sum(1 for j in jobs if j.status in ['ASSIGNED', 'ON_THE_WAY', 'IN_PROGRESS']),
-            "on_hold": sum(1 for j in jobs if j.status == 'ON_HOLD'),
+            "in_progress": int(facts.jobs_in_progress or 0) if facts else 0,
+            "on_hold": int(facts.jobs_on_hold or 0) if facts else 0,
             "completion_rate": round(completion_rate, 2),
             "avg_resolution_time_hours": round(avg_resolution_time, 2),
             "repeat_complaints": repeat_complaints
         },
         "sla_performance": sla_stats,
         "customer_satisfaction": {
-            "total_feedbacks": len(feedbacks),
+            "total_feedbacks": int(facts.feedback_count or 0) if facts else 0,
             "average_rating": round(avg_rating, 2),
-            "negative_feedbacks": negative_feedback_count,
-            "ratings_breakdown": {
-                "5_star": sum(1 for r in ratings if r == 5),
-                "4_star": sum(1 for r in ratings if r == 4),
-                "3_star": sum(1 for r in ratings if r == 3),
-                "2_star": sum(1 for r in ratings if r == 2),
-                "1_star": sum(1 for r in ratings if r == 1)
-            }
+            "negative_feedbacks": int(facts.negative_feedbacks or 0) if facts else 0,
+            "ratings_breakdown": ratings_breakdown
         },
         "attendance": {
             "total_days": total_days,
@@ -153,7 +152,7 @@ def get_my_performance(
             "attendance_percentage": round(attendance_percentage, 2)
         },
         "daily_reports": {
-            "submitted": len(daily_reports),
+            "submitted": daily_reports,
             "expected": total_days,
             "submission_rate": round(report_submission_rate, 2)
         },
@@ -165,6 +164,160 @@ def get_my_performance(
 # ADMIN ANALYTICS (RBAC: Admin only)
 # ============================================
 
+def engineer_performance_rows(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    engineer_id: Optional[int] = None,
+    priority: Optional[str] = None
+):
+    """
+    Job, SLA, feedback and attendance aggregates for every service engineer
+    in a single statement: one grouped subquery per source table, outer
+    joined onto the engineers. The query count does not depend on how many
+    engineers there are.
+    
+    Matches the per-engineer definitions used elsewhere: the priority filter
+    applies to job counts only, SLA figures cover every job in the period
+    (as get_engineer_sla_stats does), feedback is filtered on its own
+    created_at, and attendance on its business day (attendance_date), as
+    in the daily facts.
+    """
+    in_period = (Complaint.created_at >= start) & (Complaint.created_at <= end)
+    job_filter = in_period if not priority else in_period & (Complaint.priority == priority)
+    
+    jobs = db.query(
+        Complaint.assigned_to.label("engineer_id"),
+        func.sum(case((job_filter, 1), else_=0)).label("jobs_assigned"),
+        func.sum(case((job_filter & (Complaint.status == 'COMPLETED'), 1), else_=0)).label("jobs_completed"),
+        func.sum(case((in_period, 1), else_=0)).label("sla_jobs"),
+        func.sum(case((in_period & (Complaint.sla_breach_sent == True), 1), else_=0)).label("sla_breaches")
+    ).filter(
+        in_period
+    ).group_by(Complaint.assigned_to).subquery()
+    
+    feedback = db.query(
+        Complaint.assigned_to.label("engineer_id"),
+        func.count(Feedback.id).label("total_feedbacks"),
+        func.avg(case((Feedback.rating > 0, Feedback.rating))).label("average_rating")
+    ).join(
+        Complaint, Feedback.service_request_id == Complaint.id
+    ).filter(
+        Feedback.created_at >= start,
+        Feedback.created_at <= end
+    ).group_by(Complaint.assigned_to).subquery()
+    
+    attendance = db.query(
+        Attendance.employee_id.label("engineer_id"),
+        func.count(Attendance.id).label("present_days")
+    ).filter(
+        Attendance.attendance_date >= start.date(),
+        Attendance.attendance_date <= end.date(),
+        Attendance.status == 'Present'
+    ).group_by(Attendance.employee_id).subquery()
+    
+    query = db.query(
+        User.id,
+        User.full_name,
+        User.email,
+        func.coalesce(jobs.c.jobs_assigned, 0).label("jobs_assigned"),
+        func.coalesce(jobs.c.jobs_completed, 0).label("jobs_completed"),
+        func.coalesce(jobs.c.sla_jobs, 0).label("sla_jobs"),
+        func.coalesce(jobs.c.sla_breaches, 0).label("sla_breaches"),
+        func.coalesce(feedback.c.total_feedbacks, 0).label("total_feedbacks"),
+        feedback.c.average_rating,
+        func.coalesce(attendance.c.present_days, 0).label("present_days")
+    ).outerjoin(
+        jobs, jobs.c.engineer_id == User.id
+    ).outerjoin(
+        feedback, feedback.c.engineer_id == User.id
+    ).outerjoin(
+        attendance, attendance.c.engineer_id == User.id
+    ).filter(User.role == UserRole.SERVICE_ENGINEER)
+    
+    if engineer_id:
+        query = query.filter(User.id == engineer_id)
+    
+    return query.all()
+
+
+def engineer_performance_fact_rows(
+    db: Session,
+    start: date,
+    end: date,
+    engineer_id: Optional[int] = None
+):
+    """
+    Same columns as engineer_performance_rows(), summed from the daily
+    service and attendance facts for start..end (whole days).
+    """
+    service = service_fact_totals(db, start, end, engineer_id)
+    attendance = attendance_fact_totals(db, start, end, engineer_id)
+    rating_count = sum(getattr(service.c, f"rating_{stars}") for stars in range(1, 6))
+    rating_total = sum(stars * getattr(service.c, f"rating_{stars}") for stars in range(1, 6))
+    
+    query = db.query(
+        User.id,
+        User.full_name,
+        User.email,
+        func.coalesce(service.c.jobs_assigned, 0).label("jobs_assigned"),
+        func.coalesce(service.c.jobs_completed, 0).label("jobs_completed"),
+        func.coalesce(service.c.jobs_assigned, 0).label("sla_jobs"),
+        func.coalesce(service.c.sla_breaches, 0).label("sla_breaches"),
+        func.coalesce(service.c.feedback_count, 0).label("total_feedbacks"),
+        (rating_total * 1.0 / func.nullif(rating_count, 0)).label("average_rating"),
+        func.coalesce(attendance.c.present, 0).label("present_days")
+    ).outerjoin(
+        service, service.c.employee_id == User.id
+    ).outerjoin(
+        attendance, attendance.c.employee_id == User.id
+    ).filter(User.role == UserRole.SERVICE_ENGINEER)
+    
+    if engineer_id:
+        query = query.filter(User.id == engineer_id)
+    
+    return query.all()
+
+
+def _score_engineer(row, start: datetime, end: datetime) -> dict:
+    """Leaderboard entry for one engineer_performance_rows() row"""
+    total_jobs = int(row.jobs_assigned)
+    completed_count = int(row.jobs_completed)
+    sla_jobs = int(row.sla_jobs)
+    breaches = int(row.sla_breaches)
+    avg_rating = float(row.average_rating or 0)
+    
+    sla_compliance = round((sla_jobs - breaches) / sla_jobs * 100, 2) if sla_jobs > 0 else 100
+    
+    total_days = (end.date() - start.date()).days + 1
+    attendance_percentage = (row.present_days / total_days * 100) if total_days > 0 else 0
+    
+    # Performance score
+    completion_rate = (completed_count / total_jobs * 100) if total_jobs > 0 else 100
+    performance_score = (
+        (completion_rate * 0.30) +
+        (sla_compliance * 0.30) +
+        (attendance_percentage * 0.20) +
+        (avg_rating / 5 * 100 * 0.20)
+    )
+    
+    return {
+        "engineer_id": row.id,
+        "engineer_name": row.full_name,
+        "email": row.email,
+        "jobs_assigned": total_jobs,
+        "jobs_completed": completed_count,
+        "completion_rate": round(completion_rate, 2),
+        "sla_compliance": round(sla_compliance, 2),
+        "sla_breaches": breaches,
+        "average_rating": round(avg_rating, 2),
+        "total_feedbacks": int(row.total_feedbacks),
+        "attendance_percentage": round(attendance_percentage, 2),
+        "performance_score": round(performance_score, 2)
+    }
+
+
+
 @router.get("/admin/engineer-performance")
 def get_all_engineers_performance(
     start_date: Optional[str] = Query(None),
@@ -192,78 +345,13 @@ def get_all_engineers_performance(
     else:
         end = datetime.utcnow()
     
-    # Get all service engineers or specific engineer
-    engineers_query = db.query(User).filter(User.role == UserRole.SERVICE_ENGINEER)
-    if engineer_id:
-        engineers_query = engineers_query.filter(User.id == engineer_id)
-    
-    engineers = engineers_query.all()
-    
-    results = []
+    if priority:
+        # Daily facts are not split by priority; aggregate the raw tables
+        rows = engineer_performance_rows(db, start, end, engineer_id, priority)
+    else:
+        rows = engineer_performance_fact_rows(db, start.date(), end.date(), engineer_id)
     
-    for engineer in engineers:
-        # Get jobs for this engineer
-        jobs_query = db.query(Complaint).filter(
-            Complaint.assigned_to == engineer.id,
-            Complaint.created_at >= start,
-            Complaint.created_at <= end
-        )
-        
-        if priority:
-            jobs_query = jobs_query.filter(Complaint.priority == priority)
-        
-        jobs = jobs_query.all()
-        total_jobs = len(jobs)
-        completed_jobs = [j for j in jobs if j.status == 'COMPLETED']
-        completed_count = len(completed_jobs)
-        
-        # SLA Stats
-        sla_stats = get_engineer_sla_stats(db, engineer.id, start, end)
-        
-        # Customer ratings
-        feedbacks = db.query(Feedback).join(Complaint).filter(
-            Complaint.assigned_to == engineer.id,
-            Feedback.created_at >= start,
-            Feedback.created_at <= end
-        ).all()
-        
-        ratings = [f.rating for f in feedbacks if f.rating]
-        avg_rating = sum(ratings) / len(ratings) if ratings else 0
-        
-        # Attendance
-        attendance_records = db.query(Attendance).filter(
-            Attendance.employee_id == engineer.id,
-            Attendance.date >= start.date(),
-            Attendance.date <= end.date(),
-            Attendance.status == 'Present'
-        ).count()
-        
-        total_days = (end.date() - start.date()).days + 1
-        attendance_percentage = (attendance_records / total_days * 100) if total_days > 0 else 0
-        
-        # Performance score
-        completion_rate = (completed_count / total_jobs * 100) if total_jobs > 0 else 100
-        performance_score = (
-            (completion_rate * 0.30) +
-            (sla_stats['compliance_percentage'] * 0.30) +
-            (attendance_percentage * 0.20) +
-            (avg_rating / 5 * 100 * 0.20)
-        )
-        
-        results.append({
-            "engineer_id": engineer.id,
-            "engineer_name": engineer.full_name,
-            "email": engineer.email,
-            "jobs_assigned": total_jobs,
-            "jobs_completed": completed_count,
-            "completion_rate": round(completion_rate, 2),
-            "sla_compliance": round(sla_stats['compliance_percentage'], 2),
-            "sla_breaches": sla_stats['sla_breached'],
-            "average_rating": round(avg_rating, 2),
-            "total_feedbacks": len(feedbacks),
-            "attendance_percentage": round(attendance_percentage, 2),
-            "performance_score": round(performance_score, 2)
-        })
+    results = [_score_engineer(row, start, end) for row in rows]
     
     # Sort by performance score
     results.sort(key=lambda x: x['performance_score'], reverse=True)
@@ -283,46 +371,54 @@ def get_sla_status(
     status: Optional[str] = Query(None, description="Filter by: ok, warning, breached"),
     priority: Optional[str] = Query(None),
     engineer_id: Optional[int] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Get current SLA status for all active service requests (Admin/Reception)
     RBAC: ADMIN, RECEPTION
+
+    Classification, status filtering, urgency ordering and paging run in SQL;
+    stats are per-bucket counts over the priority/engineer filtered jobs.
     """
     if current_user.role not in [UserRole.ADMIN, UserRole.RECEPTION]:
         raise HTTPException(status_code=403, detail="Admin or Reception access required")
     
-    # Get all active service requests
-    query = db.query(Complaint).filter(
-        Complaint.status.in_(['ASSIGNED', 'ON_THE_WAY', 'IN_PROGRESS'])
-    )
+    now = datetime.utcnow()
+    bucket = sla_bucket_expr(now)
     
+    filters = [Complaint.status.in_(OPEN_SLA_STATUSES)]
     if priority:
-        query = query.filter(Complaint.priority == priority)
-    
+        filters.append(Complaint.priority == priority)
     if engineer_id:
-        query = query.filter(Complaint.assigned_to == engineer_id)
-    
-    complaints = query.all()
+        filters.append(Complaint.assigned_to == engineer_id)
     
-    results = []
     stats = {
         'ok': 0,
         'warning': 0,
         'breached': 0,
         'paused': 0
     }
+    for sla_status, count in db.query(bucket, func.count(Complaint.id)).filter(*filters).group_by(bucket).all():
+        stats[sla_status] = count
+    
+    if status:
+        filters.append(bucket == status)
+        total = stats.get(status, 0)
+    else:
+        total = stats['ok'] + stats['warning'] + stats['breached']
     
-    for complaint in complaints:
-        sla_status = calculate_sla_status(complaint)
-        
-        # Filter by status if requested
-        if status and sla_status['status'] != status:
-            continue
-        
-        stats[sla_status['status']] = stats.get(sla_status['status'], 0) + 1
-        
+    # Most urgent (earliest deadline) first
+    complaints = db.query(Complaint).options(
+        joinedload(Complaint.assigned_engineer)
+    ).filter(*filters).order_by(
+        sla_deadline_expr(db), Complaint.id
+    ).offset(skip).limit(limit).all()
+    
+    results = []
+    for complaint, sla_status in zip(complaints, evaluate_sla(complaints, now)):
         results.append({
             "ticket_no": complaint.ticket_no,
             "customer_name": complaint.customer_name,
@@ -337,12 +433,11 @@ def get_sla_status(
             "percentage_remaining": sla_status['percentage_remaining']
         })
     
-    # Sort by remaining time (most urgent first)
-    results.sort(key=lambda x: x['remaining_hours'] if x['remaining_hours'] else 0)
-    
     return {
-        "total_active_jobs": len(results),
+        "total_active_jobs": total,
         "stats": stats,
+        "skip": skip,
+        "limit": limit,
         "jobs": results
     }
 
@@ -404,31 +499,49 @@ def get_admin_dashboard_analytics(
     if current_user.role not in [UserRole.ADMIN, UserRole.RECEPTION]:
         raise HTTPException(status_code=403, detail="Admin or Reception access required")
     
+    today = date.today()
+    return dashboard_cache.get_or_compute(
+        ("dashboard", today), lambda: _dashboard_aggregates(db, today)
+    )
+
+
+def _dashboard_aggregates(db: Session, today: date) -> dict:
+    """Dashboard counts as SQL conditional aggregates (no rows are loaded)"""
     # Sales Analytics
-    from models import Enquiry, Order
-    enquiries = db.query(Enquiry).all()
-    orders = db.query(Order).all()
+    sales = db.query(
+        func.count(Enquiry.id),
+        func.sum(case((Enquiry.status == 'CONVERTED', 1), else_=0)),
+        func.sum(case((Enquiry.status.in_(['NEW', 'PENDING', 'CONTACTED', 'QUALIFIED']), 1), else_=0))
+    ).one()
     
     sales_analytics = {
-        "total_enquiries": len(enquiries),
-        "converted": len([e for e in enquiries if e.status == 'CONVERTED']),
-        "pending": len([e for e in enquiries if e.status in ['NEW', 'PENDING', 'CONTACTED', 'QUALIFIED']])
+        "total_enquiries": sales[0],
+        "converted": int(sales[1] or 0),
+        "pending": int(sales[2] or 0)
     }
     
     # Service Analytics
-    service_requests = db.query(Complaint).all()
+    service = db.query(
+        func.count(Complaint.id),
+        func.sum(case((Complaint.status == 'COMPLETED', 1), else_=0)),
+        func.sum(case((Complaint.sla_breach_sent == True, 1), else_=0))
+    ).one()
+    
+    completed = int(service[1] or 0)
     service_analytics = {
-        "total_requests": len(service_requests),
-        "completed": len([s for s in service_requests if s.status == 'COMPLETED']),
-        "pending": len([s for s in service_requests if s.status != 'COMPLETED']),
-        "sla_breached": len([s for s in service_requests if s.sla_breach_sent])
+        "total_requests": service[0],
+        "completed": completed,
+        "pending": service[0] - completed,
+        "sla_breached": int(service[2] or 0)
     }
     
     # Attendance Analytics
-    today = date.today()
-    attendance_records = db.query(Attendance).filter(
+    attendance = db.query(
+        func.sum(case((Attendance.status.in_(['Present', 'On Time']), 1), else_=0)),
+        func.sum(case((Attendance.status == 'Late', 1), else_=0))
+    ).filter(
         func.date(Attendance.date) == today
-    ).all()
+    ).one()
     
     total_staff = db.query(User).filter(
         User.is_active == True,
@@ -437,8 +550,8 @@ def get_admin_dashboard_analytics(
     
     attendance_analytics = {
         "total_staff": total_staff,
-        "present_today": len([a for a in attendance_records if a.status in ['Present', 'On Time']]),
-        "late_today": len([a for a in attendance_records if a.status == 'Late'])
+        "present_today": int(attendance[0] or 0),
+        "late_today": int(attendance[1] or 0)
     }
     
     return {
@@ -9,7 +9,7 @@ from sqlalchemy import func
 from typing import List, Optional
 from datetime import datetime
 from database import get_db
-from models import AuditLog, User, UserRole
+from models import AccessCounter, AuditLog, User, UserRole
 from auth import get_current_user
 from pydantic import BaseModel
 
@@ -92,6 +92,51 @@ def get_record_history(
     return logs
 
 
+class AccessCounterResponse(BaseModel):
+    user_id: int
+    username: Optional[str]
+    module: str
+    hour: datetime
+    view_count: int
+    first_seen: Optional[datetime]
+    last_seen: Optional[datetime]
+    ip_address: Optional[str]
+    
+    class Config:
+        from_attributes = True
+
+
+@router.get("/access-counters", response_model=List[AccessCounterResponse])
+def get_access_counters(
+    module: Optional[str] = None,
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get hourly list-view counters (Admin only)"""
+    
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin can view access counters"
+        )
+    
+    query = db.query(AccessCounter).order_by(AccessCounter.hour.desc(), AccessCounter.view_count.desc())
+    
+    if module:
+        query = query.filter(AccessCounter.module == module)
+    
+    if user_id:
+        query = query.filter(AccessCounter.user_id == user_id)
+    
+    if since:
+        query = query.filter(AccessCounter.hour >= since.replace(minute=0, second=0, microsecond=0))
+    
+    return query.limit(limit).all()
+
+
 @router.get("/stats")
 def get_audit_stats(
     db: Session = Depends(get_db),
@@ -8,6 +8,7 @@ from pydantic import BaseModel
 from database import get_db
 from models import ReceptionCall, User, UserRole, CallOutcome, ProductCondition, Complaint
 from auth import get_current_user
+from id_allocator import next_ticket_no
 
 router = APIRouter(prefix="/api/calls", tags=["calls"])
 
@@ -165,9 +166,7 @@ async def create_monthly_followup(
         # If service needed, create service complaint
         if followup.product_condition == "SERVICE_NEEDED":
             # Generate unique ticket number
-            import random
-            import string
-            ticket_no = f"SR{datetime.now().strftime('%Y%m%d%H%M%S')}{random.randint(1000, 9999)}"
+            ticket_no = next_ticket_no(db)
             
             complaint = Complaint(
                 ticket_no=ticket_no,
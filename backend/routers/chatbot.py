@@ -5,7 +5,7 @@ Production-ready endpoints for Yamini Infotech ERP
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import case, func, update
 from typing import List, Optional
 from datetime import datetime, timedelta
 import uuid
@@ -15,12 +15,22 @@ from database import get_db
 from auth import require_admin
 import models
 import schemas
+from id_allocator import allocate_id
 from services.chatbot_ai import (
+    CHATBOT_INDEX_CHECK_SECONDS,
+    EMBEDDING_MODEL_NAME,
+    VECTOR_SEARCH_AVAILABLE,
+    FAISSVectorStore,
+    blob_to_vector,
+    content_hash,
+    vector_to_blob,
     get_vector_store,
     get_mistral_service,
     get_language_detector,
     get_intent_detector
 )
+from services.lexical_search import fuse_results, get_lexical_retriever
+from services.answer_cache import get_answer_cache
 
 router = APIRouter(prefix="/api/chatbot", tags=["chatbot"])
 
@@ -85,46 +95,83 @@ def send_chat_message(
         db.add(customer_msg)
         print("  ✓ Message saved")
         
-        print("  Step 4: Vector search...")
-        # 4. Vector search for relevant knowledge
-        relevant_docs = []
+        print("  Step 4: Checking answer cache...")
+        # 4. Answer cache - repeated questions skip retrieval, history and the LLM.
+        # Only a session's first turn uses it: later replies are generated from
+        # the visitor's earlier messages (name, phone, previous questions), which
+        # must not be served to anyone else, and a follow-up needs that context.
+        answer_cache = get_answer_cache()
+        first_turn = not session.message_count
+        query_embedding = None
+        cached = None
         try:
-            # Skip vector search for now - using simple fallback
-            print("  ⚠️ Skipping vector search (using fallback mode)")
-            # vector_store = get_vector_store()
-            # relevant_docs = vector_store.search(
-            #     query=request.message,
-            #     language=language,
-            #     top_k=5
-            # )
-            print(f"  ✓ Using fallback mode (0 vector documents)")
+            # Refreshes the BM25 index and drops cache entries of edited knowledge
+            _lexical_retriever(db)
+            if VECTOR_SEARCH_AVAILABLE:
+                query_embedding = get_vector_store().embedding_service.encode(request.message)
+            if first_turn:
+                cached = answer_cache.get(request.message, language, embedding=query_embedding)
         except Exception as e:
-            print(f"  ⚠️ Vector search failed: {e}, continuing without context")
-            relevant_docs = []
-        
-        print("  Step 5: Getting conversation history...")
-        # 5. Get conversation history
-        history = db.query(models.ChatMessage).filter(
-            models.ChatMessage.session_id == session.id
-        ).order_by(models.ChatMessage.sent_at.desc()).limit(10).all()
-        
-        conversation_history = [
-            {'role': 'assistant' if msg.sender == 'bot' else 'user', 
-             'content': msg.message}
-            for msg in reversed(history)
-        ]
-        print(f"  ✓ Got {len(history)} messages")
+            print(f"  ⚠️ Answer cache lookup failed: {e}")
         
-        print("  Step 6: Generating AI response with Mistral...")
-        # 6. Generate AI response
-        mistral_service = get_mistral_service()
-        reply_text, confidence = mistral_service.generate_response(
-            user_message=request.message,
-            context_docs=relevant_docs,
-            language=language,
-            conversation_history=conversation_history
-        )
-        print(f"  ✓ AI Response generated (confidence: {confidence})")
+        history = None
+        if cached:
+            relevant_docs = [{'id': doc_id} for doc_id in cached['doc_ids']]
+            reply_text, confidence = cached['reply'], cached['confidence']
+            print(f"  ✓ Cached answer (confidence: {confidence})")
+        else:
+            print("  Step 5: Knowledge retrieval...")
+            # 5. Hybrid retrieval: BM25 on every tier, fused with vector search when installed
+            relevant_docs = []
+            try:
+                relevant_docs = _lexical_retriever(db).search(
+                    query=request.message,
+                    language=language,
+                    top_k=5
+                )
+                if VECTOR_SEARCH_AVAILABLE:
+                    try:
+                        vector_docs = _vector_store(db).search(
+                            query=request.message,
+                            language=language,
+                            top_k=5,
+                            query_embedding=query_embedding
+                        )
+                        relevant_docs = fuse_results(relevant_docs, vector_docs, top_k=5)
+                    except Exception as e:
+                        print(f"  ⚠️ Vector search failed: {e}, using BM25 results only")
+                print(f"  ✓ Retrieved {len(relevant_docs)} knowledge documents")
+            except Exception as e:
+                print(f"  ⚠️ Knowledge retrieval failed: {e}, continuing without context")
+                relevant_docs = []
+            
+            print("  Step 6: Getting conversation history...")
+            # 6. Get conversation history
+            history = _recent_messages(db, session.id)
+            
+            conversation_history = [
+                {'role': 'assistant' if msg.sender == 'bot' else 'user', 
+                 'content': msg.message}
+                for msg in reversed(history)
+            ]
+            print(f"  ✓ Got {len(history)} messages")
+            
+            print("  Step 7: Generating AI response with Mistral...")
+            # 7. Generate AI response (first-turn replies are cached unless the API call failed)
+            mistral_service = get_mistral_service()
+            reply_text, confidence, reusable = mistral_service.generate_response_with_status(
+                user_message=request.message,
+                context_docs=relevant_docs,
+                language=language,
+                conversation_history=conversation_history
+            )
+            if reusable and first_turn:
+                answer_cache.put(
+                    request.message, language, reply_text, confidence,
+                    doc_ids=[doc['id'] for doc in relevant_docs],
+                    embedding=query_embedding
+                )
+            print(f"  ✓ AI Response generated (confidence: {confidence})")
         
         # 7. Detect intent
         intent_detector = get_intent_detector()
@@ -145,7 +192,8 @@ def send_chat_message(
             confidence_score=confidence,
             knowledge_docs_used=json.dumps([doc['id'] for doc in relevant_docs]),
             triggered_handoff=should_handoff,
-            handoff_reason=handoff_reason if should_handoff else None
+            handoff_reason=handoff_reason if should_handoff else None,
+            answer_cached=cached is not None
         )
         db.add(bot_msg)
         
@@ -155,7 +203,7 @@ def send_chat_message(
         
         if intent in ['enquiry', 'service'] and confidence > 0.6:
             enquiry = models.Enquiry(
-                enquiry_id=f"ENQ-CHAT-{datetime.now().strftime('%Y%m%d%H%M%S')}",
+                enquiry_id=allocate_id(db, "ENQ-CHAT-", models.Enquiry.enquiry_id),
                 customer_name=request.customer_name or "Chat Customer",
                 phone=request.customer_phone,
                 email=request.customer_email,
@@ -176,6 +224,8 @@ def send_chat_message(
         
         # 11. Create handoff if needed
         if should_handoff:
+            if history is None:
+                history = _recent_messages(db, session.id)
             handoff = models.ChatbotHandoff(
                 session_id=session.id,
                 reason=handoff_reason,
@@ -201,14 +251,16 @@ def send_chat_message(
             # Rolling average
             session.avg_confidence = (session.avg_confidence * 0.8) + (confidence * 0.2)
         
-        # 13. Update knowledge usage stats
-        for doc in relevant_docs:
-            kb_doc = db.query(models.ChatbotKnowledge).filter(
-                models.ChatbotKnowledge.id == doc['id']
-            ).first()
-            if kb_doc:
-                kb_doc.usage_count += 1
-                kb_doc.last_used_at = datetime.utcnow()
+        # 13. Update knowledge usage stats (one UPDATE; updated_at is kept so the
+        # retrieval indexes do not treat usage as a content change)
+        if relevant_docs:
+            db.query(models.ChatbotKnowledge).filter(
+                models.ChatbotKnowledge.id.in_({doc['id'] for doc in relevant_docs})
+            ).update({
+                models.ChatbotKnowledge.usage_count: func.coalesce(models.ChatbotKnowledge.usage_count, 0) + 1,
+                models.ChatbotKnowledge.last_used_at: datetime.utcnow(),
+                models.ChatbotKnowledge.updated_at: models.ChatbotKnowledge.updated_at
+            }, synchronize_session=False)
         
         db.commit()
         
@@ -320,8 +372,8 @@ def create_knowledge(
     db.commit()
     db.refresh(kb)
     
-    # Rebuild vector index
-    _rebuild_vector_index(db)
+    # Index the new document
+    _sync_vector_index(db, kb)
     
     return kb
 
@@ -351,8 +403,8 @@ def update_knowledge(
     db.commit()
     db.refresh(kb)
     
-    # Rebuild vector index
-    _rebuild_vector_index(db)
+    # Re-index just this document
+    _sync_vector_index(db, kb)
     
     return kb
 
@@ -375,8 +427,8 @@ def delete_knowledge(
     db.delete(kb)
     db.commit()
     
-    # Rebuild vector index
-    _rebuild_vector_index(db)
+    # Drop it from the indexes
+    _remove_from_vector_index(kb_id)
     
     return {"message": "Knowledge document deleted"}
 
@@ -386,10 +438,13 @@ def rebuild_vector_index(
     current_user = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
-    """Manually rebuild FAISS vector index - Admin only"""
+    """Manually rebuild FAISS vector index (and the BM25 index) - Admin only"""
     
     try:
+        get_lexical_retriever().invalidate()
         _rebuild_vector_index(db)
+        if not VECTOR_SEARCH_AVAILABLE:
+            return {"message": "Vector search not installed - BM25 index will be rebuilt on the next chat"}
         return {"message": "Vector index rebuilt successfully"}
     except Exception as e:
         raise HTTPException(
@@ -526,6 +581,16 @@ def get_chatbot_analytics(
         models.ChatMessage.sent_at >= since
     ).scalar() or 0.0
     
+    # Answer cache (bot replies served without retrieval / LLM call)
+    bot_replies, cached_replies = db.query(
+        func.count(models.ChatMessage.id),
+        func.sum(case((models.ChatMessage.answer_cached == True, 1), else_=0))
+    ).filter(
+        models.ChatMessage.sender == 'bot',
+        models.ChatMessage.sent_at >= since
+    ).one()
+    cached_replies = cached_replies or 0
+    
     return {
         "period_days": days,
         "sessions": {
@@ -546,7 +611,13 @@ def get_chatbot_analytics(
         "conversion_rate": round((enquiries_from_chat / max(total_sessions, 1)) * 100, 1),
         "avg_confidence": round(avg_confidence, 2),
         "language_distribution": {lang: count for lang, count in lang_stats},
-        "top_intents": [{"intent": intent, "count": count} for intent, count in intent_stats]
+        "top_intents": [{"intent": intent, "count": count} for intent, count in intent_stats],
+        "answer_cache": {
+            "replies": bot_replies,
+            "hits": cached_replies,
+            "hit_rate": round((cached_replies / max(bot_replies, 1)) * 100, 1),
+            "this_worker": get_answer_cache().snapshot()
+        }
     }
 
 
@@ -554,31 +625,137 @@ def get_chatbot_analytics(
 # HELPER FUNCTIONS
 # ============================================================================
 
+def _recent_messages(db: Session, session_id: int) -> List[models.ChatMessage]:
+    """Last 10 messages of a chat session, newest first"""
+    return db.query(models.ChatMessage).filter(
+        models.ChatMessage.session_id == session_id
+    ).order_by(models.ChatMessage.sent_at.desc()).limit(10).all()
+
+
+def _knowledge_fields(doc: models.ChatbotKnowledge) -> dict:
+    """Knowledge row in the dict format the retrieval indexes use"""
+    return {
+        'id': doc.id,
+        'title': doc.title,
+        'content': doc.content,
+        'content_en': doc.content_en,
+        'content_ta': doc.content_ta,
+        'category': doc.category,
+        'keywords': doc.keywords,
+        'is_active': doc.is_active,
+        'updated_at': doc.updated_at
+    }
+
+
+def _knowledge_dict(doc: models.ChatbotKnowledge) -> dict:
+    """Knowledge row for the vector store, with still-valid stored vectors"""
+    data = _knowledge_fields(doc)
+    data['vectors'] = {}
+    if doc.embedding_model == EMBEDDING_MODEL_NAME:
+        stored = {
+            'en': (doc.embedding_en, doc.embedding_en_hash),
+            'ta': (doc.embedding_ta, doc.embedding_ta_hash)
+        }
+        for language, text in FAISSVectorStore.knowledge_texts(data).items():
+            blob, digest = stored[language]
+            if digest == content_hash(text):
+                data['vectors'][language] = blob_to_vector(blob, get_vector_store().dimension)
+    return data
+
+
+def _save_embeddings(db: Session, rows: List[models.ChatbotKnowledge], docs: List[dict]):
+    """Persist vectors encoded while indexing so unchanged content is never re-encoded"""
+    changed = []
+    for row, doc in zip(rows, docs):
+        values = {'embedding_model': EMBEDDING_MODEL_NAME}
+        texts = FAISSVectorStore.knowledge_texts(doc)
+        for language in ('en', 'ta'):
+            text = texts.get(language)
+            vector = doc['vectors'].get(language)
+            values[f'embedding_{language}'] = vector_to_blob(vector) if text and vector is not None else None
+            values[f'embedding_{language}_hash'] = content_hash(text) if text and vector is not None else None
+        if any(getattr(row, column) != value for column, value in values.items()):
+            changed.append((row.id, values))
+    
+    # Zero vectors from a model that failed to load are not worth keeping
+    if not changed or not get_vector_store().embedding_service.available:
+        return
+    for kb_id, values in changed:
+        db.execute(
+            update(models.ChatbotKnowledge)
+            .where(models.ChatbotKnowledge.id == kb_id)
+            # Keep updated_at: storing an embedding is not a content edit
+            .values(**values, updated_at=models.ChatbotKnowledge.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+
+
 def _rebuild_vector_index(db: Session):
-    """Rebuild FAISS vector index from database"""
+    """Rebuild FAISS vector index from database (only new or edited content is encoded)"""
+    if not VECTOR_SEARCH_AVAILABLE:
+        return
     vector_store = get_vector_store()
     
     # Get all active knowledge documents
-    docs = db.query(models.ChatbotKnowledge).filter(
+    rows = db.query(models.ChatbotKnowledge).filter(
         models.ChatbotKnowledge.is_active == True
     ).all()
+    docs = [_knowledge_dict(row) for row in rows]
     
-    # Convert to dict format
-    doc_list = [
-        {
-            'id': doc.id,
-            'title': doc.title,
-            'content': doc.content,
-            'content_en': doc.content_en,
-            'content_ta': doc.content_ta,
-            'category': doc.category,
-            'keywords': doc.keywords,
-            'is_active': doc.is_active
-        }
-        for doc in docs
-    ]
-    
-    vector_store.rebuild_index(doc_list)
+    vector_store.rebuild_index(docs)
+    _save_embeddings(db, rows, docs)
+
+
+def _sync_vector_index(db: Session, kb: models.ChatbotKnowledge):
+    """Re-index one edited knowledge document (full rebuild only when no index exists yet)"""
+    get_lexical_retriever().invalidate()
+    if not VECTOR_SEARCH_AVAILABLE:
+        return
+    vector_store = get_vector_store()
+    if vector_store.version is None:
+        _rebuild_vector_index(db)
+        return
+    doc = _knowledge_dict(kb)
+    vector_store.upsert_document(doc)
+    if kb.is_active:
+        _save_embeddings(db, [kb], [doc])
+
+
+def _remove_from_vector_index(kb_id: int):
+    """Drop a deleted knowledge document from the retrieval indexes"""
+    get_lexical_retriever().invalidate()
+    if VECTOR_SEARCH_AVAILABLE:
+        get_vector_store().remove_document(kb_id)
+
+
+def _vector_store(db: Session) -> FAISSVectorStore:
+    """Vector store for queries; built from stored embeddings if nothing is published yet"""
+    vector_store = get_vector_store()
+    if vector_store.version is None:
+        _rebuild_vector_index(db)
+    return vector_store
+
+
+def _lexical_retriever(db: Session):
+    """BM25 retriever, rebuilt when the active knowledge base changed (checked every few seconds)"""
+    retriever = get_lexical_retriever(CHATBOT_INDEX_CHECK_SECONDS)
+    if not retriever.is_stale():
+        return retriever
+    
+    active = db.query(models.ChatbotKnowledge).filter(models.ChatbotKnowledge.is_active == True)
+    signature = tuple(active.with_entities(
+        func.count(models.ChatbotKnowledge.id),
+        func.max(models.ChatbotKnowledge.updated_at),
+        func.sum(models.ChatbotKnowledge.id)
+    ).one())
+    if signature == retriever.signature:
+        retriever.mark_checked()
+    else:
+        changed = retriever.rebuild([_knowledge_fields(doc) for doc in active.all()], signature)
+        # Cached answers built on edited, removed or (for ungrounded ones) new documents are stale
+        get_answer_cache().invalidate_documents(changed)
+    return retriever
 
 
 def _generate_suggestions(intent: str, language: str) -> List[str]:
@@ -5,7 +5,6 @@ Handles invoice creation, viewing, and payment tracking
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from typing import List
 from datetime import datetime
 import models
@@ -13,6 +12,7 @@ import schemas
 import auth
 from database import get_db
 from audit_logger import log_action
+from id_allocator import next_invoice_number, next_order_id
 
 router = APIRouter(prefix="/api/invoices", tags=["Invoices"])
 
@@ -73,15 +73,9 @@ def create_invoice(
     Creates an order-based invoice
     """
     try:
-        # Generate invoice number
-        invoice_count = db.query(func.count(models.Order.id)).filter(
-            models.Order.invoice_generated == True
-        ).scalar()
-        invoice_number = f"INV-{invoice_count + 1}"
-        
-        # Generate order ID
-        order_count = db.query(func.count(models.Order.id)).scalar()
-        order_id = f"ORD-{order_count + 1}"
+        # Generate invoice number and order ID
+        invoice_number = next_invoice_number(db)
+        order_id = next_order_id(db)
         
         # Create order with invoice
         new_order = models.Order(
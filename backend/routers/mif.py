@@ -33,7 +33,8 @@ def get_mif_records(
         user_id=current_user.id,
         ip_address=ip_address,
         skip=skip, 
-        limit=limit
+        limit=limit,
+        username=current_user.username
     )
 
 @router.get("/access-logs")
@@ -84,16 +85,19 @@ def delete_mif_record(
 @router.get("/{mif_id}/pdf")
 def get_mif_pdf(
     mif_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.require_mif_access)
 ):
-    """Get MIF record as PDF (Admin + Reception)"""
+    """Get MIF record as PDF (Admin + Reception - ACCESS LOGGED per record)"""
     from fastapi.responses import HTMLResponse
     
     mif = db.query(models.MIFRecord).filter(models.MIFRecord.id == mif_id).first()
     if not mif:
         raise HTTPException(status_code=404, detail="MIF record not found")
     
+    crud.log_mif_access(db, mif.id, current_user.id, "Viewed MIF Record", request.client.host)
+    
     # Return HTML view of MIF (for now)
     # In production, generate actual PDF
     html_content = f"""
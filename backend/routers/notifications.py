@@ -1,11 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime
+from typing import List, Optional
+import asyncio
+import base64
+import json
 import schemas
 import crud
 import models
 import auth
-from database import get_db
+import notification_stream
+from database import get_db, SessionLocal
+
+# Comment frame sent on idle connections so proxies keep the stream open
+STREAM_HEARTBEAT_SECONDS = 25
 
 router = APIRouter(prefix="/api/notifications", tags=["Notifications"])
 
@@ -31,6 +40,58 @@ def get_my_notifications(
         unread_only=unread_only
     )
 
+def _encode_cursor(cursor) -> Optional[str]:
+    if not cursor:
+        return None
+    created_at, notification_id = cursor
+    raw = f"{created_at.isoformat()}|{notification_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: Optional[str]):
+    if not cursor:
+        return None
+    try:
+        created_at, notification_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(notification_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/feed", response_model=schemas.NotificationFeed)
+def get_notification_feed(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    unread_only: bool = False,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Cursor-paginated notifications for current user, newest first"""
+    items, next_cursor = crud.get_notifications_page(
+        db,
+        user_id=current_user.id,
+        limit=limit,
+        cursor=_decode_cursor(cursor),
+        unread_only=unread_only
+    )
+    return {"items": items, "next_cursor": _encode_cursor(next_cursor)}
+
+@router.get("/unread-count")
+def get_unread_count(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Unread badge count for current user (maintained counter, no table scan)"""
+    return {"unread_count": crud.get_unread_count(db, current_user.id)}
+
+@router.put("/read-all")
+def mark_all_notifications_read(
+    up_to_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Mark all (or all up to up_to_id) of current user's notifications as read"""
+    updated = crud.mark_notifications_read(db, user_id=current_user.id, up_to_id=up_to_id)
+    return {"updated": updated, "unread_count": crud.get_unread_count(db, current_user.id)}
+
 @router.put("/{notification_id}/read")
 def mark_notification_read(
     notification_id: int,
@@ -38,7 +99,84 @@ def mark_notification_read(
     current_user: models.User = Depends(auth.get_current_user)
 ):
     """Mark notification as read"""
-    notification = crud.mark_notification_read(db, notification_id=notification_id)
+    notification = crud.mark_notification_read(
+        db, notification_id=notification_id, user_id=current_user.id
+    )
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
     return notification
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    token: Optional[str] = None,
+    header_token: Optional[str] = Depends(auth.oauth2_scheme_optional)
+):
+    """
+    Server-Sent Events stream of new notifications for the current user.
+    EventSource cannot set headers, so the JWT may be passed as ?token=.
+    
+    Every event carries its notification ID (the ready event carries the
+    latest one), so a reconnecting browser sends Last-Event-ID and receives
+    the notifications published while it was away.
+    """
+    token = header_token or token
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    db = SessionLocal()
+    try:
+        current_user = await auth.get_current_user(token=token, db=db)
+        user_id = current_user.id
+        after_id = _last_event_id(request)
+        if after_id is None:
+            after_id = notification_stream.latest_notification_id(db, user_id)
+    finally:
+        db.close()
+
+    # Subscribe before reading the backlog so nothing published in between is lost
+    queue = notification_stream.broker.subscribe(user_id)
+    db = SessionLocal()
+    try:
+        missed = notification_stream.notifications_after(db, user_id, after_id)
+    except Exception:
+        notification_stream.broker.unsubscribe(user_id, queue)
+        raise
+    finally:
+        db.close()
+    replayed = {payload['id'] for payload in missed}
+
+    async def event_stream():
+        try:
+            yield f"id: {after_id}\nevent: ready\ndata: {{}}\n\n"
+            for payload in missed:
+                yield _notification_event(payload)
+            while not await request.is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if payload['id'] in replayed:
+                    continue
+                yield _notification_event(payload)
+        finally:
+            notification_stream.broker.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _last_event_id(request: Request) -> Optional[int]:
+    """Last-Event-ID sent by a reconnecting EventSource, if valid"""
+    try:
+        return int(request.headers.get("last-event-id", ""))
+    except ValueError:
+        return None
+
+
+def _notification_event(payload: dict) -> str:
+    return f"id: {payload['id']}\nevent: notification\ndata: {json.dumps(payload)}\n\n"
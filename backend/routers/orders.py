@@ -8,18 +8,20 @@ import models
 import auth
 from database import get_db
 from notification_service import NotificationService
+from id_allocator import next_invoice_number, next_invoice_numbers, next_order_id
+from stock_ledger import InsufficientStock, UnknownProduct, deduct_stock
 
 router = APIRouter(prefix="/api/orders", tags=["Orders"])
 
+BULK_APPROVE_MAX_ORDERS = 200
+
 def generate_order_id(db: Session) -> str:
-    """Generate unique order ID"""
-    count = db.query(models.Order).count()
-    return f"ORD-{datetime.now().strftime('%Y%m%d')}-{count + 1:04d}"
+    """Generate unique order ID (ORD-YYYYMMDD-NNNN)"""
+    return next_order_id(db)
 
 def generate_invoice_number(db: Session) -> str:
-    """Generate unique invoice number"""
-    count = db.query(models.Order).filter(models.Order.invoice_generated == True).count()
-    return f"INV-{datetime.now().strftime('%Y%m%d')}-{count + 1:04d}"
+    """Generate unique invoice number (INV-YYYYMMDD-NNNN)"""
+    return next_invoice_number(db)
 
 @router.post("/", response_model=schemas.Order)
 def create_order(
@@ -198,6 +200,145 @@ def get_order(
     
     return order
 
+@router.put("/bulk-approve", response_model=schemas.OrderBulkApproveResponse)
+def bulk_approve_orders(
+    request: schemas.OrderBulkApprove,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.require_order_approval)  # Admin only
+):
+    """
+    Approve or reject many pending orders in one transaction - ADMIN ONLY
+    Orders that cannot be processed (missing, no longer pending, unknown
+    product, insufficient stock) are reported per order; the rest go through.
+    """
+    order_ids = list(dict.fromkeys(request.order_ids))
+    if not order_ids:
+        raise HTTPException(status_code=400, detail="No orders selected")
+    if len(order_ids) > BULK_APPROVE_MAX_ORDERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BULK_APPROVE_MAX_ORDERS} orders can be processed at once"
+        )
+    
+    orders = {
+        order.id: order
+        for order in db.query(models.Order).filter(models.Order.id.in_(order_ids)).all()
+    }
+    product_ids = set()
+    customers = {}
+    if request.approved:
+        product_ids = {order.product_id for order in orders.values() if order.product_id}
+        # Loaded into the session so ledger deductions keep them in sync
+        product_ids = {
+            product.id
+            for product in db.query(models.Product).filter(models.Product.id.in_(product_ids)).all()
+        } if product_ids else set()
+        customer_ids = {order.customer_id for order in orders.values() if order.customer_id}
+        if customer_ids:
+            customers = {
+                customer.id: customer
+                for customer in db.query(models.Customer).filter(models.Customer.id.in_(customer_ids)).all()
+            }
+    
+    new_status = "APPROVED" if request.approved else "REJECTED"
+    errors = {}
+    processed = []
+    for order_id in order_ids:
+        order = orders.get(order_id)
+        if not order:
+            errors[order_id] = "Order not found"
+            continue
+        if order.product_id and request.approved and order.product_id not in product_ids:
+            errors[order_id] = "Product not found"
+            continue
+        
+        # Each order gets a savepoint so one failure does not undo the others
+        savepoint = db.begin_nested()
+        claimed = db.query(models.Order).filter(
+            models.Order.id == order_id,
+            models.Order.status == "PENDING"
+        ).update({models.Order.status: new_status}, synchronize_session=False)
+        if not claimed:
+            savepoint.rollback()
+            errors[order_id] = "Order is not pending approval"
+            continue
+        if request.approved and order.product_id:
+            try:
+                deduct_stock(
+                    db, order.product_id, order.quantity,
+                    reason="ORDER_APPROVED", reference=order.order_id, user_id=current_user.id
+                )
+            except InsufficientStock as e:
+                savepoint.rollback()
+                errors[order_id] = str(e)
+                continue
+        savepoint.commit()
+        processed.append(order)
+    
+    # One counter UPDATE for every invoice number in the batch
+    invoice_numbers = iter(next_invoice_numbers(db, len(processed)) if request.approved else [])
+    now = datetime.utcnow()
+    for order in processed:
+        order.status = new_status
+        order.approved_by = current_user.id
+        order.approved_at = now
+        if request.approved:
+            order.invoice_number = next(invoice_numbers)
+            order.invoice_generated = True
+            order.stock_deducted = True
+            customer = customers.get(order.customer_id)
+            if customer:
+                customer.total_purchases = (customer.total_purchases or 0) + 1
+                customer.total_value = (customer.total_value or 0) + order.total_amount
+        else:
+            order.rejection_reason = request.rejection_reason
+    
+    db.commit()
+    
+    if processed:
+        # Refresh the expired orders with one query instead of one per order
+        db.query(models.Order).filter(
+            models.Order.id.in_([order.id for order in processed])
+        ).all()
+    results = [
+        schemas.OrderBulkResult(order_id=order_id, success=False, error=errors[order_id])
+        if order_id in errors else
+        schemas.OrderBulkResult(
+            order_id=order_id,
+            success=True,
+            status=orders[order_id].status,
+            invoice_number=orders[order_id].invoice_number
+        )
+        for order_id in order_ids
+    ]
+    
+    # Send every notification of the batch with one INSERT
+    if processed:
+        try:
+            if request.approved:
+                NotificationService.notify_orders_approved(
+                    db=db,
+                    orders=processed,
+                    approved_by=current_user
+                )
+            else:
+                NotificationService.notify_orders_rejected(
+                    db=db,
+                    orders=processed,
+                    rejected_by=current_user,
+                    reason=request.rejection_reason or "No reason provided"
+                )
+        except Exception as e:
+            import logging
+            logging.error(f"Failed to send bulk order approval/rejection notifications: {e}")
+    
+    return schemas.OrderBulkApproveResponse(
+        processed=len(order_ids),
+        succeeded=len(processed),
+        failed=len(errors),
+        results=results
+    )
+
 @router.put("/{order_id}/approve", response_model=schemas.Order)
 def approve_order(
     order_id: int,
@@ -211,26 +352,31 @@ def approve_order(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    if order.status != "PENDING":
+    # Claim the order with a conditional UPDATE so two admins cannot both process it
+    claimed = db.query(models.Order).filter(
+        models.Order.id == order_id,
+        models.Order.status == "PENDING"
+    ).update(
+        {models.Order.status: "APPROVED" if approval.approved else "REJECTED"},
+        synchronize_session=False
+    )
+    if not claimed:
         raise HTTPException(status_code=400, detail="Order is not pending approval")
     
     if approval.approved:
-        # Get product to check stock (only if product was specified)
-        product = None
+        # Deduct stock through the ledger (only if product was specified)
         if order.product_id:
-            product = db.query(models.Product).filter(models.Product.id == order.product_id).first()
-            if not product:
-                raise HTTPException(status_code=404, detail="Product not found")
-            
-            # Check stock availability
-            if product.stock_quantity < order.quantity:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Insufficient stock. Available: {product.stock_quantity}, Required: {order.quantity}"
+            try:
+                deduct_stock(
+                    db, order.product_id, order.quantity,
+                    reason="ORDER_APPROVED", reference=order.order_id, user_id=current_user.id
                 )
-            
-            # Atomic transaction: Deduct stock
-            product.stock_quantity -= order.quantity
+            except UnknownProduct:
+                db.rollback()
+                raise HTTPException(status_code=404, detail="Product not found")
+            except InsufficientStock as e:
+                db.rollback()
+                raise HTTPException(status_code=400, detail=str(e))
         
         # Generate invoice
         order.invoice_number = generate_invoice_number(db)
@@ -11,7 +11,7 @@ from database import get_db
 import models
 import schemas
 from auth import get_current_user, get_current_user_optional
-from audit_logger import log_create, log_update, log_view
+from audit_logger import log_create, log_list_view, log_update, log_view
 
 router = APIRouter(
     prefix="/api/outstanding",
@@ -82,22 +82,29 @@ def get_outstanding_invoices(
     invoices = query.offset(skip).limit(limit).all()
     
     # Calculate additional stats and update status
+    status_changed = False
     for invoice in invoices:
         today = date.today()
         days_past_due = (today - invoice.due_date).days
         
         if invoice.balance <= 0:
-            invoice.status = "PAID"
+            new_status = "PAID"
         elif days_past_due > 0:
-            invoice.status = "OVERDUE"
+            new_status = "OVERDUE"
         elif invoice.paid_amount > 0:
-            invoice.status = "PARTIAL"
+            new_status = "PARTIAL"
         else:
-            invoice.status = "PENDING"
+            new_status = "PENDING"
+        if invoice.status != new_status:
+            invoice.status = new_status
+            status_changed = True
+    
+    # Persist recalculated statuses (audit logging no longer commits for us)
+    if status_changed:
+        db.commit()
     
     if current_user:
-        log_view(db, current_user.id, current_user.username, "Outstanding", 
-                 str(len(invoices)), "invoices")
+        log_list_view(db, current_user.id, current_user.username, "Outstanding")
     return invoices
 
 
@@ -6,6 +6,7 @@ import crud
 import models
 import auth
 from database import get_db
+from stock_ledger import set_stock
 
 router = APIRouter(prefix="/api/products", tags=["Products"])
 
@@ -16,7 +17,7 @@ def create_product(
     current_user: models.User = Depends(auth.require_product_write)  # Admin only
 ):
     """Create a new product (Admin only - Backend enforced)"""
-    return crud.create_product(db=db, product=product)
+    return crud.create_product(db=db, product=product, user_id=current_user.id)
 
 @router.get("/")
 def get_products(
@@ -87,9 +88,13 @@ def update_product(
         raise HTTPException(status_code=404, detail="Product not found")
     
     update_data = product_update.dict(exclude_unset=True)
+    stock_quantity = update_data.pop("stock_quantity", None)
     for key, value in update_data.items():
         setattr(product, key, value)
     
+    if stock_quantity is not None and stock_quantity != product.stock_quantity:
+        set_stock(db, product.id, stock_quantity, reason="ADJUSTMENT", user_id=current_user.id)
+    
     db.commit()
     db.refresh(product)
     return product
@@ -106,7 +111,7 @@ def update_product_stock(
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    product.stock_quantity = stock_quantity
+    set_stock(db, product.id, stock_quantity, reason="ADJUSTMENT", user_id=current_user.id)
     db.commit()
     db.refresh(product)
     return product
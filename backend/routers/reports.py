@@ -10,7 +10,7 @@ from datetime import date, datetime, timedelta
 from database import get_db
 from models import DailyReport, User, UserRole
 from auth import get_current_user, get_current_user_optional
-from audit_logger import log_create, log_view
+from audit_logger import log_create, log_list_view
 from pydantic import BaseModel
 
 router = APIRouter(
@@ -232,14 +232,12 @@ def get_all_reports(
             )
         )
     
-    # Log view action
-    log_view(
+    # Log view action (coalesced per user and hour)
+    log_list_view(
         db=db,
         user_id=current_user.id,
         username=current_user.username,
-        module="DailyReport",
-        record_id="all",
-        record_type="DailyReport"
+        module="DailyReport"
     )
     
     return response_list
@@ -8,6 +8,7 @@ import crud
 import models
 import auth
 from database import get_db
+from sales_analytics import sales_funnel, salesman_performance
 import os
 import shutil
 from pathlib import Path
@@ -194,10 +195,12 @@ def get_salesman_analytics_summary(
     else:
         raise HTTPException(status_code=403, detail="Only salesmen can access this")
     
-    # Assigned enquiries
-    assigned_enquiries = db.query(models.Enquiry).filter(
-        models.Enquiry.assigned_to == target_user_id
-    ).count()
+    # Assigned/converted counts, missed followups and closing days in one query
+    performance = salesman_performance(db, salesman_id=target_user_id)
+    stats = performance[0] if performance else {
+        "assigned": 0, "converted": 0, "conversion_rate": 0,
+        "avg_closing_days": 0, "missed_followups": 0
+    }
     
     # Pending followups (today or overdue)
     pending_followups = db.query(models.SalesFollowUp).filter(
@@ -206,12 +209,6 @@ def get_salesman_analytics_summary(
         models.SalesFollowUp.followup_date <= datetime.utcnow() + timedelta(days=1)
     ).count()
     
-    # Converted enquiries
-    converted_enquiries = db.query(models.Enquiry).filter(
-        models.Enquiry.assigned_to == current_user.id,
-        models.Enquiry.status == "CONVERTED"
-    ).count()
-    
     # Revenue this month (from approved orders)
     today = date.today()
     first_day = today.replace(day=1)
@@ -219,47 +216,26 @@ def get_salesman_analytics_summary(
     revenue_this_month = db.query(func.sum(models.Order.total_amount)).join(
         models.Enquiry, models.Order.enquiry_id == models.Enquiry.id
     ).filter(
-        models.Enquiry.assigned_to == current_user.id,
+        models.Enquiry.assigned_to == target_user_id,
         models.Order.status == "APPROVED",
         models.Order.created_at >= first_day
     ).scalar() or 0
     
-    # Missed followups
-    missed_followups = db.query(models.SalesFollowUp).filter(
-        models.SalesFollowUp.salesman_id == current_user.id,
-        models.SalesFollowUp.status == "Pending",
-        models.SalesFollowUp.followup_date < datetime.utcnow()
-    ).count()
-    
     # Orders pending approval
     orders_pending = db.query(models.Order).filter(
-        models.Order.salesman_id == current_user.id,
+        models.Order.salesman_id == target_user_id,
         models.Order.status == "PENDING"
     ).count()
     
-    # Conversion rate
-    conversion_rate = (converted_enquiries / assigned_enquiries * 100) if assigned_enquiries > 0 else 0
-    
-    # Average closing days
-    converted = db.query(models.Enquiry).filter(
-        models.Enquiry.assigned_to == current_user.id,
-        models.Enquiry.status == "CONVERTED"
-    ).all()
-    
-    avg_closing_days = 0
-    if converted:
-        total_days = sum([(e.last_follow_up or e.created_at) - e.created_at for e in converted], timedelta()).days
-        avg_closing_days = total_days / len(converted) if len(converted) > 0 else 0
-    
     return {
-        "assigned_enquiries": assigned_enquiries,
+        "assigned_enquiries": stats["assigned"],
         "pending_followups": pending_followups,
-        "converted_enquiries": converted_enquiries,
+        "converted_enquiries": stats["converted"],
         "revenue_this_month": revenue_this_month,
-        "missed_followups": missed_followups,
+        "missed_followups": stats["missed_followups"],
         "orders_pending_approval": orders_pending,
-        "conversion_rate": round(conversion_rate, 2),
-        "avg_closing_days": round(avg_closing_days, 2)
+        "conversion_rate": stats["conversion_rate"],
+        "avg_closing_days": stats["avg_closing_days"]
     }
 
 @router.get("/salesman/enquiries")
@@ -433,14 +409,5 @@ def get_salesman_funnel(
     if current_user.role != models.UserRole.SALESMAN:
         raise HTTPException(status_code=403, detail="Only salesmen can access this")
     
-    query = db.query(models.Enquiry).filter(models.Enquiry.assigned_to == current_user.id)
-    
-    return {
-        "new": query.filter(models.Enquiry.status == "NEW").count(),
-        "contacted": query.filter(models.Enquiry.status == "CONTACTED").count(),
-        "followup": query.filter(models.Enquiry.status == "FOLLOW_UP").count(),
-        "quoted": query.filter(models.Enquiry.status == "QUOTED").count(),
-        "converted": query.filter(models.Enquiry.status == "CONVERTED").count(),
-        "lost": query.filter(models.Enquiry.status == "LOST").count()
-    }
+    return sales_funnel(db, salesman_id=current_user.id)
 
@@ -14,6 +14,7 @@ import models
 import auth
 from database import get_db
 from notification_service import NotificationService
+from sla_utils import evaluate_sla
 
 router = APIRouter(prefix="/api/service-engineer", tags=["Service Engineer"])
 
@@ -86,12 +87,11 @@ async def get_service_engineer_dashboard(
     pending_jobs = [j for j in assigned_jobs if j.status in ["ASSIGNED", "ON_THE_WAY"]]
     
     # Calculate SLA risks
-    sla_at_risk = []
-    for job in assigned_jobs:
-        if job.sla_time:
-            remaining = (job.sla_time - datetime.utcnow()).total_seconds()
-            if remaining <= 3600:  # Less than 1 hour
-                sla_at_risk.append(job)
+    sla_states = evaluate_sla(assigned_jobs)
+    sla_at_risk = [
+        job for job, sla in zip(assigned_jobs, sla_states)
+        if sla["status"] in ("warning", "breached")
+    ]
     
     return {
         "kpis": {
@@ -110,10 +110,10 @@ async def get_service_engineer_dashboard(
                 "priority": job.priority,
                 "status": job.status,
                 "sla_time": job.sla_time,
-                "sla_remaining_seconds": int((job.sla_time - datetime.utcnow()).total_seconds()) if job.sla_time else 0,
+                "sla_remaining_seconds": sla["remaining_seconds"],
                 "created_at": job.created_at,
             }
-            for job in assigned_jobs
+            for job, sla in zip(assigned_jobs, sla_states)
         ]
     }
 
@@ -121,6 +121,12 @@ async def get_service_engineer_dashboard(
 # ASSIGNED SERVICE JOBS
 # ============================================================================
 
+def _job_sla(sla: dict):
+    """(remaining seconds, status) for job payloads; completed jobs read as ok"""
+    if sla["status"] == "completed":
+        return 0, "ok"
+    return sla["remaining_seconds"], sla["status"]
+
 @router.get("/jobs")
 async def get_assigned_jobs(
     status: Optional[str] = None,
@@ -139,18 +145,8 @@ async def get_assigned_jobs(
     jobs = query.order_by(models.Complaint.sla_time.asc()).all()
     
     result = []
-    for job in jobs:
-        sla_remaining = 0
-        sla_status = "ok"
-        
-        if job.sla_time and job.status != "COMPLETED":
-            remaining_seconds = (job.sla_time - datetime.utcnow()).total_seconds()
-            sla_remaining = int(remaining_seconds)
-            
-            if remaining_seconds <= 0:
-                sla_status = "breached"
-            elif remaining_seconds <= 3600:  # 1 hour warning
-                sla_status = "warning"
+    for job, sla in zip(jobs, evaluate_sla(jobs)):
+        sla_remaining, sla_status = _job_sla(sla)
         
         result.append({
             "id": job.id,
@@ -192,17 +188,7 @@ async def get_job_details(
             detail="Job not found or not assigned to you"
         )
     
-    sla_remaining = 0
-    sla_status = "ok"
-    
-    if job.sla_time and job.status != "COMPLETED":
-        remaining_seconds = (job.sla_time - datetime.utcnow()).total_seconds()
-        sla_remaining = int(remaining_seconds)
-        
-        if remaining_seconds <= 0:
-            sla_status = "breached"
-        elif remaining_seconds <= 3600:
-            sla_status = "warning"
+    sla_remaining, sla_status = _job_sla(evaluate_sla([job])[0])
     
     return {
         "id": job.id,
@@ -536,26 +522,23 @@ async def get_sla_tracker(
         models.Complaint.status != "COMPLETED"
     ).order_by(models.Complaint.sla_time.asc()).all()
     
+    risk_labels = {
+        "breached": "🔴 BREACHED",
+        "warning": "🟡 WARNING",
+        "paused": "⏸️ PAUSED",
+    }
+    
     result = []
-    for job in jobs:
-        if job.sla_time:
-            remaining_seconds = (job.sla_time - datetime.utcnow()).total_seconds()
-            
-            if remaining_seconds <= 0:
-                risk = "🔴 BREACHED"
-            elif remaining_seconds <= 3600:
-                risk = "🟡 WARNING"
-            else:
-                risk = "🟢 OK"
-            
+    for job, sla in zip(jobs, evaluate_sla(jobs)):
+        if sla["sla_due_time"]:
             result.append({
                 "ticket_no": job.ticket_no,
                 "customer_name": job.customer_name,
                 "priority": job.priority,
-                "sla_due": job.sla_time,
-                "remaining_seconds": int(remaining_seconds),
-                "remaining_formatted": format_time(int(remaining_seconds)),
-                "risk": risk,
+                "sla_due": sla["sla_due_time"],
+                "remaining_seconds": sla["remaining_seconds"],
+                "remaining_formatted": format_time(sla["remaining_seconds"]),
+                "risk": risk_labels.get(sla["status"], "🟢 OK"),
             })
     
     return result
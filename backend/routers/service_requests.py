@@ -1,36 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_, or_, func
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 import qrcode
 from io import BytesIO
 import base64
-import uuid
 import os
 import schemas
 import models
 import auth
 from database import get_db
 from notification_service import NotificationService
+from sla_utils import calculate_sla_time, evaluate_sla
+from id_allocator import next_ticket_no
 
 router = APIRouter(prefix="/api/service-requests", tags=["Service Requests"])
 
 # Get frontend URL from environment variable
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
 
-# SLA Configuration (hours)
-SLA_RULES = {
-    "NORMAL": 24,
-    "URGENT": 6,
-    "CRITICAL": 2
-}
-
-def calculate_sla_time(priority: str, created_at: datetime) -> datetime:
-    """Calculate SLA due time based on priority"""
-    hours = SLA_RULES.get(priority, 24)
-    return created_at + timedelta(hours=hours)
-
 def generate_feedback_qr(feedback_url: str) -> str:
     """Generate QR code for feedback URL"""
     try:
@@ -44,30 +33,17 @@ def generate_feedback_qr(feedback_url: str) -> str:
         print(f"Error generating QR code: {e}")
         raise
 
-def check_sla_status(service: models.Complaint) -> dict:
-    """Check SLA status and calculate remaining time"""
-    if service.status == "COMPLETED" or not service.sla_time:
+def _sla_info(sla: dict) -> dict:
+    """Status/remaining pair returned by the service request endpoints"""
+    if sla["status"] == "completed":
         return {"status": "ok", "remaining_seconds": 0}
-    
-    now = datetime.utcnow()
-    
-    # Handle ON_HOLD status - SLA paused
-    if service.status == "ON_HOLD":
-        remaining = (service.sla_time - now).total_seconds()
-        return {
-            "status": "paused",
-            "remaining_seconds": int(remaining) if remaining > 0 else 0
-        }
-    
-    # Calculate remaining time
-    remaining = (service.sla_time - now).total_seconds()
-    
-    if remaining <= 0:
+    if sla["status"] == "breached":
         return {"status": "breached", "remaining_seconds": 0}
-    elif remaining <= 3600:  # Warning at 1 hour
-        return {"status": "warning", "remaining_seconds": int(remaining)}
-    else:
-        return {"status": "ok", "remaining_seconds": int(remaining)}
+    return {"status": sla["status"], "remaining_seconds": sla["remaining_seconds"]}
+
+def check_sla_status(service: models.Complaint) -> dict:
+    """Check SLA status and calculate remaining time"""
+    return _sla_info(evaluate_sla([service])[0])
 
 @router.post("/public", response_model=schemas.Complaint)
 async def create_public_service_request(
@@ -77,7 +53,7 @@ async def create_public_service_request(
 ):
     """Create service request from customer (PUBLIC - no auth required)"""
     # Generate ticket number
-    ticket_no = f"SR{datetime.now().strftime('%Y%m%d')}{str(uuid.uuid4())[:6].upper()}"
+    ticket_no = next_ticket_no(db)
     
     created_at = datetime.utcnow()
     # Default to NORMAL priority for public requests
@@ -125,7 +101,7 @@ async def create_service_request(
         raise HTTPException(status_code=403, detail="Only Admin and Reception can create service requests")
     
     # Generate ticket number
-    ticket_no = f"SR{datetime.now().strftime('%Y%m%d')}{str(uuid.uuid4())[:6].upper()}"
+    ticket_no = next_ticket_no(db)
     
     created_at = datetime.utcnow()
     sla_time = calculate_sla_time(complaint.priority, created_at)
@@ -226,23 +202,20 @@ def get_my_services(
     
     services = query.order_by(models.Complaint.created_at.desc()).all()
     
-    # Convert to list of dictionaries with SLA info
+    # Every row is assigned to the same engineer
+    engineer = db.query(models.User).filter(models.User.id == target_user_id).first()
+    engineer_name = engineer.username if engineer else None
+    
+    # Convert to list of dictionaries with SLA info (one batch SLA evaluation)
     result = []
-    for service in services:
-        sla_info = check_sla_status(service)
+    for service, sla in zip(services, evaluate_sla(services)):
+        sla_info = _sla_info(sla)
         
         # Calculate total SLA seconds based on priority
         total_seconds = None
         if service.sla_time and service.created_at:
             total_seconds = int((service.sla_time - service.created_at).total_seconds())
         
-        # Get engineer name
-        engineer_name = None
-        if service.assigned_to:
-            engineer = db.query(models.User).filter(models.User.id == service.assigned_to).first()
-            if engineer:
-                engineer_name = engineer.username
-        
         # Convert to dict and add SLA fields
         service_dict = schemas.Complaint.model_validate(service).model_dump()
         service_dict.update({
@@ -467,11 +440,13 @@ def get_all_services(
     if priority:
         query = query.filter(models.Complaint.priority == priority)
     
-    services = query.offset(skip).limit(limit).all()
+    services = query.options(
+        joinedload(models.Complaint.assigned_engineer)
+    ).offset(skip).limit(limit).all()
     
-    # Add SLA status and engineer name
-    for service in services:
-        sla_info = check_sla_status(service)
+    # Add SLA status and engineer name (one batch SLA evaluation)
+    for service, sla in zip(services, evaluate_sla(services)):
+        sla_info = _sla_info(sla)
         service.sla_status = sla_info  # Return complete dict
         service.sla_remaining = sla_info["remaining_seconds"]
         # Add engineer name if assigned
@@ -2,11 +2,15 @@
 Settings API Router
 Admin system configuration
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Optional
 from database import get_db
 from auth import require_admin
+from sla_utils import SLA_LIMITS
 from pydantic import BaseModel
+import models
 
 router = APIRouter(prefix="/api/settings", tags=["settings"])
 
@@ -33,9 +37,9 @@ def get_settings(
         "email": "info@yamini-infotech.com",
         "phone": "+91 1234567890",
         "address": "Business Address",
-        "sla_normal_hours": 24,
-        "sla_urgent_hours": 6,
-        "sla_critical_hours": 2,
+        "sla_normal_hours": SLA_LIMITS["NORMAL"],
+        "sla_urgent_hours": SLA_LIMITS["URGENT"],
+        "sla_critical_hours": SLA_LIMITS["CRITICAL"],
         "attendance_cutoff_time": "09:30"
     }
 
@@ -49,3 +53,86 @@ def update_settings(
     # For now, just return success
     # In production, update settings table
     return {"message": "Settings updated successfully", "settings": settings.dict()}
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+@router.get("/scheduler/stats")
+def get_scheduler_stats(
+    days: int = Query(7, ge=1, le=90),
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Per-job run counts and p50/p95 durations from scheduler_runs - Admin only"""
+    since = datetime.utcnow() - timedelta(days=days)
+    runs = db.query(
+        models.SchedulerRun.job_id,
+        models.SchedulerRun.duration_ms,
+        models.SchedulerRun.status,
+        models.SchedulerRun.exceeded_interval,
+        models.SchedulerRun.started_at
+    ).filter(
+        models.SchedulerRun.started_at >= since
+    ).all()
+
+    jobs = {}
+    for run in runs:
+        job = jobs.setdefault(run.job_id, {
+            "durations": [], "errors": 0, "overruns": 0, "last_run_at": None
+        })
+        job["durations"].append(run.duration_ms or 0)
+        job["errors"] += run.status == "error"
+        job["overruns"] += bool(run.exceeded_interval)
+        if job["last_run_at"] is None or run.started_at > job["last_run_at"]:
+            job["last_run_at"] = run.started_at
+
+    result = []
+    for job_id, job in sorted(jobs.items()):
+        durations = sorted(job["durations"])
+        result.append({
+            "job_id": job_id,
+            "runs": len(durations),
+            "errors": job["errors"],
+            "overruns": job["overruns"],
+            "p50_ms": _percentile(durations, 50),
+            "p95_ms": _percentile(durations, 95),
+            "max_ms": durations[-1],
+            "last_run_at": job["last_run_at"]
+        })
+    return {"days": days, "jobs": result}
+
+
+@router.get("/scheduler/runs")
+def get_scheduler_runs(
+    job_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    current_user = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Most recent scheduler runs, newest first - Admin only"""
+    query = db.query(models.SchedulerRun)
+    if job_id:
+        query = query.filter(models.SchedulerRun.job_id == job_id)
+    runs = query.order_by(models.SchedulerRun.started_at.desc()).limit(limit).all()
+    return [
+        {
+            "id": run.id,
+            "job_id": run.job_id,
+            "started_at": run.started_at,
+            "finished_at": run.finished_at,
+            "duration_ms": run.duration_ms,
+            "rows_scanned": run.rows_scanned,
+            "notifications_emitted": run.notifications_emitted,
+            "status": run.status,
+            "error": run.error,
+            "exceeded_interval": run.exceeded_interval,
+            "worker": run.worker
+        }
+        for run in runs
+    ]
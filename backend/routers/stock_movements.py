@@ -9,8 +9,9 @@ from typing import List
 from datetime import date, datetime
 
 from database import get_db
-from models import StockMovement, User, UserRole
+from models import Product, StockMovement, User, UserRole
 from auth import get_current_user
+from stock_ledger import InsufficientStock, UnknownProduct, add_stock, deduct_stock
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/api/stock-movements", tags=["stock-movements"])
@@ -22,12 +23,14 @@ class StockMovementCreate(BaseModel):
     item_name: str
     quantity: int
     reference: str | None = None
+    product_id: int | None = None  # Defaults to the product named item_name
 
 
 class StockMovementResponse(BaseModel):
     id: int
     movement_type: str
     item_name: str
+    product_id: int | None = None
     quantity: int
     reference: str | None
     status: str
@@ -40,6 +43,15 @@ class StockMovementResponse(BaseModel):
         from_attributes = True
 
 
+def resolve_product_id(db: Session, item_name: str) -> int | None:
+    """Catalogue product matching a free-text item name (name or product code)"""
+    name = item_name.strip()
+    product = db.query(Product.id).filter(
+        (func.lower(Product.name) == name.lower()) | (Product.product_id == name)
+    ).order_by(Product.id).first()
+    return product.id if product else None
+
+
 # Helper function to check reception role
 def require_reception(current_user: User):
     if current_user.role not in [UserRole.RECEPTION, UserRole.ADMIN]:
@@ -61,9 +73,15 @@ def log_stock_movement(
     if movement_data.movement_type not in ["IN", "OUT"]:
         raise HTTPException(status_code=400, detail="Movement type must be IN or OUT")
     
+    if movement_data.quantity <= 0:
+        raise HTTPException(status_code=400, detail="Quantity must be positive")
+    
+    product_id = movement_data.product_id or resolve_product_id(db, movement_data.item_name)
+    
     movement = StockMovement(
         movement_type=movement_data.movement_type,
         item_name=movement_data.item_name,
+        product_id=product_id,
         quantity=movement_data.quantity,
         reference=movement_data.reference,
         status="Pending",
@@ -79,6 +97,7 @@ def log_stock_movement(
         id=movement.id,
         movement_type=movement.movement_type,
         item_name=movement.item_name,
+        product_id=movement.product_id,
         quantity=movement.quantity,
         reference=movement.reference,
         status=movement.status,
@@ -115,6 +134,7 @@ def get_stock_movements(
             id=m.id,
             movement_type=m.movement_type,
             item_name=m.item_name,
+            product_id=m.product_id,
             quantity=m.quantity,
             reference=m.reference,
             status=m.status,
@@ -133,7 +153,10 @@ def approve_stock_movement(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Approve stock movement (Admin only - Reception CANNOT do this)"""
+    """
+    Approve stock movement (Admin only - Reception CANNOT do this)
+    Approved movements of catalogue products update stock through the ledger
+    """
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=403, 
@@ -145,8 +168,38 @@ def approve_stock_movement(
     if not movement:
         raise HTTPException(status_code=404, detail="Stock movement not found")
     
-    movement.status = "Approved"
-    movement.approved_by = current_user.id
+    # Conditional UPDATE so a movement is applied to stock only once
+    claimed = db.query(StockMovement).filter(
+        StockMovement.id == movement_id,
+        StockMovement.status == "Pending"
+    ).update(
+        {StockMovement.status: "Approved", StockMovement.approved_by: current_user.id},
+        synchronize_session=False
+    )
+    if not claimed:
+        raise HTTPException(status_code=400, detail="Stock movement is not pending approval")
+    
+    product_id = movement.product_id or resolve_product_id(db, movement.item_name)
+    if product_id:
+        movement.product_id = product_id
+        try:
+            if movement.movement_type == "IN":
+                add_stock(
+                    db, product_id, movement.quantity,
+                    reason="MOVEMENT_IN", reference=movement.id, user_id=current_user.id
+                )
+            else:
+                deduct_stock(
+                    db, product_id, movement.quantity,
+                    reason="MOVEMENT_OUT", reference=movement.id, user_id=current_user.id
+                )
+        except UnknownProduct:
+            db.rollback()
+            raise HTTPException(status_code=404, detail="Product not found")
+        except InsufficientStock as e:
+            db.rollback()
+            raise HTTPException(status_code=400, detail=str(e))
+    
     db.commit()
     
     return {"message": "Stock movement approved successfully"}
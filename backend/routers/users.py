@@ -117,6 +117,7 @@ def update_user(
     
     # Update fields
     update_data = user_update.dict(exclude_unset=True)
+    previous_username = db_user.username
     
     # Check username uniqueness if being updated
     if 'username' in update_data and update_data['username'] != db_user.username:
@@ -139,6 +140,8 @@ def update_user(
     
     db.commit()
     db.refresh(db_user)
+    auth.invalidate_principal(previous_username)
+    auth.invalidate_principal(db_user.username)
     return db_user
 
 @router.delete("/{user_id}")
@@ -160,6 +163,7 @@ def delete_user(
     db_user.is_active = False
     db.commit()
     db.refresh(db_user)
+    auth.invalidate_principal(db_user.username)
     
     return {"message": "User deactivated successfully"}
 
@@ -0,0 +1,223 @@
+"""
+Sales Analytics Aggregates
+Grouped SQL queries behind the salesman performance and funnel screens
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+from models import Enquiry, Order, SalesFollowUp, ShopVisit, User, UserRole
+from analytics_rollup import sales_fact_totals, seconds_between
+
+
+# Enquiry status -> SalesFunnelData field
+FUNNEL_STATUSES = {
+    "NEW": "new",
+    "CONTACTED": "contacted",
+    "FOLLOW_UP": "followup",
+    "QUOTED": "quoted",
+    "CONVERTED": "converted",
+    "LOST": "lost"
+}
+FUNNEL_BUCKETS = ("week", "month")
+
+
+def period_start(db: Session, bucket: str, column):
+    """SQL expression truncating column to the Monday of its week or 1st of its month"""
+    if db.bind.dialect.name == "sqlite":
+        if bucket == "week":
+            return func.date(column, "weekday 0", "-6 days")
+        return func.strftime("%Y-%m-01", column)
+    return func.date_trunc(bucket, column)
+
+
+def _funnel_filters(salesman_id, start_date, end_date) -> list:
+    filters = [Enquiry.status.in_(FUNNEL_STATUSES)]
+    if salesman_id:
+        filters.append(Enquiry.assigned_to == salesman_id)
+    if start_date:
+        filters.append(Enquiry.created_at >= start_date)
+    if end_date:
+        filters.append(Enquiry.created_at <= end_date)
+    return filters
+
+
+def sales_funnel(
+    db: Session,
+    salesman_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Dict[str, int]:
+    """Enquiry counts per funnel stage from one GROUP BY status query"""
+    funnel = {field: 0 for field in FUNNEL_STATUSES.values()}
+    rows = db.query(
+        Enquiry.status, func.count(Enquiry.id)
+    ).filter(
+        *_funnel_filters(salesman_id, start_date, end_date)
+    ).group_by(Enquiry.status).all()
+    for status, count in rows:
+        funnel[FUNNEL_STATUSES[status]] = count
+    return funnel
+
+
+def sales_funnel_trend(
+    db: Session,
+    bucket: str = "month",
+    salesman_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> List[Dict]:
+    """
+    Funnel counts per week or month of Enquiry.created_at, grouped by
+    (period, status) in one query. Periods without enquiries are omitted.
+    """
+    period = period_start(db, bucket, Enquiry.created_at).label("period_start")
+    rows = db.query(
+        period, Enquiry.status, func.count(Enquiry.id)
+    ).filter(
+        *_funnel_filters(salesman_id, start_date, end_date)
+    ).group_by(period, Enquiry.status).all()
+
+    trend = {}
+    for period_value, status, count in rows:
+        if isinstance(period_value, str):
+            period_value = date.fromisoformat(period_value[:10])
+        elif isinstance(period_value, datetime):
+            period_value = period_value.date()
+        funnel = trend.setdefault(
+            period_value, {field: 0 for field in FUNNEL_STATUSES.values()}
+        )
+        funnel[FUNNEL_STATUSES[status]] = count
+
+    return [
+        {"period_start": period_value, **funnel}
+        for period_value, funnel in sorted(trend.items())
+    ]
+
+
+def salesman_performance(
+    db: Session,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    product_id: Optional[int] = None,
+    priority: Optional[str] = None,
+    salesman_id: Optional[int] = None
+) -> List[Dict]:
+    """
+    Performance rows for every salesman (or one salesman) in a single
+    statement: enquiry, revenue, visit and missed follow-up aggregates are
+    each grouped by salesman and outer joined onto the users table.
+
+    Date, product and priority filters apply to enquiries; revenue only
+    honours the date range (on Order.created_at). avg_closing_days is whole
+    days of (last_follow_up or created_at) - created_at summed over
+    converted enquiries, divided by the number of conversions.
+
+    Without a product or priority filter, enquiry and revenue totals come
+    from daily_sales_facts and the date range is applied by whole days.
+    """
+    if not product_id and not priority:
+        enquiries = revenue = sales_fact_totals(
+            db,
+            start_date.date() if start_date else None,
+            end_date.date() if end_date else None,
+            salesman_id
+        )
+    else:
+        enquiry_filters = [Enquiry.assigned_to.isnot(None)]
+        if start_date:
+            enquiry_filters.append(Enquiry.created_at >= start_date)
+        if end_date:
+            enquiry_filters.append(Enquiry.created_at <= end_date)
+        if product_id:
+            enquiry_filters.append(Enquiry.product_id == product_id)
+        if priority:
+            enquiry_filters.append(Enquiry.priority == priority)
+        if salesman_id:
+            enquiry_filters.append(Enquiry.assigned_to == salesman_id)
+
+        is_converted = Enquiry.status == "CONVERTED"
+        closing_seconds = seconds_between(
+            db, Enquiry.created_at, func.coalesce(Enquiry.last_follow_up, Enquiry.created_at)
+        )
+        enquiries = db.query(
+            Enquiry.assigned_to.label("salesman_id"),
+            func.count(Enquiry.id).label("assigned"),
+            func.sum(case((is_converted, 1), else_=0)).label("converted"),
+            func.sum(case((Enquiry.status == "LOST", 1), else_=0)).label("lost"),
+            func.sum(case((is_converted, closing_seconds), else_=0)).label("closing_seconds")
+        ).filter(*enquiry_filters).group_by(Enquiry.assigned_to).subquery()
+
+        revenue_query = db.query(
+            Enquiry.assigned_to.label("salesman_id"),
+            func.sum(Order.total_amount).label("revenue")
+        ).join(
+            Enquiry, Order.enquiry_id == Enquiry.id
+        ).filter(Order.status == "APPROVED")
+        if start_date:
+            revenue_query = revenue_query.filter(Order.created_at >= start_date)
+        if end_date:
+            revenue_query = revenue_query.filter(Order.created_at <= end_date)
+        revenue = revenue_query.group_by(Enquiry.assigned_to).subquery()
+
+    visits = db.query(
+        ShopVisit.salesman_id,
+        func.count(ShopVisit.id).label("visit_count")
+    ).group_by(ShopVisit.salesman_id).subquery()
+
+    missed = db.query(
+        SalesFollowUp.salesman_id,
+        func.count(SalesFollowUp.id).label("missed_followups")
+    ).filter(
+        SalesFollowUp.status == "Pending",
+        SalesFollowUp.followup_date < datetime.utcnow()
+    ).group_by(SalesFollowUp.salesman_id).subquery()
+
+    query = db.query(
+        User.id,
+        User.full_name,
+        User.username,
+        func.coalesce(enquiries.c.assigned, 0).label("assigned"),
+        func.coalesce(enquiries.c.converted, 0).label("converted"),
+        func.coalesce(enquiries.c.lost, 0).label("lost"),
+        func.coalesce(enquiries.c.closing_seconds, 0).label("closing_seconds"),
+        func.coalesce(revenue.c.revenue, 0).label("revenue"),
+        func.coalesce(visits.c.visit_count, 0).label("visit_count"),
+        func.coalesce(missed.c.missed_followups, 0).label("missed_followups")
+    ).outerjoin(
+        enquiries, enquiries.c.salesman_id == User.id
+    )
+    if revenue is not enquiries:  # Fact totals already carry revenue
+        query = query.outerjoin(revenue, revenue.c.salesman_id == User.id)
+    query = query.outerjoin(
+        visits, visits.c.salesman_id == User.id
+    ).outerjoin(
+        missed, missed.c.salesman_id == User.id
+    )
+    if salesman_id:
+        query = query.filter(User.id == salesman_id)
+    else:
+        query = query.filter(User.role == UserRole.SALESMAN)
+
+    performance_data = []
+    for row in query.order_by(User.id).all():
+        assigned = int(row.assigned)
+        converted = int(row.converted)
+        conversion_rate = (converted / assigned * 100) if assigned > 0 else 0
+        closing_days = timedelta(seconds=round(float(row.closing_seconds))).days
+        avg_closing_days = closing_days / converted if converted > 0 else 0
+
+        performance_data.append({
+            "salesman_id": row.id,
+            "salesman_name": row.full_name or row.username,
+            "assigned": assigned,
+            "converted": converted,
+            "conversion_rate": round(conversion_rate, 2),
+            "revenue": float(row.revenue),
+            "avg_closing_days": round(avg_closing_days, 2),
+            "missed_followups": int(row.missed_followups),
+            "visit_count": int(row.visit_count),
+            "lost_count": int(row.lost)
+        })
+
+    return performance_data
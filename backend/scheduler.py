@@ -5,28 +5,55 @@ Handles:
 2. Daily Report Submission Tracking
 3. Service SLA Warning System
 4. Monthly AMC Reminder Automation
+5. Daily Analytics Fact Rollups
+6. Stock Ledger Snapshots
 
 PHASE 4: Uses centralized NotificationService
+
+Only one process runs the jobs: every process that calls start_scheduler()
+takes part in a leader election (Postgres advisory lock, or a lock file for
+other databases) and the jobs stay paused everywhere except on the leader.
+Run `python -m scheduler` for a standalone scheduler worker and set
+SCHEDULER_ENABLED=false on the web tier.
 """
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
-from sqlalchemy.orm import Session
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy import text
 from datetime import datetime, timedelta, date
-from database import SessionLocal
+from database import SessionLocal, engine
 from models import (
     Enquiry, DailyReport, Complaint, MIFRecord, 
-    Notification, ReminderSchedule, User, UserRole
+    ReminderSchedule, SchedulerRun, User, UserRole, FOLLOW_UP_ACTIVE_STATUSES
 )
 from notification_service import NotificationService
 from sla_utils import check_and_send_sla_notifications
+from analytics_rollup import FACT_REFRESH_MINUTES, refresh_pending_facts
+from stock_ledger import STOCK_SNAPSHOT_INTERVAL_HOURS, take_snapshot
+import functools
 import logging
+import os
+import signal
+import socket
+import tempfile
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 # Initialize scheduler
 scheduler = BackgroundScheduler()
 
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+# Advisory lock key shared by every process competing for scheduler leadership
+SCHEDULER_LOCK_ID = int(os.getenv("SCHEDULER_LOCK_ID", "72410001"))
+LEADER_CHECK_SECONDS = int(os.getenv("SCHEDULER_LEADER_CHECK_SECONDS", "60"))
+SCHEDULER_LOCK_FILE = os.getenv(
+    "SCHEDULER_LOCK_FILE",
+    os.path.join(tempfile.gettempdir(), "yamini_scheduler.lock")
+)
+
 
 def get_db():
     """Get database session"""
@@ -37,63 +64,119 @@ def get_db():
         pass
 
 
-def create_notification(db: Session, user_id: int, title: str, message: str, 
-                       notification_type: str, priority: str = "medium", 
-                       module: str = None, action_url: str = None):
-    """Helper function to create notifications"""
-    notification = Notification(
-        user_id=user_id,
-        title=title,
-        message=message,
-        notification_type=notification_type,
-        priority=priority,
-        module=module,
-        action_url=action_url,
-        created_at=datetime.utcnow()
-    )
-    db.add(notification)
-    db.commit()
+def record_job_run(job_id: str, interval_seconds: int):
+    """
+    Wrap a scheduled job so every execution is stored in scheduler_runs.
+    The job may return {'rows_scanned': n, 'notifications_emitted': m};
+    exceptions are recorded as failed runs instead of propagating.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper():
+            started_at = datetime.utcnow()
+            started = time.perf_counter()
+            stats, error = {}, None
+            try:
+                stats = func() or {}
+            except Exception as e:
+                error = str(e)
+            duration_ms = (time.perf_counter() - started) * 1000
+            exceeded = duration_ms > interval_seconds * 1000
+            if exceeded:
+                logger.warning(
+                    f"⚠️ Job {job_id} took {duration_ms / 1000:.1f}s, "
+                    f"longer than its {interval_seconds}s interval"
+                )
+            
+            db = get_db()
+            try:
+                db.add(SchedulerRun(
+                    job_id=job_id,
+                    started_at=started_at,
+                    finished_at=datetime.utcnow(),
+                    duration_ms=round(duration_ms, 2),
+                    rows_scanned=stats.get('rows_scanned', 0),
+                    notifications_emitted=stats.get('notifications_emitted', 0),
+                    status="error" if error else "success",
+                    error=error,
+                    exceeded_interval=exceeded,
+                    worker=f"{os.getpid()}@{socket.gethostname()}"
+                ))
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"❌ Failed to record run of {job_id}: {e}")
+            finally:
+                db.close()
+            return stats
+        return wrapper
+    return decorator
 
 
 # ============================================
 # 1. ENQUIRY FOLLOW-UP REMINDER SYSTEM
 # ============================================
 
+# Reminder frequency in days and notification priority per enquiry priority
+FOLLOW_UP_FREQUENCY_DAYS = {"HOT": 7, "WARM": 30, "COLD": 90}
+FOLLOW_UP_BATCH_SIZE = int(os.getenv("FOLLOW_UP_BATCH_SIZE", "500"))
+
+
+@record_job_run('enquiry_followups', interval_seconds=3600)
 def check_enquiry_follow_ups():
     """
     Check HOT/WARM/COLD enquiries and create reminders
     HOT → weekly reminder
     WARM → monthly reminder
     COLD → future follow-up
+    
+    Works as a due queue: only enquiries whose next_follow_up falls on or
+    before today are read (range scan on ix_enquiries_next_follow_up), in
+    batches of FOLLOW_UP_BATCH_SIZE. Each batch is one notification insert
+    plus one UPDATE per frequency, which pushes next_follow_up into the
+    future so the rows leave the queue.
     """
     db = get_db()
     try:
-        today = datetime.utcnow().date()
-        
-        # Get all active enquiries
-        enquiries = db.query(Enquiry).filter(
-            Enquiry.status.in_(["NEW", "IN_PROGRESS", "FOLLOW_UP"]),
-            Enquiry.assigned_to.isnot(None)
-        ).all()
+        now = datetime.utcnow()
+        due_before = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        rows_scanned = 0
+        notifications_emitted = 0
+        last_key = None
         
-        for enquiry in enquiries:
-            # Calculate next reminder based on priority
-            if enquiry.priority == "HOT":
-                frequency = 7  # 7 days (weekly)
-                reminder_type = "HOT_ENQUIRY"
-            elif enquiry.priority == "WARM":
-                frequency = 30  # 30 days (monthly)
-                reminder_type = "WARM_ENQUIRY"
-            else:  # COLD
-                frequency = 90  # 90 days (future)
-                reminder_type = "COLD_ENQUIRY"
+        while True:
+            query = db.query(
+                Enquiry.id,
+                Enquiry.enquiry_id,
+                Enquiry.priority,
+                Enquiry.customer_name,
+                Enquiry.product_interest,
+                Enquiry.assigned_to,
+                Enquiry.next_follow_up
+            ).filter(
+                Enquiry.next_follow_up < due_before,
+                Enquiry.status.in_(FOLLOW_UP_ACTIVE_STATUSES),
+                Enquiry.assigned_to.isnot(None)
+            )
+            if last_key is not None:
+                # Keyset continuation so a failed update can never loop forever
+                query = query.filter(
+                    (Enquiry.next_follow_up > last_key[0]) |
+                    ((Enquiry.next_follow_up == last_key[0]) & (Enquiry.id > last_key[1]))
+                )
+            batch = query.order_by(
+                Enquiry.next_follow_up, Enquiry.id
+            ).limit(FOLLOW_UP_BATCH_SIZE).all()
+            if not batch:
+                break
             
-            # Check if reminder is due
-            if enquiry.next_follow_up and enquiry.next_follow_up.date() <= today:
-                # Create notification for assigned salesman
-                create_notification(
-                    db=db,
-                    user_id=enquiry.assigned_to,
+            rows = []
+            ids_by_frequency = {}
+            for enquiry in batch:
+                label = enquiry.priority if enquiry.priority in FOLLOW_UP_FREQUENCY_DAYS else "COLD"
+                ids_by_frequency.setdefault(FOLLOW_UP_FREQUENCY_DAYS[label], []).append(enquiry.id)
+                rows += NotificationService.build_notification_rows(
+                    [enquiry.assigned_to],
                     title=f"🔔 {enquiry.priority} Enquiry Follow-up Due",
                     message=f"Follow-up required for {enquiry.customer_name} - {enquiry.product_interest}",
                     notification_type="FOLLOW_UP_REMINDER",
@@ -101,19 +184,29 @@ def check_enquiry_follow_ups():
                     module="Enquiry",
                     action_url=f"/enquiry/{enquiry.id}"
                 )
-                
-                # Update next follow-up date
-                enquiry.next_follow_up = datetime.utcnow() + timedelta(days=frequency)
-                enquiry.reminder_sent_date = datetime.utcnow()
-                
-                logger.info(f"Reminder sent for {enquiry.priority} enquiry: {enquiry.enquiry_id}")
+            
+            NotificationService.create_notifications_bulk(db, rows, commit=False)
+            for frequency, ids in ids_by_frequency.items():
+                db.query(Enquiry).filter(Enquiry.id.in_(ids)).update({
+                    Enquiry.next_follow_up: now + timedelta(days=frequency),
+                    Enquiry.reminder_sent_date: now
+                }, synchronize_session=False)
+            db.commit()
+            
+            rows_scanned += len(batch)
+            notifications_emitted += len(rows)
+            last_key = (batch[-1].next_follow_up, batch[-1].id)
+            logger.info(f"Follow-up reminders sent for {len(batch)} enquiries")
+            if len(batch) < FOLLOW_UP_BATCH_SIZE:
+                break
         
-        db.commit()
         logger.info(f"✅ Follow-up reminders checked at {datetime.utcnow()}")
+        return {'rows_scanned': rows_scanned, 'notifications_emitted': notifications_emitted}
         
     except Exception as e:
         logger.error(f"❌ Error in enquiry follow-up check: {str(e)}")
         db.rollback()
+        raise
     finally:
         db.close()
 
@@ -122,6 +215,7 @@ def check_enquiry_follow_ups():
 # 2. SALESMAN ACCOUNTABILITY - DAILY REPORTS
 # ============================================
 
+@record_job_run('daily_reports', interval_seconds=86400)
 def check_daily_reports():
     """
     Check if salesmen submitted daily reports
@@ -131,6 +225,7 @@ def check_daily_reports():
     db = get_db()
     try:
         today = date.today()
+        yesterday = today - timedelta(days=1)
         
         # Get all active salesmen
         salesmen = db.query(User).filter(
@@ -139,44 +234,38 @@ def check_daily_reports():
         ).all()
         
         # Get reception users to notify
-        reception_users = db.query(User).filter(
-            User.role == UserRole.RECEPTION,
-            User.is_active == True
-        ).all()
+        reception_ids = NotificationService.get_user_ids_by_role(
+            db, [UserRole.RECEPTION]
+        )[UserRole.RECEPTION]
+        
+        # Salesmen who submitted yesterday's report (one query for all)
+        submitted_ids = {
+            salesman_id for (salesman_id,) in db.query(DailyReport.salesman_id).filter(
+                DailyReport.report_date == yesterday
+            )
+        }
         
-        missing_reports = []
+        missing_reports = [salesman for salesman in salesmen if salesman.id not in submitted_ids]
+        rows = []
         
-        for salesman in salesmen:
-            # Check if daily report exists
-            report = db.query(DailyReport).filter(
-                DailyReport.salesman_id == salesman.id,
-                DailyReport.date == yesterday
-            ).first()
+        for salesman in missing_reports:
+            # Reminder for the salesman (written with the reception rows in one INSERT)
+            rows += NotificationService.daily_report_missing_rows(salesman, yesterday)
             
-            if not report:
-                missing_reports.append(salesman)
-                
-                # PHASE 4: Use NotificationService
-                NotificationService.notify_daily_report_missing(
-                    db=db,
-                    salesman=salesman,
-                    date=yesterday
-                )
-                
-                # Notify reception staff
-                for reception in reception_users:
-                    NotificationService.create_notification(
-                        db=db,
-                        user_id=reception.id,
-                        title="⚠️ Missing Daily Report",
-                        message=f"Salesman {salesman.full_name or salesman.username} has not submitted yesterday's report",
-                        notification_type="MISSED_REPORT",
-                        priority="high",
-                        module="Daily Reports",
-                        action_url="/reports/daily"
-                    )
-                
-                logger.warning(f"Missing report from salesman: {salesman.username}")
+            # Notify reception staff
+            rows += NotificationService.build_notification_rows(
+                reception_ids,
+                title="⚠️ Missing Daily Report",
+                message=f"Salesman {salesman.full_name or salesman.username} has not submitted yesterday's report",
+                notification_type="MISSED_REPORT",
+                priority="high",
+                module="Daily Reports",
+                action_url="/reports/daily"
+            )
+            
+            logger.warning(f"Missing report from salesman: {salesman.username}")
+        
+        NotificationService.create_notifications_bulk(db, rows, commit=False)
         
         if missing_reports:
             logger.info(f"⚠️ {len(missing_reports)} salesmen missing daily reports")
@@ -184,10 +273,15 @@ def check_daily_reports():
             logger.info("✅ All salesmen submitted daily reports")
         
         db.commit()
+        return {
+            'rows_scanned': len(salesmen),
+            'notifications_emitted': len(rows)
+        }
         
     except Exception as e:
         logger.error(f"❌ Error in daily report check: {str(e)}")
         db.rollback()
+        raise
     finally:
         db.close()
 
@@ -196,6 +290,7 @@ def check_daily_reports():
 # 3. SLA ESCALATION SYSTEM (ENHANCED)
 # ============================================
 
+@record_job_run('service_sla_escalation', interval_seconds=900)
 def check_service_sla():
     """
     Enhanced SLA escalation system
@@ -207,8 +302,13 @@ def check_service_sla():
     try:
         result = check_and_send_sla_notifications(db, notif_service)
         logger.info(f"✅ SLA Check: {result['warnings_sent']} warnings, {result['breaches_sent']} breaches")
+        return {
+            'rows_scanned': result['total_checked'],
+            'notifications_emitted': result['notifications_sent']
+        }
     except Exception as e:
         logger.error(f"❌ SLA check failed: {str(e)}")
+        raise
     finally:
         db.close()
 
@@ -217,6 +317,7 @@ def check_service_sla():
 # 4. MONTHLY AMC REMINDER AUTOMATION
 # ============================================
 
+@record_job_run('amc_expiry', interval_seconds=28 * 86400)
 def check_amc_expiry():
     """
     Check for AMC expiring in 30/15/7 days
@@ -235,17 +336,13 @@ def check_amc_expiry():
             (1, "TOMORROW")
         ]
         
-        # Get reception and office staff for notifications
-        reception_users = db.query(User).filter(
-            User.role == UserRole.RECEPTION,
-            User.is_active == True
-        ).all()
-        
-        office_staff = db.query(User).filter(
-            User.role == UserRole.OFFICE_STAFF,
-            User.is_active == True
-        ).all()
+        # Reception (merged office + reception role) receives AMC reminders
+        reception_ids = NotificationService.get_user_ids_by_role(
+            db, [UserRole.RECEPTION]
+        )[UserRole.RECEPTION]
         
+        rows = []
+        rows_scanned = 0
         for days, label in expiry_dates:
             target_date = today + timedelta(days=days)
             
@@ -256,6 +353,7 @@ def check_amc_expiry():
                 MIFRecord.amc_expiry <= target_date,
                 MIFRecord.status == "Active"
             ).all()
+            rows_scanned += len(mif_records)
             
             for mif in mif_records:
                 # Check if reminder already sent for this period
@@ -265,30 +363,75 @@ def check_amc_expiry():
                 
                 priority = "critical" if days <= 7 else "high"
                 
-                # Notify reception and office staff
-                for user in reception_users + office_staff:
-                    create_notification(
-                        db=db,
-                        user_id=user.id,
-                        title=f"🔔 AMC Expiring in {label}",
-                        message=f"Customer: {mif.customer_name} | Machine: {mif.machine_model} (S/N: {mif.serial_number})",
-                        notification_type="AMC_EXPIRY",
-                        priority=priority,
-                        module="MIF",
-                        action_url=f"/mif/{mif.id}"
-                    )
+                # Notify reception staff
+                rows += NotificationService.build_notification_rows(
+                    reception_ids,
+                    title=f"🔔 AMC Expiring in {label}",
+                    message=f"Customer: {mif.customer_name} | Machine: {mif.machine_model} (S/N: {mif.serial_number})",
+                    notification_type="AMC_EXPIRY",
+                    priority=priority,
+                    module="MIF",
+                    action_url=f"/mif/{mif.id}"
+                )
                 
                 # Update reminder sent date
                 mif.amc_reminder_sent_date = today
                 
                 logger.info(f"📧 AMC reminder sent: {mif.customer_name} - expires in {label}")
         
+        NotificationService.create_notifications_bulk(db, rows, commit=False)
         db.commit()
         logger.info(f"✅ AMC expiry checks completed at {datetime.utcnow()}")
+        return {'rows_scanned': rows_scanned, 'notifications_emitted': len(rows)}
         
     except Exception as e:
         logger.error(f"❌ Error in AMC check: {str(e)}")
         db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# ============================================
+# 5. DAILY ANALYTICS FACT ROLLUPS
+# ============================================
+
+@record_job_run('analytics_rollup', interval_seconds=FACT_REFRESH_MINUTES * 60)
+def refresh_analytics_facts():
+    """
+    Rebuild the days of daily_sales_facts, daily_service_facts and
+    daily_attendance_facts queued by source writes (full history on the first run)
+    """
+    db = get_db()
+    try:
+        written = refresh_pending_facts(db)
+        logger.info(f"✅ Analytics facts refreshed: {written} rows")
+        return {'rows_scanned': written, 'notifications_emitted': 0}
+    except Exception as e:
+        logger.error(f"❌ Analytics fact refresh failed: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# ============================================
+# 6. STOCK LEDGER SNAPSHOTS
+# ============================================
+
+@record_job_run('stock_snapshot', interval_seconds=STOCK_SNAPSHOT_INTERVAL_HOURS * 3600)
+def snapshot_stock():
+    """Record every product's stock balance in stock_snapshots"""
+    db = get_db()
+    try:
+        written = take_snapshot(db)
+        db.commit()
+        logger.info(f"✅ Stock snapshot taken: {written} products")
+        return {'rows_scanned': written, 'notifications_emitted': 0}
+    except Exception as e:
+        logger.error(f"❌ Stock snapshot failed: {str(e)}")
+        db.rollback()
+        raise
     finally:
         db.close()
 
@@ -297,8 +440,115 @@ def check_amc_expiry():
 # SCHEDULER CONFIGURATION
 # ============================================
 
+class SchedulerLeaderElection:
+    """
+    Decides which process runs the scheduled jobs.
+    
+    PostgreSQL: pg_try_advisory_lock on a dedicated connection; the lock is
+    released automatically if the leader process or its connection dies.
+    Other databases: an exclusive lock file (single host), or in-process
+    leadership where file locks are unavailable.
+    """
+    
+    def __init__(self):
+        self.is_leader = False
+        self._connection = None
+        self._lock_file = None
+    
+    def check(self) -> bool:
+        """Acquire leadership if free, or verify it is still held"""
+        try:
+            if engine.dialect.name == "postgresql":
+                self.is_leader = self._check_advisory_lock()
+            else:
+                self.is_leader = self._check_lock_file()
+        except Exception as e:
+            logger.warning(f"⚠️ Scheduler leader check failed: {e}")
+            self.release()
+        return self.is_leader
+    
+    def _check_advisory_lock(self) -> bool:
+        if self._connection is not None:
+            # Still leader as long as the session holding the lock is alive
+            self._connection.execute(text("SELECT 1"))
+            return True
+        # Autocommit, so the probes above never leave the lock's session
+        # idle in transaction (pinning vacuum, or killed by
+        # idle_in_transaction_session_timeout along with the lock)
+        connection = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        acquired = connection.execute(
+            text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": SCHEDULER_LOCK_ID}
+        ).scalar()
+        if acquired:
+            self._connection = connection
+        else:
+            connection.close()
+        return bool(acquired)
+    
+    def _check_lock_file(self) -> bool:
+        if self._lock_file is not None:
+            return True
+        try:
+            import fcntl
+        except ImportError:
+            return True  # No file locking on this platform: single-process fallback
+        lock_file = open(SCHEDULER_LOCK_FILE, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+    
+    def release(self):
+        self.is_leader = False
+        if self._connection is not None:
+            try:
+                self._connection.execute(
+                    text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": SCHEDULER_LOCK_ID}
+                )
+            except Exception:
+                pass
+            finally:
+                self._connection.close()
+                self._connection = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+leader_election = SchedulerLeaderElection()
+
+# Jobs that only the elected leader runs
+LEADER_JOB_IDS = [
+    'enquiry_followups', 'daily_reports', 'service_sla_escalation', 'amc_expiry', 'analytics_rollup',
+    'stock_snapshot'
+]
+
+
+def refresh_leadership():
+    """Resume jobs on the elected leader, pause them everywhere else"""
+    was_leader = leader_election.is_leader
+    is_leader = leader_election.check()
+    
+    if is_leader and not was_leader:
+        for job_id in LEADER_JOB_IDS:
+            scheduler.resume_job(job_id)
+        logger.info(f"👑 Scheduler leadership acquired (pid {os.getpid()}) - jobs active")
+    elif was_leader and not is_leader:
+        for job_id in LEADER_JOB_IDS:
+            scheduler.pause_job(job_id)
+        logger.warning(f"⚠️ Scheduler leadership lost (pid {os.getpid()}) - jobs paused")
+
+
 def start_scheduler():
     """Start the background scheduler"""
+    if not SCHEDULER_ENABLED:
+        logger.info("⏸️ Scheduler disabled in this process (SCHEDULER_ENABLED=false)")
+        return
+    
+    # Jobs are registered paused (next_run_time=None) until this process is elected leader
     
     # 1. Check enquiry follow-ups every hour
     scheduler.add_job(
@@ -306,7 +556,8 @@ def start_scheduler():
         CronTrigger(minute=0),  # Every hour at minute 0
         id='enquiry_followups',
         name='Check Enquiry Follow-ups',
-        replace_existing=True
+        replace_existing=True,
+        next_run_time=None
     )
     
     # 2. Check daily reports at 7 PM every day
@@ -315,7 +566,8 @@ def start_scheduler():
         CronTrigger(hour=19, minute=0),  # 7:00 PM daily
         id='daily_reports',
         name='Check Daily Report Submissions',
-        replace_existing=True
+        replace_existing=True,
+        next_run_time=None
     )
     
     # 3. Check service SLA every 15 minutes (enhanced)
@@ -324,7 +576,8 @@ def start_scheduler():
         CronTrigger(minute='*/15'),  # Every 15 minutes
         id='service_sla_escalation',
         name='SLA Escalation Check',
-        replace_existing=True
+        replace_existing=True,
+        next_run_time=None
     )
     
     # 4. Check AMC expiry on 1st of every month at 9 AM
@@ -333,19 +586,77 @@ def start_scheduler():
         CronTrigger(day=1, hour=9, minute=0),  # 1st of month, 9:00 AM
         id='amc_expiry',
         name='Check AMC Expiry',
+        replace_existing=True,
+        next_run_time=None
+    )
+    
+    # 5. Refresh daily analytics facts every FACT_REFRESH_MINUTES
+    scheduler.add_job(
+        refresh_analytics_facts,
+        IntervalTrigger(minutes=FACT_REFRESH_MINUTES),
+        id='analytics_rollup',
+        name='Refresh Daily Analytics Facts',
+        replace_existing=True,
+        next_run_time=None
+    )
+    
+    # 6. Snapshot stock balances every STOCK_SNAPSHOT_INTERVAL_HOURS
+    scheduler.add_job(
+        snapshot_stock,
+        IntervalTrigger(hours=STOCK_SNAPSHOT_INTERVAL_HOURS),
+        id='stock_snapshot',
+        name='Snapshot Stock Balances',
+        replace_existing=True,
+        next_run_time=None
+    )
+    
+    # Leader election runs in every process
+    scheduler.add_job(
+        refresh_leadership,
+        IntervalTrigger(seconds=LEADER_CHECK_SECONDS),
+        id='scheduler_leader_election',
+        name='Scheduler Leader Election',
         replace_existing=True
     )
     
     scheduler.start()
+    refresh_leadership()
     logger.info("🚀 Scheduler started successfully!")
-    logger.info("📋 Active jobs:")
+    logger.info("📋 Active jobs (leader only):")
     logger.info("  - Enquiry Follow-ups: Every hour")
     logger.info("  - Daily Reports Check: 7 PM daily")
-    logger.info("  - Service SLA Check: Every hour")
+    logger.info("  - Service SLA Check: Every 15 minutes")
     logger.info("  - AMC Expiry Check: 1st of month, 9 AM")
+    logger.info(f"  - Analytics Fact Rollup: Every {FACT_REFRESH_MINUTES} minutes")
+    logger.info(f"  - Stock Snapshot: Every {STOCK_SNAPSHOT_INTERVAL_HOURS} hours")
 
 
 def stop_scheduler():
     """Stop the background scheduler"""
-    scheduler.shutdown()
+    if scheduler.running:
+        scheduler.shutdown()
+    leader_election.release()
     logger.info("⏸️ Scheduler stopped")
+
+
+def run_standalone():
+    """Run the scheduler as its own worker process: python -m scheduler"""
+    global SCHEDULER_ENABLED
+    SCHEDULER_ENABLED = True
+    
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    
+    start_scheduler()
+    logger.info(f"🕒 Standalone scheduler worker running (pid {os.getpid()})")
+    stop_event.wait()
+    stop_scheduler()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    run_standalone()
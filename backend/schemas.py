@@ -410,7 +410,7 @@ class Notification(BaseModel):
     title: str
     message: str
     priority: str
-    module: str
+    module: Optional[str] = None
     action_url: Optional[str]
     read_status: bool
     created_at: datetime
@@ -418,6 +418,10 @@ class Notification(BaseModel):
     class Config:
         from_attributes = True
 
+class NotificationFeed(BaseModel):
+    items: List[Notification]
+    next_cursor: Optional[str] = None
+
 # Order Schemas
 class OrderCreate(BaseModel):
     enquiry_id: int
@@ -436,6 +440,24 @@ class OrderApprove(BaseModel):
     approved: bool
     rejection_reason: Optional[str] = None
 
+class OrderBulkApprove(BaseModel):
+    order_ids: List[int]
+    approved: bool
+    rejection_reason: Optional[str] = None
+
+class OrderBulkResult(BaseModel):
+    order_id: int
+    success: bool
+    status: Optional[str] = None
+    invoice_number: Optional[str] = None
+    error: Optional[str] = None
+
+class OrderBulkApproveResponse(BaseModel):
+    processed: int
+    succeeded: int
+    failed: int
+    results: List[OrderBulkResult]
+
 class Order(BaseModel):
     id: int
     order_id: str
@@ -497,6 +519,9 @@ class SalesFunnelData(BaseModel):
     converted: int
     lost: int
 
+class SalesFunnelPeriod(SalesFunnelData):
+    period_start: date
+
 # Service Engineer Daily Report Schemas
 class ServiceEngineerDailyReportBase(BaseModel):
     jobs_completed: int
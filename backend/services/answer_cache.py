@@ -0,0 +1,153 @@
+"""
+Chatbot Answer Cache
+Reuses replies to repeated customer questions so they skip retrieval, the
+history query and the Mistral call.
+
+- Key: language + normalised query (sorted set of BM25 terms, so "Do you
+  refill toners?" and "toner refill" share an entry)
+- Optional semantic matching: when a query embedding is supplied, an entry
+  of the same language whose stored embedding has cosine similarity of at
+  least CHATBOT_CACHE_SIMILARITY also counts as a hit
+- TTL per entry plus LRU eviction beyond CHATBOT_CACHE_MAX_ENTRIES
+- Entries remember the knowledge documents they were answered from and are
+  dropped when any of those change; ungrounded answers are dropped on any
+  knowledge change, since a new document may now answer them
+- Only replies to the first message of a chat session are stored and
+  served, so no entry carries another visitor's conversation
+
+The cache is per worker process.
+"""
+
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from services.lexical_search import tokenize
+
+CHATBOT_CACHE_TTL_SECONDS = int(os.getenv("CHATBOT_CACHE_TTL_SECONDS", "3600"))
+CHATBOT_CACHE_MAX_ENTRIES = int(os.getenv("CHATBOT_CACHE_MAX_ENTRIES", "500"))
+CHATBOT_CACHE_SIMILARITY = float(os.getenv("CHATBOT_CACHE_SIMILARITY", "0.92"))
+
+
+def normalize_query(query: str) -> str:
+    """Cache key text: sorted distinct BM25 terms, or the lower-cased words when none remain (e.g. "hi")"""
+    terms = tokenize(query)
+    if terms:
+        return " ".join(sorted(set(terms)))
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", query).lower()).strip()
+
+
+def _norm(vector) -> float:
+    return float((vector @ vector) ** 0.5) or 1.0
+
+
+class AnswerCache:
+    """LRU + TTL cache of chatbot replies"""
+
+    def __init__(self, max_entries: int = CHATBOT_CACHE_MAX_ENTRIES,
+                 ttl_seconds: int = CHATBOT_CACHE_TTL_SECONDS,
+                 similarity: float = CHATBOT_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self._entries: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'semantic_hits': 0, 'misses': 0, 'invalidated': 0}
+
+    def _expired(self, entry: Dict, now: float) -> bool:
+        return now - entry['stored_at'] > self.ttl_seconds
+
+    def _nearest(self, language: str, embedding, now: float) -> Optional[Tuple[str, str]]:
+        best_key, best_score = None, self.similarity
+        norm = _norm(embedding)
+        for key, entry in self._entries.items():
+            stored = entry.get('embedding')
+            if key[0] != language or stored is None or self._expired(entry, now):
+                continue
+            score = float(embedding @ stored) / (norm * entry['embedding_norm'])
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def get(self, query: str, language: str, embedding=None) -> Optional[Dict]:
+        """Cached {'reply', 'confidence', 'doc_ids'} for the query, or None"""
+        key = (language, normalize_query(query))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                del self._entries[key]
+                entry = None
+            if entry is None and embedding is not None:
+                nearest = self._nearest(language, embedding, now)
+                if nearest is not None:
+                    key, entry = nearest, self._entries[nearest]
+                    self.stats['semantic_hits'] += 1
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return {'reply': entry['reply'], 'confidence': entry['confidence'],
+                    'doc_ids': list(entry['doc_ids'])}
+
+    def put(self, query: str, language: str, reply: str, confidence: float,
+            doc_ids: Iterable[int], embedding=None) -> None:
+        entry = {
+            'reply': reply,
+            'confidence': confidence,
+            'doc_ids': frozenset(doc_ids),
+            'stored_at': time.monotonic(),
+            'embedding': embedding,
+            'embedding_norm': _norm(embedding) if embedding is not None else None
+        }
+        key = (language, normalize_query(query))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_documents(self, doc_ids: Iterable[int]) -> int:
+        """Drop entries answered from any of doc_ids, plus all ungrounded entries"""
+        changed = set(doc_ids)
+        if not changed:
+            return 0
+        with self._lock:
+            stale = [
+                key for key, entry in self._entries.items()
+                if not entry['doc_ids'] or entry['doc_ids'] & changed
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.stats['invalidated'] += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> Dict:
+        """Counters of this worker's cache"""
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'hit_rate': round(self.stats['hits'] / lookups * 100, 1) if lookups else 0.0
+            }
+
+
+_answer_cache: Optional[AnswerCache] = None
+
+
+def get_answer_cache() -> AnswerCache:
+    """Get or create the process-wide answer cache"""
+    global _answer_cache
+    if _answer_cache is None:
+        _answer_cache = AnswerCache()
+    return _answer_cache
@@ -6,10 +6,38 @@ Production-ready implementation for Yamini Infotech ERP
 import os
 import json
 import re
+import hashlib
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime
-import numpy as np
-from langdetect import detect, LangDetectException
+
+# Cross-process lock for index writers; not available on Windows, where
+# writers are only serialised within one process
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# numpy / langdetect are part of the optional AI dependency set (see requirements.txt);
+# without them the chatbot still runs on lexical (BM25) retrieval
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+    print("[WARNING] numpy not installed - vector search disabled, using BM25 retrieval only")
+
+try:
+    from langdetect import detect, LangDetectException
+    LANGDETECT_AVAILABLE = True
+except ImportError:
+    LangDetectException = Exception
+    LANGDETECT_AVAILABLE = False
 
 # Mistral AI SDK
 try:
@@ -42,6 +70,9 @@ except ImportError:
     SENTENCE_TRANSFORMER_AVAILABLE = False
     print("⚠️  Sentence Transformers not installed. Run: pip install sentence-transformers")
 
+# Query-time vector search needs the full ML stack; BM25 retrieval works without it
+VECTOR_SEARCH_AVAILABLE = NUMPY_AVAILABLE and FAISS_AVAILABLE and SENTENCE_TRANSFORMER_AVAILABLE
+
 
 class LanguageDetector:
     """Detect language (English/Tamil) with fallback"""
@@ -57,6 +88,8 @@ class LanguageDetector:
             tamil_chars = sum(1 for c in text if '\u0B80' <= c <= '\u0BFF')
             if tamil_chars > len(text) * 0.3:  # 30%+ Tamil characters
                 return 'ta'
+            if not LANGDETECT_AVAILABLE:
+                return 'en'
             
             # Use langdetect for English/Tamil
             detected = detect(text)
@@ -72,10 +105,30 @@ class LanguageDetector:
         return tamil_chars > len(text) * 0.2
 
 
+EMBEDDING_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+
+def content_hash(text: str) -> str:
+    """Fingerprint of the text an embedding was computed from"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def vector_to_blob(vector: "np.ndarray") -> bytes:
+    """Compact little-endian float32 bytes for ChatbotKnowledge.embedding_* columns"""
+    return np.asarray(vector, dtype='<f4').tobytes()
+
+
+def blob_to_vector(blob: Optional[bytes], dimension: int = 384) -> Optional["np.ndarray"]:
+    """Inverse of vector_to_blob; None when the blob is missing or has the wrong size"""
+    if not blob or len(blob) != dimension * 4:
+        return None
+    return np.frombuffer(blob, dtype='<f4').astype('float32')
+
+
 class EmbeddingService:
     """Generate embeddings for text using Sentence Transformers"""
     
-    def __init__(self, model_name: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"):
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
         """
         Initialize embedding model
         Using multilingual model for English + Tamil support
@@ -83,6 +136,7 @@ class EmbeddingService:
         if not SENTENCE_TRANSFORMER_AVAILABLE:
             raise ImportError("sentence-transformers not installed")
         
+        self.model_name = model_name
         try:
             # Initialize with device='cpu' to avoid meta tensor issues
             import torch
@@ -94,7 +148,12 @@ class EmbeddingService:
             self.model = None
             self.dimension = 384
     
-    def encode(self, text: str) -> np.ndarray:
+    @property
+    def available(self) -> bool:
+        """False when the model failed to load and encode() returns zero vectors"""
+        return self.model is not None
+    
+    def encode(self, text: str) -> "np.ndarray":
         """Generate embedding vector for text"""
         if self.model is None:
             # Return zero vector if model failed to load
@@ -105,7 +164,7 @@ class EmbeddingService:
             print(f"⚠️  Encoding failed: {e}")
             return np.zeros(self.dimension)
     
-    def encode_batch(self, texts: List[str]) -> np.ndarray:
+    def encode_batch(self, texts: List[str]) -> "np.ndarray":
         """Generate embeddings for multiple texts"""
         if self.model is None:
             # Return zero vectors if model failed to load
@@ -113,21 +172,74 @@ class EmbeddingService:
         return self.model.encode(texts, convert_to_numpy=True)
 
 
+CHATBOT_INDEX_DIR = os.getenv(
+    "CHATBOT_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "chatbot_index")
+)
+# How often a worker checks the index directory for a newer version
+CHATBOT_INDEX_CHECK_SECONDS = float(os.getenv("CHATBOT_INDEX_CHECK_SECONDS", "5"))
+# Versions kept on disk (workers may still have an older one mapped)
+CHATBOT_INDEX_KEEP_VERSIONS = 3
+
+
 class FAISSVectorStore:
-    """FAISS-based vector search for knowledge retrieval"""
+    """
+    FAISS-based vector search for knowledge retrieval
+    
+    Vectors are stored under their knowledge document ID (IndexIDMap2), so a
+    single document can be upserted or removed without re-embedding the rest.
+    
+    Indexes are persisted under index_dir as versioned snapshots
+    (v<version>/index_en.faiss, index_ta.faiss, documents.json) with a
+    CURRENT file naming the live version. Workers memory-map the current
+    version at startup and pick up newer versions written by any other
+    worker, so restarts never re-encode the knowledge base.
+    """
     
-    def __init__(self, dimension: int = 384):
+    FORMAT = 2  # documents.json layout: ID-mapped indexes
+    
+    def __init__(self, dimension: int = 384, index_dir: str = CHATBOT_INDEX_DIR):
         self.dimension = dimension
-        self.index_en = faiss.IndexFlatL2(dimension)  # English index
-        self.index_ta = faiss.IndexFlatL2(dimension)  # Tamil index
-        self.documents_en: List[Dict] = []
-        self.documents_ta: List[Dict] = []
-        self.embedding_service = EmbeddingService()
+        self.index_dir = index_dir
+        self.index_en = self._new_index()  # English index
+        self.index_ta = self._new_index()  # Tamil index
+        self.documents_en: Dict[int, Dict] = {}  # doc_id -> document
+        self.documents_ta: Dict[int, Dict] = {}
+        self.version: Optional[str] = None
+        self._mapped = False  # indexes are read-only mmaps of a saved version
+        self._unreadable: Optional[str] = None  # version that failed to load (warned once)
+        self._embedding_service = None
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+        self.load_latest()
+    
+    @property
+    def embedding_service(self) -> "EmbeddingService":
+        """Embedding model, loaded on first use (not needed to serve a persisted index)"""
+        if self._embedding_service is None:
+            self._embedding_service = EmbeddingService()
+        return self._embedding_service
+    
+    def _new_index(self):
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(self.dimension))
+    
+    def _make_writable(self):
+        """Copy mmap-loaded indexes into memory before modifying them"""
+        if self._mapped:
+            self.index_en = faiss.clone_index(self.index_en)
+            self.index_ta = faiss.clone_index(self.index_ta)
+            self._mapped = False
+    
+    def _target(self, language: str):
+        if language == 'en':
+            return self.index_en, self.documents_en
+        return self.index_ta, self.documents_ta
     
     def add_document(self, doc_id: int, title: str, content: str, language: str, 
-                     category: str, metadata: Dict = None):
-        """Add document to vector store"""
-        embedding = self.embedding_service.encode(content)
+                     category: str, metadata: Dict = None, embedding: "np.ndarray" = None):
+        """Add (or replace) a document's vector in the language's index"""
+        if embedding is None:
+            embedding = self.embedding_service.encode(content)
         
         doc_data = {
             'id': doc_id,
@@ -137,70 +249,253 @@ class FAISSVectorStore:
             'metadata': metadata or {}
         }
         
-        if language == 'en':
-            self.index_en.add(np.array([embedding]))
-            self.documents_en.append(doc_data)
-        else:
-            self.index_ta.add(np.array([embedding]))
-            self.documents_ta.append(doc_data)
+        with self._lock:
+            self._make_writable()
+            index, documents = self._target(language)
+            ids = np.array([doc_id], dtype='int64')
+            index.remove_ids(ids)
+            index.add_with_ids(np.array([embedding], dtype='float32'), ids)
+            documents[doc_id] = doc_data
+    
+    @staticmethod
+    def knowledge_texts(doc: Dict) -> Dict[str, str]:
+        """Text indexed per language for a knowledge row dict"""
+        texts = {'en': doc.get('content_en') or doc['content']}
+        if doc.get('content_ta'):
+            texts['ta'] = doc['content_ta']
+        return texts
+    
+    def embed_documents(self, documents: List[Dict]) -> None:
+        """
+        Fill doc['vectors'][language] for every indexed text that has no
+        precomputed vector, using a single encode_batch call
+        """
+        missing = []
+        for doc in documents:
+            vectors = doc.setdefault('vectors', {})
+            for language, text in self.knowledge_texts(doc).items():
+                if vectors.get(language) is None:
+                    missing.append((vectors, language, text))
+        if not missing:
+            return
+        embeddings = self.embedding_service.encode_batch([text for _, _, text in missing])
+        for (vectors, language, _), embedding in zip(missing, embeddings):
+            vectors[language] = embedding
+    
+    def _add_knowledge(self, doc: Dict):
+        """Index the English and (when present) Tamil content of a knowledge row dict"""
+        vectors = doc.get('vectors') or {}
+        for language, text in self.knowledge_texts(doc).items():
+            self.add_document(
+                doc_id=doc['id'],
+                title=doc['title'],
+                content=text,
+                language=language,
+                category=doc['category'],
+                metadata={'keywords': doc.get('keywords')},
+                embedding=vectors.get(language)
+            )
     
-    def search(self, query: str, language: str, top_k: int = 5) -> List[Dict]:
-        """Search for most relevant documents"""
-        query_embedding = self.embedding_service.encode(query)
+    def _remove(self, doc_id: int, language: str) -> bool:
+        index, documents = self._target(language)
+        if doc_id not in documents:
+            return False
+        self._make_writable()
+        index, documents = self._target(language)
+        index.remove_ids(np.array([doc_id], dtype='int64'))
+        del documents[doc_id]
+        return True
+    
+    def search(self, query: str, language: str, top_k: int = 5,
+               query_embedding: "np.ndarray" = None) -> List[Dict]:
+        """Search for most relevant documents (query_embedding: already encoded query, if any)"""
+        self.refresh_if_stale()
         
         # Select appropriate index
-        index = self.index_en if language == 'en' else self.index_ta
-        documents = self.documents_en if language == 'en' else self.documents_ta
+        index, documents = self._target(language)
         
         if index.ntotal == 0:
             return []
         
+        if query_embedding is None:
+            query_embedding = self.embedding_service.encode(query)
+        
         # Search
-        distances, indices = index.search(np.array([query_embedding]), min(top_k, index.ntotal))
+        distances, indices = index.search(
+            np.array([query_embedding], dtype='float32'), min(top_k, index.ntotal)
+        )
         
         results = []
-        for idx, distance in zip(indices[0], distances[0]):
-            if idx < len(documents):
-                doc = documents[idx].copy()
+        for doc_id, distance in zip(indices[0], distances[0]):
+            doc = documents.get(int(doc_id))
+            if doc is not None:
+                doc = doc.copy()
                 doc['relevance_score'] = float(1 / (1 + distance))  # Convert distance to similarity
                 results.append(doc)
         
         return results
     
+    @contextmanager
+    def _writer_lock(self):
+        """
+        Hold the index for a load -> modify -> save cycle: an exclusive flock
+        on index_dir/.lock shared by every worker process, so two workers
+        publishing at once cannot drop each other's edits
+        """
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(os.path.join(self.index_dir, ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def upsert_document(self, doc: Dict) -> str:
+        """
+        Re-index one knowledge document (same dict shape as rebuild_index).
+        Inactive documents are removed. Publishes a new index version.
+        """
+        active = doc.get('is_active', True)
+        if active:
+            self.embed_documents([doc])  # Outside the lock: encoding is the slow part
+        with self._writer_lock():
+            # Start from the newest version so another worker's edits are kept
+            self.load_latest()
+            self._remove(doc['id'], 'en')
+            self._remove(doc['id'], 'ta')
+            if active:
+                self._add_knowledge(doc)
+            return self.save()
+    
+    def remove_document(self, doc_id: int) -> Optional[str]:
+        """Drop a knowledge document from both indexes; publishes a new version if it was indexed"""
+        with self._writer_lock():
+            self.load_latest()
+            removed_en = self._remove(doc_id, 'en')
+            removed_ta = self._remove(doc_id, 'ta')
+            if not (removed_en or removed_ta):
+                return None
+            return self.save()
+    
     def rebuild_index(self, documents: List[Dict]):
-        """Rebuild FAISS index from database documents"""
-        # Clear existing indices
-        self.index_en = faiss.IndexFlatL2(self.dimension)
-        self.index_ta = faiss.IndexFlatL2(self.dimension)
-        self.documents_en = []
-        self.documents_ta = []
-        
-        # Add all documents
-        for doc in documents:
-            if doc.get('is_active', True):
-                self.add_document(
-                    doc_id=doc['id'],
-                    title=doc['title'],
-                    content=doc.get('content_en') or doc['content'],
-                    language='en',
-                    category=doc['category'],
-                    metadata={'keywords': doc.get('keywords')}
-                )
-                
-                if doc.get('content_ta'):
-                    self.add_document(
-                        doc_id=doc['id'],
-                        title=doc['title'],
-                        content=doc['content_ta'],
-                        language='ta',
-                        category=doc['category'],
-                        metadata={'keywords': doc.get('keywords')}
-                    )
+        """Rebuild FAISS index from database documents and publish it as a new version"""
+        # Vectors not supplied are encoded in one batch
+        active = [doc for doc in documents if doc.get('is_active', True)]
+        self.embed_documents(active)
+        with self._writer_lock():
+            # Clear existing indices
+            self.index_en = self._new_index()
+            self.index_ta = self._new_index()
+            self.documents_en = {}
+            self.documents_ta = {}
+            self._mapped = False
+            
+            for doc in active:
+                self._add_knowledge(doc)
+            
+            self.save()
+    
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    
+    def _current_file(self) -> str:
+        return os.path.join(self.index_dir, "CURRENT")
+    
+    def _read_current_version(self) -> Optional[str]:
+        try:
+            with open(self._current_file()) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+    
+    def save(self) -> str:
+        """Write the indexes as a new version and point CURRENT at it"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        version = f"{time.time_ns():020d}"
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=self.index_dir)
+        faiss.write_index(self.index_en, os.path.join(staging, "index_en.faiss"))
+        faiss.write_index(self.index_ta, os.path.join(staging, "index_ta.faiss"))
+        with open(os.path.join(staging, "documents.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "format": self.FORMAT,
+                "version": version,
+                "dimension": self.dimension,
+                "en": list(self.documents_en.values()),
+                "ta": list(self.documents_ta.values())
+            }, f, ensure_ascii=False)
+        os.replace(staging, os.path.join(self.index_dir, f"v{version}"))
+        
+        # Atomic switch for every worker
+        pointer = self._current_file() + ".tmp"
+        with open(pointer, "w") as f:
+            f.write(version)
+        os.replace(pointer, self._current_file())
+        
+        self.version = version
+        self._checked_at = time.monotonic()
+        self._prune_versions()
+        return version
+    
+    def load_latest(self) -> bool:
+        """Memory-map the version named by CURRENT; returns False when there is none"""
+        version = self._read_current_version()
+        if version is None or version in (self.version, self._unreadable):
+            return False
+        path = os.path.join(self.index_dir, f"v{version}")
+        try:
+            flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+            index_en = faiss.read_index(os.path.join(path, "index_en.faiss"), flags)
+            index_ta = faiss.read_index(os.path.join(path, "index_ta.faiss"), flags)
+            with open(os.path.join(path, "documents.json"), encoding="utf-8") as f:
+                documents = json.load(f)
+        except Exception as e:
+            print(f"⚠️  Could not load chatbot index version {version}: {e}")
+            self._unreadable = version
+            return False
+        if documents.get("format") != self.FORMAT:
+            print(f"⚠️  Chatbot index version {version} uses an old layout; rebuild the index")
+            self._unreadable = version
+            return False
+        
+        with self._lock:
+            self.index_en, self.index_ta = index_en, index_ta
+            self.documents_en = {doc['id']: doc for doc in documents["en"]}
+            self.documents_ta = {doc['id']: doc for doc in documents["ta"]}
+            self.version = version
+            self._mapped = True
+        print(f"✅ Loaded chatbot index version {version} "
+              f"({index_en.ntotal} en / {index_ta.ntotal} ta vectors)")
+        return True
+    
+    def refresh_if_stale(self) -> bool:
+        """Reload when another worker published a newer version (checked every few seconds)"""
+        now = time.monotonic()
+        if now - self._checked_at < CHATBOT_INDEX_CHECK_SECONDS:
+            return False
+        self._checked_at = now
+        return self.load_latest()
+    
+    def _prune_versions(self) -> None:
+        versions = sorted(
+            name for name in os.listdir(self.index_dir)
+            if name.startswith("v") and os.path.isdir(os.path.join(self.index_dir, name))
+        )
+        for name in versions[:-CHATBOT_INDEX_KEEP_VERSIONS]:
+            shutil.rmtree(os.path.join(self.index_dir, name), ignore_errors=True)
 
 
 class MistralService:
     """Mistral LLM integration for chat responses"""
     
+    # Without the LLM, a retrieved document is returned verbatim above this relevance
+    FALLBACK_MIN_RELEVANCE = 0.35
+    FALLBACK_MAX_CHARS = 600
+    
     def __init__(self):
         self.api_key = os.getenv("MISTRAL_API_KEY")
         self.client = None
@@ -226,10 +521,22 @@ class MistralService:
         Generate chatbot response using Mistral
         Returns: (response_text, confidence_score)
         """
+        reply, confidence, _ = self.generate_response_with_status(
+            user_message, context_docs, language, conversation_history
+        )
+        return reply, confidence
+    
+    def generate_response_with_status(self, user_message: str, context_docs: List[Dict], 
+                                      language: str, conversation_history: List[Dict] = None) -> Tuple[str, float, bool]:
+        """
+        generate_response plus whether the reply may be reused for the same
+        question (False when the Mistral call failed and a fallback was used)
+        Returns: (response_text, confidence_score, reusable)
+        """
         
         # Fallback if Mistral not available
         if not self.client:
-            return self._generate_fallback_response(user_message, language, context_docs)
+            return (*self._generate_fallback_response(user_message, language, context_docs), True)
         
         try:
             # Build system prompt
@@ -275,11 +582,11 @@ Respond in {'Tamil' if language == 'ta' else 'English'} only."""
             # Calculate confidence based on context relevance
             confidence = self._calculate_confidence(context_docs, user_message)
             
-            return reply, confidence
+            return reply, confidence, True
             
         except Exception as e:
             print(f"Mistral API error: {e}")
-            return self._generate_fallback_response(user_message, language, context_docs)
+            return (*self._generate_fallback_response(user_message, language, context_docs), False)
     
     def _build_system_prompt(self, language: str) -> str:
         """Build system prompt for Mistral"""
@@ -356,6 +663,14 @@ END EVERY RESPONSE WITH:
         """Simple rule-based responses when Mistral unavailable"""
         message_lower = user_message.lower()
         
+        # Answer from the best knowledge match when retrieval found a good one
+        if context_docs and context_docs[0].get('relevance_score', 0) >= self.FALLBACK_MIN_RELEVANCE:
+            best = context_docs[0]
+            content = best['content'].strip()
+            if len(content) > self.FALLBACK_MAX_CHARS:
+                content = content[:self.FALLBACK_MAX_CHARS].rsplit(' ', 1)[0] + '…'
+            return (content, round(best['relevance_score'], 2))
+        
         # Greeting patterns
         if any(word in message_lower for word in ['hi', 'hello', 'hey', 'vanakam', 'வணக்கம்']):
             if language == 'ta':
@@ -0,0 +1,286 @@
+"""
+Lexical Retrieval - BM25 over the chatbot knowledge base
+Pure Python (no numpy, FAISS or embedding model), so the chatbot is grounded
+on every deployment tier. When vector search is installed, fuse_results()
+combines both rankings.
+
+Each language has its own inverted index: term -> [(doc_id, weight)], where
+weight is the document's full BM25 contribution for that term, precomputed at
+build time. A query is then a handful of dict lookups and additions.
+"""
+
+import heapq
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from operator import itemgetter
+from typing import Dict, List, Optional, Set, Tuple
+
+BM25_K1 = float(os.getenv("CHATBOT_BM25_K1", "1.5"))
+BM25_B = float(os.getenv("CHATBOT_BM25_B", "0.75"))
+# Weight of the vector ranking in hybrid fusion (0 = BM25 only, 1 = vectors only)
+CHATBOT_VECTOR_WEIGHT = float(os.getenv("CHATBOT_VECTOR_WEIGHT", "0.5"))
+# Reciprocal rank fusion constant (standard value; damps the influence of rank 1)
+RRF_K = 60
+
+# Title and keyword matches count as several occurrences (BM25F-style field boost)
+FIELD_WEIGHTS = {'title': 3, 'keywords': 2, 'content': 1}
+# BM25 score mapped to relevance 0.5; keeps relevance_score in 0..1 like vector search
+SCORE_SCALE = 5.0
+
+# Letters/digits of any script, plus the Tamil block (its vowel signs are not \w)
+_TOKEN_RE = re.compile(r"(?:[^\W_]|[\u0B80-\u0BFF])+")
+_TAMIL_RE = re.compile(r"[\u0B80-\u0BFF]")
+
+ENGLISH_STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from have how i in is it me my
+of on or our please the this to was we what when where which who why will
+with you your
+""".split())
+
+TAMIL_STOPWORDS = frozenset("""
+ஒரு இந்த அந்த என்ன எப்படி எங்கே எப்போது ஏன் மற்றும் உள்ளது உள்ளன இருக்கிறது
+நான் நீங்கள் எனக்கு உங்கள் எங்கள் தயவுசெய்து வேண்டும்
+""".split())
+
+# Tamil letters a stem may end with before a suffix
+_VOWEL_END = re.compile(r"[\u0B85-\u0B94\u0BBE-\u0BCC]$")  # any vowel or vowel sign
+_FRONT_VOWEL_END = re.compile(r"[\u0B87\u0B88\u0B8E-\u0B90\u0BBF\u0BC0\u0BC6-\u0BC8]$")  # i, ii, e, ee, ai
+_FINAL_CONSONANT_END = re.compile(r"[ணனமயரலளழஸ]$")  # consonants a word can end in
+
+# Common case/number/clitic endings as (ending, replacement, required stem
+# ending), longest first, so an inflected word stems to its base form:
+# "சேவைகளுக்கு"/"சேவையில்" -> "சேவை", "வருடத்தில்" -> "வருடம்",
+# "பிரிண்டரில்" -> "பிரிண்டர்". Bare ை, ா and வை are never stripped: as many
+# base words end in them (சேவை, விலை) as accusatives do.
+TAMIL_SUFFIXES = sorted([
+    ("களுக்கு", "", None), ("களில்", "", None), ("களின்", "", None),
+    ("களால்", "", None), ("களை", "", None), ("களும்", "", None), ("கள்", "", None),
+    ("த்திற்கு", "ம்", None), ("த்துக்கு", "ம்", None), ("த்தில்", "ம்", None),
+    ("த்தின்", "ம்", None), ("த்தால்", "ம்", None),
+    ("யுடன்", "", _FRONT_VOWEL_END), ("யில்", "", _FRONT_VOWEL_END),
+    ("யின்", "", _FRONT_VOWEL_END), ("யும்", "", _FRONT_VOWEL_END), ("யை", "", _FRONT_VOWEL_END),
+    ("க்கு", "", _VOWEL_END),
+    ("ுக்கு", "்", _FINAL_CONSONANT_END), ("ிற்கு", "்", _FINAL_CONSONANT_END),
+    ("ுடன்", "்", _FINAL_CONSONANT_END), ("ோடு", "்", _FINAL_CONSONANT_END),
+    ("ிடம்", "்", _FINAL_CONSONANT_END), ("ில்", "்", _FINAL_CONSONANT_END),
+    ("ின்", "்", _FINAL_CONSONANT_END), ("ால்", "்", _FINAL_CONSONANT_END),
+    ("ும்", "்", _FINAL_CONSONANT_END),
+], key=lambda suffix: len(suffix[0]), reverse=True)
+MIN_STEM_LENGTH = 2
+
+
+def _stem_tamil(token: str) -> str:
+    for suffix, replacement, stem_end in TAMIL_SUFFIXES:
+        if not token.endswith(suffix):
+            continue
+        stem = token[:-len(suffix)]
+        if len(stem) >= MIN_STEM_LENGTH and (stem_end is None or stem_end.search(stem)):
+            return stem + replacement
+    return token
+
+
+def _stem_english(token: str) -> str:
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Normalised, stop-word-free, lightly stemmed terms of mixed English/Tamil text"""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFC", text).lower()
+    terms = []
+    for token in _TOKEN_RE.findall(text):
+        if token in ENGLISH_STOPWORDS or token in TAMIL_STOPWORDS:
+            continue
+        terms.append(_stem_tamil(token) if _TAMIL_RE.search(token) else _stem_english(token))
+    return terms
+
+
+class BM25Index:
+    """Inverted index with precomputed BM25 weights for one language"""
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+        self.documents: Dict[int, Dict] = {}
+
+    def build(self, documents: List[Dict]) -> None:
+        """documents: dicts with id/title/content/category/metadata and 'fields' {field: text}"""
+        term_counts: Dict[int, Counter] = {}
+        for doc in documents:
+            counts = Counter()
+            for field, text in doc['fields'].items():
+                weight = FIELD_WEIGHTS.get(field, 1)
+                for term in tokenize(text):
+                    counts[term] += weight
+            term_counts[doc['id']] = counts
+
+        total = len(term_counts)
+        lengths = {doc_id: sum(counts.values()) for doc_id, counts in term_counts.items()}
+        avg_length = (sum(lengths.values()) / total) if total else 0.0
+
+        document_frequency = Counter()
+        for counts in term_counts.values():
+            document_frequency.update(counts.keys())
+
+        postings = defaultdict(list)
+        for doc_id, counts in term_counts.items():
+            norm = self.k1 * (1 - self.b + self.b * lengths[doc_id] / avg_length) if avg_length else self.k1
+            for term, tf in counts.items():
+                df = document_frequency[term]
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                postings[term].append((doc_id, idf * tf * (self.k1 + 1) / (tf + norm)))
+
+        self.postings = dict(postings)
+        self.documents = {
+            doc['id']: {key: value for key, value in doc.items() if key != 'fields'}
+            for doc in documents
+        }
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def search(self, query: str, top_k: int = 5) -> List[Dict]:
+        """Best matching documents, shaped like FAISSVectorStore.search results"""
+        scores = defaultdict(float)
+        for term, query_tf in Counter(tokenize(query)).items():
+            for doc_id, weight in self.postings.get(term, ()):
+                scores[doc_id] += weight * query_tf
+
+        results = []
+        for doc_id, score in heapq.nlargest(top_k, scores.items(), key=itemgetter(1)):
+            doc = self.documents[doc_id].copy()
+            doc['bm25_score'] = score
+            doc['relevance_score'] = score / (score + SCORE_SCALE)
+            results.append(doc)
+        return results
+
+
+class LexicalRetriever:
+    """
+    English and Tamil BM25 indexes over the active knowledge base.
+
+    The caller passes a signature of the knowledge table (row count, last
+    update, ...) to rebuild(); is_stale() tells when it is worth comparing it
+    again, so workers notice edits made through any other worker.
+    """
+
+    def __init__(self, check_interval: float = 5.0):
+        self.check_interval = check_interval
+        self.indexes = {'en': BM25Index(), 'ta': BM25Index()}
+        self.signature = None
+        self.stamps: Dict[int, object] = {}  # doc_id -> updated_at of the indexed version
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _fields(doc: Dict, content: str) -> Dict[str, str]:
+        return {'title': doc['title'], 'keywords': doc.get('keywords') or '', 'content': content}
+
+    def rebuild(self, knowledge: List[Dict], signature=None) -> Set[int]:
+        """
+        knowledge: active ChatbotKnowledge rows as dicts (same shape as for the
+        vector store). Returns the IDs added, removed or edited since the last build.
+        """
+        stamps = {doc['id']: doc.get('updated_at') for doc in knowledge}
+        changed = set(stamps) ^ set(self.stamps)
+        changed.update(
+            doc_id for doc_id, stamp in stamps.items()
+            if doc_id in self.stamps and self.stamps[doc_id] != stamp
+        )
+
+        entries = {'en': [], 'ta': []}
+        for doc in knowledge:
+            texts = {'en': doc.get('content_en') or doc['content']}
+            if doc.get('content_ta'):
+                texts['ta'] = doc['content_ta']
+            for language, content in texts.items():
+                entries[language].append({
+                    'id': doc['id'],
+                    'title': doc['title'],
+                    'content': content,
+                    'category': doc['category'],
+                    'metadata': {'keywords': doc.get('keywords')},
+                    'fields': self._fields(doc, content)
+                })
+
+        indexes = {}
+        for language, documents in entries.items():
+            indexes[language] = BM25Index()
+            indexes[language].build(documents)
+
+        with self._lock:
+            self.indexes = indexes
+            self.signature = signature
+            self.stamps = stamps
+            self._checked_at = time.monotonic()
+        return changed
+
+    def is_stale(self) -> bool:
+        """True when never built, invalidated, or the check interval has passed"""
+        return self.signature is None or time.monotonic() - self._checked_at >= self.check_interval
+
+    def mark_checked(self) -> None:
+        self._checked_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Force a rebuild on the next query (knowledge edited in this worker)"""
+        self.signature = None
+
+    def search(self, query: str, language: str, top_k: int = 5) -> List[Dict]:
+        """Search the language's index; Tamil queries fall back to English documents"""
+        indexes = self.indexes
+        results = indexes.get(language, indexes['en']).search(query, top_k)
+        if not results and language != 'en':
+            results = indexes['en'].search(query, top_k)
+        return results
+
+
+def fuse_results(lexical: List[Dict], vector: List[Dict], top_k: int = 5,
+                 vector_weight: float = CHATBOT_VECTOR_WEIGHT) -> List[Dict]:
+    """
+    Hybrid ranking by weighted reciprocal rank fusion, which only uses ranks
+    and so does not depend on how BM25 and L2 distances happen to scale.
+    relevance_score is the stronger of the two per-method scores (0..1),
+    so confidence still reflects how well the best evidence matched.
+    """
+    merged: Dict[int, Dict] = {}
+    for source, weight, docs in (
+        ('vector_score', vector_weight, vector),
+        ('lexical_score', 1 - vector_weight, lexical)
+    ):
+        for rank, doc in enumerate(docs, 1):
+            entry = merged.get(doc['id'])
+            if entry is None:
+                entry = merged[doc['id']] = dict(
+                    doc, vector_score=0.0, lexical_score=0.0, fusion_score=0.0
+                )
+            if entry[source]:
+                continue  # same document twice in one list: keep its best rank
+            entry[source] = doc.get('relevance_score', 0.0)
+            entry['fusion_score'] += weight / (RRF_K + rank)
+
+    for entry in merged.values():
+        entry['relevance_score'] = max(entry['vector_score'], entry['lexical_score'])
+    return sorted(merged.values(), key=itemgetter('fusion_score'), reverse=True)[:top_k]
+
+
+_lexical_retriever: Optional[LexicalRetriever] = None
+
+
+def get_lexical_retriever(check_interval: float = 5.0) -> LexicalRetriever:
+    """Get or create the process-wide lexical retriever"""
+    global _lexical_retriever
+    if _lexical_retriever is None:
+        _lexical_retriever = LexicalRetriever(check_interval)
+    return _lexical_retriever
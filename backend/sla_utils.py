@@ -3,136 +3,267 @@ SLA Calculation and Escalation Utilities
 Handles SLA status computation and notification triggers
 """
 from datetime import datetime, timedelta
-from typing import Dict, Optional
-from sqlalchemy.orm import Session
-from models import Complaint, User, UserRole
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy import String, and_, case, cast, func, literal, or_
+from sqlalchemy.orm import Session, joinedload
+from models import Complaint, UserRole
+from analytics_rollup import mark_days_dirty
 from notification_service import NotificationService
 
-# SLA Time Limits (in hours)
+# ============================================
+# SLA CONFIGURATION (single source of truth)
+# ============================================
+
+# SLA Time Limits (in hours); also used to set Complaint.sla_time on creation
 SLA_LIMITS = {
-    "CRITICAL": 4,   # HOT
-    "URGENT": 12,    # WARM
-    "NORMAL": 24     # COLD
+    "CRITICAL": 2,
+    "URGENT": 6,
+    "NORMAL": 24
 }
+DEFAULT_SLA_PRIORITY = "NORMAL"
 
-def calculate_sla_status(complaint: Complaint) -> Dict:
+# A ticket is in warning once 30% of its window (and at least 1 hour) remains
+SLA_WARNING_REMAINING_RATIO = 0.3
+SLA_WARNING_MIN_SECONDS = 3600
+
+OPEN_SLA_STATUSES = ['ASSIGNED', 'ON_THE_WAY', 'IN_PROGRESS']
+CLOSED_SLA_STATUSES = ['COMPLETED', 'CANCELLED']
+PAUSED_SLA_STATUSES = ['ON_HOLD']
+
+
+def sla_window_seconds(priority: Optional[str]) -> int:
+    """SLA window for a priority; NULL/unknown priorities use NORMAL"""
+    return SLA_LIMITS.get(priority or DEFAULT_SLA_PRIORITY, SLA_LIMITS[DEFAULT_SLA_PRIORITY]) * 3600
+
+
+def sla_warning_seconds(priority: Optional[str]) -> float:
+    """Remaining seconds at which a ticket of this priority enters warning"""
+    return max(sla_window_seconds(priority) * SLA_WARNING_REMAINING_RATIO, SLA_WARNING_MIN_SECONDS)
+
+
+def calculate_sla_time(priority: Optional[str], created_at: datetime) -> datetime:
+    """SLA due time for a new ticket"""
+    return created_at + timedelta(seconds=sla_window_seconds(priority))
+
+
+def evaluate_sla(complaints: Sequence[Complaint], now: Optional[datetime] = None) -> List[Dict]:
     """
-    Calculate SLA status for a service request
-    Returns: {
-        'status': 'ok' | 'warning' | 'breached' | 'paused',
-        'sla_due_time': datetime,
+    SLA state for a batch of complaints, evaluated column-wise against one
+    `now`. Deadlines are the stored sla_time, falling back to created_at plus
+    the priority window. Returns one dict per complaint, in order: {
+        'status': 'ok' | 'warning' | 'breached' | 'paused' | 'completed',
+        'sla_due_time': datetime | None,
         'remaining_seconds': int,
         'remaining_hours': float,
-        'percentage_remaining': float
+        'percentage_remaining': float,
+        'total_seconds': int
     }
     """
-    # If completed or on hold, SLA is paused
-    if complaint.status in ['COMPLETED', 'CANCELLED']:
-        return {
-            'status': 'completed',
-            'sla_due_time': None,
-            'remaining_seconds': 0,
-            'remaining_hours': 0,
-            'percentage_remaining': 0
-        }
-    
-    if complaint.status == 'ON_HOLD':
-        return {
-            'status': 'paused',
-            'sla_due_time': complaint.sla_time,
-            'remaining_seconds': 0,
-            'remaining_hours': 0,
-            'percentage_remaining': 0
-        }
-    
-    # Get SLA hours based on priority
-    priority = complaint.priority or "NORMAL"
-    sla_hours = SLA_LIMITS.get(priority, 24)
-    
-    # Calculate SLA due time
-    sla_due_time = complaint.created_at + timedelta(hours=sla_hours)
-    
-    # Calculate remaining time
-    now = datetime.utcnow()
-    remaining = sla_due_time - now
-    remaining_seconds = int(remaining.total_seconds())
-    remaining_hours = remaining_seconds / 3600
-    
-    # Calculate percentage remaining
-    total_sla_seconds = sla_hours * 3600
-    percentage_remaining = (remaining_seconds / total_sla_seconds) * 100 if total_sla_seconds > 0 else 0
-    
-    # Determine status
-    if remaining_seconds <= 0:
-        status = 'breached'
-    elif percentage_remaining <= 30:
-        status = 'warning'
-    else:
-        status = 'ok'
+    now = now or datetime.utcnow()
+    statuses = [c.status for c in complaints]
+    windows = [sla_window_seconds(c.priority) for c in complaints]
+    warnings = [sla_warning_seconds(c.priority) for c in complaints]
+    deadlines = [
+        c.sla_time or (c.created_at + timedelta(seconds=w) if c.created_at else None)
+        for c, w in zip(complaints, windows)
+    ]
+    remaining = [int((d - now).total_seconds()) if d else 0 for d in deadlines]
     
-    return {
-        'status': status,
-        'sla_due_time': sla_due_time,
-        'remaining_seconds': remaining_seconds,
-        'remaining_hours': round(remaining_hours, 2),
-        'percentage_remaining': round(percentage_remaining, 2)
-    }
+    results = []
+    for status, window, warning, deadline, left in zip(statuses, windows, warnings, deadlines, remaining):
+        if status in CLOSED_SLA_STATUSES:
+            state, deadline, left = 'completed', None, 0
+        elif status in PAUSED_SLA_STATUSES:
+            state, left = 'paused', max(left, 0)
+        elif deadline is None:
+            state = 'ok'
+        elif left <= 0:
+            state = 'breached'
+        elif left <= warning:
+            state = 'warning'
+        else:
+            state = 'ok'
+        results.append({
+            'status': state,
+            'sla_due_time': deadline,
+            'remaining_seconds': left,
+            'remaining_hours': round(left / 3600, 2),
+            'percentage_remaining': round(left / window * 100, 2) if state != 'completed' else 0,
+            'total_seconds': window
+        })
+    return results
+
+
+def calculate_sla_status(complaint: Complaint) -> Dict:
+    """SLA status for a single service request (see evaluate_sla)"""
+    return evaluate_sla([complaint])[0]
+
+
+def _not_sent(flag):
+    """Treat NULL escalation flags (legacy rows) the same as False"""
+    return or_(flag.is_(None), flag == False)
+
+
+def _deadline_before(priority: str, moment: datetime):
+    """SQL predicate: the ticket's SLA deadline is at or before moment"""
+    return or_(
+        and_(Complaint.sla_time.isnot(None), Complaint.sla_time <= moment),
+        and_(
+            Complaint.sla_time.is_(None),
+            Complaint.created_at <= moment - timedelta(seconds=sla_window_seconds(priority))
+        )
+    )
+
+
+def _priority_clause(priority: str):
+    """SQL predicate for a priority bucket; NULL/unknown priorities use NORMAL"""
+    if priority == DEFAULT_SLA_PRIORITY:
+        return or_(
+            Complaint.priority.is_(None),
+            Complaint.priority.notin_([p for p in SLA_LIMITS if p != DEFAULT_SLA_PRIORITY])
+        )
+    return Complaint.priority == priority
+
+
+def sla_bucket_expr(now: datetime):
+    """
+    SQL CASE classifying open tickets as 'breached', 'warning' or 'ok' with
+    the same deadlines and thresholds as evaluate_sla
+    """
+    breached = or_(*[
+        and_(_priority_clause(p), _deadline_before(p, now)) for p in SLA_LIMITS
+    ])
+    warning = or_(*[
+        and_(_priority_clause(p), _deadline_before(p, now + timedelta(seconds=sla_warning_seconds(p))))
+        for p in SLA_LIMITS
+    ])
+    return case((breached, 'breached'), (warning, 'warning'), else_='ok')
+
+
+def sla_deadline_expr(db: Session):
+    """SQL expression for a ticket's SLA deadline (sla_time, else created_at + window)"""
+    window = case(
+        *[(Complaint.priority == p, sla_window_seconds(p)) for p in SLA_LIMITS if p != DEFAULT_SLA_PRIORITY],
+        else_=sla_window_seconds(DEFAULT_SLA_PRIORITY)
+    )
+    if db.bind.dialect.name == "sqlite":
+        fallback = func.strftime(
+            '%Y-%m-%d %H:%M:%f', Complaint.created_at,
+            literal('+') + cast(window, String) + ' seconds'
+        )
+    else:
+        fallback = Complaint.created_at + func.make_interval(0, 0, 0, 0, 0, 0, window)
+    return func.coalesce(Complaint.sla_time, fallback)
+
+
+def _sla_escalation_filter(now: datetime):
+    """
+    SQL predicate matching tickets that newly crossed a warning or breach
+    threshold, using the same deadlines and warning windows as evaluate_sla.
+    Comparisons are per priority bucket so they stay index-friendly and
+    dialect-neutral.
+    """
+    buckets = []
+    for priority in SLA_LIMITS:
+        priority_clause = _priority_clause(priority)
+        breached = _deadline_before(priority, now)
+        warned = _deadline_before(priority, now + timedelta(seconds=sla_warning_seconds(priority)))
+        buckets.append(and_(
+            priority_clause,
+            or_(
+                and_(breached, _not_sent(Complaint.sla_breach_sent)),
+                and_(~breached, warned, _not_sent(Complaint.sla_warning_sent))
+            )
+        ))
+    return and_(Complaint.status.in_(OPEN_SLA_STATUSES), or_(*buckets))
 
 
 def check_and_send_sla_notifications(db: Session, notif_service: NotificationService):
     """
-    Check all open service requests and send SLA notifications
+    Send SLA notifications for tickets that crossed a threshold since the last run
     Runs every 15 minutes via scheduler
+
+    Only tickets whose warning/breach flag still needs to flip are selected,
+    recipients are resolved once per run and all notifications plus flag
+    updates are committed in a single transaction.
     """
     print(f"\n🔔 [{datetime.now()}] Running SLA escalation check...")
     
-    # Get all open service requests
-    open_complaints = db.query(Complaint).filter(
-        Complaint.status.in_(['ASSIGNED', 'ON_THE_WAY', 'IN_PROGRESS'])
-    ).all()
+    now = datetime.utcnow()
+    candidates = db.query(Complaint).options(
+        joinedload(Complaint.assigned_engineer)
+    ).filter(_sla_escalation_filter(now)).all()
     
-    warning_count = 0
-    breach_count = 0
+    if not candidates:
+        print("✅ SLA Check Complete: 0 warnings, 0 breaches")
+        return {'warnings_sent': 0, 'breaches_sent': 0, 'notifications_sent': 0, 'total_checked': 0}
     
-    for complaint in open_complaints:
-        sla_status = calculate_sla_status(complaint)
-        
-        # Handle SLA Warning (30% time left)
+    recipients = notif_service.get_user_ids_by_role(db, [UserRole.ADMIN, UserRole.RECEPTION])
+    admin_ids = recipients[UserRole.ADMIN]
+    reception_ids = recipients[UserRole.RECEPTION]
+    
+    rows = []
+    warning_ids = []
+    breach_ids = []
+    flagged_days = set()
+    
+    for complaint, sla_status in zip(candidates, evaluate_sla(candidates, now)):
+        # Handle SLA Warning
         if sla_status['status'] == 'warning' and not complaint.sla_warning_sent:
-            send_sla_warning(db, notif_service, complaint, sla_status)
-            complaint.sla_warning_sent = True
-            warning_count += 1
+            rows += build_sla_warning(complaint, sla_status, admin_ids)
+            warning_ids.append(complaint.id)
+            flagged_days.add(complaint.created_at)
+            print(f"  ⚠️ SLA Warning queued for Ticket #{complaint.ticket_no}")
         
         # Handle SLA Breach
         elif sla_status['status'] == 'breached' and not complaint.sla_breach_sent:
-            send_sla_breach(db, notif_service, complaint, sla_status)
-            complaint.sla_breach_sent = True
-            breach_count += 1
+            rows += build_sla_breach(complaint, sla_status, admin_ids, reception_ids)
+            breach_ids.append(complaint.id)
+            flagged_days.add(complaint.created_at)
+            print(f"  🔴 SLA Breach queued for Ticket #{complaint.ticket_no}")
     
-    db.commit()
+    try:
+        notif_service.create_notifications_bulk(db, rows, commit=False)
+        if warning_ids:
+            db.query(Complaint).filter(Complaint.id.in_(warning_ids)).update(
+                {Complaint.sla_warning_sent: True}, synchronize_session=False
+            )
+        if breach_ids:
+            db.query(Complaint).filter(Complaint.id.in_(breach_ids)).update(
+                {Complaint.sla_breach_sent: True}, synchronize_session=False
+            )
+        # Bulk updates skip the flush hook that queues fact days
+        mark_days_dirty(db, flagged_days)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
     
-    print(f"✅ SLA Check Complete: {warning_count} warnings, {breach_count} breaches")
+    print(f"✅ SLA Check Complete: {len(warning_ids)} warnings, {len(breach_ids)} breaches")
     return {
-        'warnings_sent': warning_count,
-        'breaches_sent': breach_count,
-        'total_checked': len(open_complaints)
+        'warnings_sent': len(warning_ids),
+        'breaches_sent': len(breach_ids),
+        'notifications_sent': len(rows),
+        'total_checked': len(candidates)
     }
 
 
-def send_sla_warning(db: Session, notif_service: NotificationService, 
-                     complaint: Complaint, sla_status: Dict):
+def build_sla_warning(complaint: Complaint, sla_status: Dict,
+                      admin_ids: List[int]) -> List[dict]:
     """
-    Send SLA warning notification (30% time remaining)
+    Build SLA warning notification rows (see sla_warning_seconds)
     Recipients: Engineer (assigned), Admin
     """
     remaining_hours = abs(sla_status['remaining_hours'])
+    engineer_name = complaint.assigned_engineer.full_name if complaint.assigned_engineer else 'Unassigned'
+    title = f"⚠️ SLA Warning - Ticket #{complaint.ticket_no}"
+    rows = []
     
     # Notify assigned engineer
     if complaint.assigned_to:
-        notif_service.create_notification(
-            db=db,
-            user_id=complaint.assigned_to,
-            title=f"⚠️ SLA Warning - Ticket #{complaint.ticket_no}",
+        rows += NotificationService.build_notification_rows(
+            [complaint.assigned_to],
+            title=title,
             message=f"Only {remaining_hours:.1f} hours left to complete service. Customer: {complaint.customer_name}",
             notification_type="sla_warning",
             priority="high",
@@ -141,36 +272,35 @@ def send_sla_warning(db: Session, notif_service: NotificationService,
         )
     
     # Notify all admins
-    admins = db.query(User).filter(User.role == UserRole.ADMIN).all()
-    for admin in admins:
-        notif_service.create_notification(
-            db=db,
-            user_id=admin.id,
-            title=f"⚠️ SLA Warning - Ticket #{complaint.ticket_no}",
-            message=f"Service request nearing SLA breach. Engineer: {complaint.assigned_engineer.full_name if complaint.assigned_engineer else 'Unassigned'}. {remaining_hours:.1f}h remaining.",
-            notification_type="sla_warning",
-            priority="high",
-            module="service",
-            action_url=f"/admin/service-requests/{complaint.id}"
-        )
+    rows += NotificationService.build_notification_rows(
+        admin_ids,
+        title=title,
+        message=f"Service request nearing SLA breach. Engineer: {engineer_name}. {remaining_hours:.1f}h remaining.",
+        notification_type="sla_warning",
+        priority="high",
+        module="service",
+        action_url=f"/admin/service-requests/{complaint.id}"
+    )
     
-    print(f"  ⚠️ SLA Warning sent for Ticket #{complaint.ticket_no}")
+    return rows
 
 
-def send_sla_breach(db: Session, notif_service: NotificationService, 
-                    complaint: Complaint, sla_status: Dict):
+def build_sla_breach(complaint: Complaint, sla_status: Dict,
+                     admin_ids: List[int], reception_ids: List[int]) -> List[dict]:
     """
-    Send SLA breach notification
+    Build SLA breach notification rows
     Recipients: Engineer (assigned), Reception, Admin
     """
     overdue_hours = abs(sla_status['remaining_hours'])
+    engineer_name = complaint.assigned_engineer.full_name if complaint.assigned_engineer else 'Unassigned'
+    title = f"🔴 SLA BREACHED - Ticket #{complaint.ticket_no}"
+    rows = []
     
     # Notify assigned engineer
     if complaint.assigned_to:
-        notif_service.create_notification(
-            db=db,
-            user_id=complaint.assigned_to,
-            title=f"🔴 SLA BREACHED - Ticket #{complaint.ticket_no}",
+        rows += NotificationService.build_notification_rows(
+            [complaint.assigned_to],
+            title=title,
             message=f"URGENT: Service request is {overdue_hours:.1f} hours overdue! Customer: {complaint.customer_name}. Take immediate action.",
             notification_type="sla_breach",
             priority="critical",
@@ -179,34 +309,28 @@ def send_sla_breach(db: Session, notif_service: NotificationService,
         )
     
     # Notify all reception staff
-    reception_users = db.query(User).filter(User.role == UserRole.RECEPTION).all()
-    for reception in reception_users:
-        notif_service.create_notification(
-            db=db,
-            user_id=reception.id,
-            title=f"🔴 SLA BREACHED - Ticket #{complaint.ticket_no}",
-            message=f"Service request overdue by {overdue_hours:.1f} hours. Customer: {complaint.customer_name}, Phone: {complaint.phone}",
-            notification_type="sla_breach",
-            priority="critical",
-            module="service",
-            action_url=f"/reception/service-complaints"
-        )
+    rows += NotificationService.build_notification_rows(
+        reception_ids,
+        title=title,
+        message=f"Service request overdue by {overdue_hours:.1f} hours. Customer: {complaint.customer_name}, Phone: {complaint.phone}",
+        notification_type="sla_breach",
+        priority="critical",
+        module="service",
+        action_url=f"/reception/service-complaints"
+    )
     
     # Notify all admins
-    admins = db.query(User).filter(User.role == UserRole.ADMIN).all()
-    for admin in admins:
-        notif_service.create_notification(
-            db=db,
-            user_id=admin.id,
-            title=f"🔴 SLA BREACHED - Ticket #{complaint.ticket_no}",
-            message=f"CRITICAL: Service overdue by {overdue_hours:.1f}h. Engineer: {complaint.assigned_engineer.full_name if complaint.assigned_engineer else 'Unassigned'}. Priority: {complaint.priority}",
-            notification_type="sla_breach",
-            priority="critical",
-            module="service",
-            action_url=f"/admin/service-requests/{complaint.id}"
-        )
+    rows += NotificationService.build_notification_rows(
+        admin_ids,
+        title=title,
+        message=f"CRITICAL: Service overdue by {overdue_hours:.1f}h. Engineer: {engineer_name}. Priority: {complaint.priority}",
+        notification_type="sla_breach",
+        priority="critical",
+        module="service",
+        action_url=f"/admin/service-requests/{complaint.id}"
+    )
     
-    print(f"  🔴 SLA Breach notification sent for Ticket #{complaint.ticket_no}")
+    return rows
 
 
 def get_engineer_sla_stats(db: Session, engineer_id: int, 
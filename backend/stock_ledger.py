@@ -0,0 +1,184 @@
+"""
+Stock Ledger
+Every change to Product.stock_quantity goes through this module.
+
+- Product.stock_quantity stays the current balance, readable in O(1)
+- Decrements are a single conditional UPDATE (... WHERE stock_quantity >= n),
+  so concurrent approvals can never take stock below zero
+- Each change appends a stock_ledger row with the signed change and the
+  resulting balance; rows are never updated or deleted
+- stock_snapshots periodically record every balance together with the last
+  ledger entry it includes, so historical stock is snapshot + later entries
+
+Functions add to the caller's transaction and do not commit.
+"""
+
+from datetime import datetime
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from typing import Optional
+import os
+
+from models import Product, StockLedgerEntry, StockSnapshot
+
+STOCK_SNAPSHOT_INTERVAL_HOURS = int(os.getenv("STOCK_SNAPSHOT_INTERVAL_HOURS", "24"))
+
+
+class InsufficientStock(Exception):
+    """Raised when a deduction would take a product below zero"""
+
+    def __init__(self, product_id: int, available: int, required: int):
+        self.product_id = product_id
+        self.available = available
+        self.required = required
+        super().__init__(f"Insufficient stock. Available: {available}, Required: {required}")
+
+
+class UnknownProduct(Exception):
+    """Raised when the product row does not exist"""
+
+
+def _balance(db: Session, product_id: int) -> Optional[int]:
+    return db.execute(
+        select(Product.stock_quantity).where(Product.id == product_id)
+    ).scalar()
+
+
+def _record(db: Session, product_id: int, change: int, balance: int,
+            reason: str, reference, user_id: Optional[int]) -> StockLedgerEntry:
+    entry = StockLedgerEntry(
+        product_id=product_id,
+        change=change,
+        balance_after=balance,
+        reason=reason,
+        reference=str(reference) if reference is not None else None,
+        created_by=user_id
+    )
+    db.add(entry)
+    return entry
+
+
+def _apply(db: Session, product_id: int, change: int, guard) -> Optional[int]:
+    """Run the guarded UPDATE; returns the new balance or None when nothing matched"""
+    result = db.execute(
+        update(Product).where(Product.id == product_id, *guard).values(
+            stock_quantity=func.coalesce(Product.stock_quantity, 0) + change
+        ).execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        return None
+    # The UPDATE holds the row lock, so this reads our own write
+    return _balance(db, product_id)
+
+
+def _sync_identity_map(db: Session, product_id: int, balance: int) -> None:
+    product = db.identity_map.get(Session.identity_key(Product, product_id))
+    if product is not None:
+        # Keep loaded instances consistent without flagging them dirty
+        product.__dict__["stock_quantity"] = balance
+
+
+def deduct_stock(db: Session, product_id: int, quantity: int, reason: str,
+                 reference=None, user_id: Optional[int] = None) -> int:
+    """Atomically take quantity out of stock; raises InsufficientStock if it is not available"""
+    balance = _apply(
+        db, product_id, -quantity,
+        [func.coalesce(Product.stock_quantity, 0) >= quantity]
+    )
+    if balance is None:
+        current = db.execute(
+            select(Product.stock_quantity).where(Product.id == product_id)
+        ).first()
+        if current is None:
+            raise UnknownProduct(product_id)
+        raise InsufficientStock(product_id, current[0] or 0, quantity)
+    _record(db, product_id, -quantity, balance, reason, reference, user_id)
+    _sync_identity_map(db, product_id, balance)
+    return balance
+
+
+def add_stock(db: Session, product_id: int, quantity: int, reason: str,
+              reference=None, user_id: Optional[int] = None) -> int:
+    """Atomically put quantity back into stock"""
+    balance = _apply(db, product_id, quantity, [])
+    if balance is None:
+        raise UnknownProduct(product_id)
+    _record(db, product_id, quantity, balance, reason, reference, user_id)
+    _sync_identity_map(db, product_id, balance)
+    return balance
+
+
+def set_stock(db: Session, product_id: int, quantity: int, reason: str = "ADJUSTMENT",
+              reference=None, user_id: Optional[int] = None) -> int:
+    """Overwrite the balance (stock count correction), recording the difference"""
+    current = db.execute(
+        select(Product.stock_quantity).where(Product.id == product_id).with_for_update()
+    ).first()
+    if current is None:
+        raise UnknownProduct(product_id)
+    change = quantity - (current[0] or 0)
+    db.execute(
+        update(Product).where(Product.id == product_id).values(
+            stock_quantity=quantity
+        ).execution_options(synchronize_session=False)
+    )
+    _record(db, product_id, change, quantity, reason, reference, user_id)
+    _sync_identity_map(db, product_id, quantity)
+    return quantity
+
+
+def record_opening_stock(db: Session, product_id: int, quantity: Optional[int],
+                         user_id: Optional[int] = None) -> None:
+    """Ledger entry for the stock a new product starts with (already on the row)"""
+    if quantity:
+        _record(db, product_id, quantity, quantity, "ADJUSTMENT", "OPENING", user_id)
+
+
+def take_snapshot(db: Session) -> int:
+    """Copy every product's balance into stock_snapshots; returns the number of rows"""
+    # Every ledger entry is written under its product's row lock, so FOR SHARE
+    # waits for in-flight stock changes to commit (their balances are then
+    # read) and holds new ones off until the caller commits. The ledger tip read
+    # afterwards therefore covers exactly the changes in these balances; a tip
+    # read alongside could include a committed id above one still in flight,
+    # and stock_at would skip that entry forever.
+    rows = db.execute(
+        select(Product.id, Product.stock_quantity).order_by(Product.id).with_for_update(read=True)
+    ).all()
+    last_entry_id = db.execute(
+        select(func.coalesce(func.max(StockLedgerEntry.id), 0))
+    ).scalar()
+    taken_at = datetime.utcnow()
+    db.add_all([
+        StockSnapshot(
+            product_id=product_id,
+            stock_quantity=stock or 0,
+            last_entry_id=last_entry_id,
+            taken_at=taken_at
+        )
+        for product_id, stock in rows
+    ])
+    return len(rows)
+
+
+def stock_at(db: Session, product_id: int, moment: datetime) -> int:
+    """
+    Stock of a product at a past moment: latest earlier snapshot plus later
+    ledger entries. Before its first snapshot a product's stock is the sum of
+    its entries, starting with the opening entry written when it was created
+    (by scripts/migrations/add_opening_stock_entries.py for older products).
+    """
+    snapshot = db.query(StockSnapshot).filter(
+        StockSnapshot.product_id == product_id,
+        StockSnapshot.taken_at <= moment
+    ).order_by(StockSnapshot.taken_at.desc(), StockSnapshot.id.desc()).first()
+
+    entries = db.query(func.coalesce(func.sum(StockLedgerEntry.change), 0)).filter(
+        StockLedgerEntry.product_id == product_id,
+        StockLedgerEntry.created_at <= moment
+    )
+    if snapshot is None:
+        return int(entries.scalar())
+    return snapshot.stock_quantity + int(
+        entries.filter(StockLedgerEntry.id > snapshot.last_entry_id).scalar()
+    )
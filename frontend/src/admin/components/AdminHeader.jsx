@@ -2,6 +2,7 @@ import React, { useState, useRef, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../../contexts/AuthContext';
 import { apiRequest } from '../../utils/api';
+import { useNotificationStream } from '../../hooks/useNotificationStream';
 
 /**
  * AdminHeader - Single admin dashboard header component
@@ -53,33 +54,41 @@ export default function AdminHeader({ onMenuToggle, role }) {
   }, []);
 
   // Fetch notifications
-  useEffect(() => {
-    const fetchNotifications = async () => {
-      try {
-        const response = await apiRequest('/api/notifications/my-notifications');
-        
-        // Handle both formats: direct array or {data: array}
-        const notificationsData = response?.data || response;
-        
-        if (Array.isArray(notificationsData)) {
-          // Get more notifications (up to 20 for split view)
-          setNotifications(notificationsData.slice(0, 20));
-          setUnreadCount(notificationsData.filter(n => !n.is_read).length);
-        } else {
-          setNotifications([]);
-          setUnreadCount(0);
-        }
-      } catch (error) {
-        // Silently handle notification errors
+  const fetchNotifications = async () => {
+    try {
+      // Get more notifications (up to 20 for split view); badge uses the server counter
+      const [feed, counter] = await Promise.all([
+        apiRequest('/api/notifications/feed?limit=20'),
+        apiRequest('/api/notifications/unread-count')
+      ]);
+      
+      if (Array.isArray(feed?.items)) {
+        setNotifications(feed.items);
+        setUnreadCount(counter?.unread_count || 0);
+      } else {
         setNotifications([]);
         setUnreadCount(0);
       }
-    };
+    } catch (error) {
+      // Silently handle notification errors
+      setNotifications([]);
+      setUnreadCount(0);
+    }
+  };
+
+  // Initial load, then new notifications arrive over the push stream
+  useEffect(() => {
     fetchNotifications();
-    const interval = setInterval(fetchNotifications, 30000);
-    return () => clearInterval(interval);
   }, []);
 
+  useNotificationStream(
+    (notification) => {
+      setNotifications(prev => [notification, ...prev].slice(0, 20));
+      setUnreadCount(prev => prev + 1);
+    },
+    { onFallbackPoll: () => fetchNotifications(), fallbackInterval: 30000 }
+  );
+
   // Search with debounce - Role-based search
   useEffect(() => {
     if (searchQuery.length < 2) {
@@ -3,6 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../../contexts/AuthContext';
 import { apiRequest } from '../../utils/api';
 import { useNotificationRouter } from '../../hooks/useNotificationRouter';
+import { useNotificationStream } from '../../hooks/useNotificationStream';
 
 /**
  * ADMIN TOP BAR - Enhanced (SINGLE INSTANCE ONLY)
@@ -23,29 +24,39 @@ export default function AdminTopBar({ onMenuToggle }) {
   const [profileOpen, setProfileOpen] = useState(false);
   const [userMenuOpen, setUserMenuOpen] = useState(false);
   const [notifications, setNotifications] = useState([]);
+  const [unreadCount, setUnreadCount] = useState(0);
   const [loading, setLoading] = useState(false);
   
   const searchRef = useRef(null);
 
-  // Fetch real notifications
+  // Fetch real notifications once, then receive new ones over the push stream
   useEffect(() => {
     fetchNotifications();
-    const interval = setInterval(fetchNotifications, 30000); // Refresh every 30s
-    return () => clearInterval(interval);
   }, []);
 
+  useNotificationStream(
+    (notification) => {
+      setNotifications(prev => [notification, ...prev].slice(0, 10));
+      setUnreadCount(prev => prev + 1);
+    },
+    { onFallbackPoll: () => fetchNotifications(), fallbackInterval: 30000 }
+  );
+
   const fetchNotifications = async () => {
     try {
-      const data = await apiRequest('/api/notifications/my-notifications');
-      setNotifications(data.slice(0, 10)); // Top 10
+      const [feed, counter] = await Promise.all([
+        apiRequest('/api/notifications/feed?limit=10'), // Top 10
+        apiRequest('/api/notifications/unread-count')
+      ]);
+      setNotifications(feed.items || []);
+      setUnreadCount(counter.unread_count || 0);
     } catch (error) {
       // Silently handle notification errors
       setNotifications([]);
+      setUnreadCount(0);
     }
   };
 
-  const unreadCount = notifications.filter(n => !n.read_status).length;
-
   // Search functionality with predictions
   useEffect(() => {
     if (searchQuery.length < 2) {
@@ -123,10 +134,12 @@ export default function AdminTopBar({ onMenuToggle }) {
 
   const markAsRead = async (notificationId) => {
     try {
+      const wasUnread = notifications.some(n => n.id === notificationId && !n.read_status);
       await apiRequest(`/api/notifications/${notificationId}/read`, { method: 'PUT' });
       setNotifications(prev => 
         prev.map(n => n.id === notificationId ? { ...n, read_status: true } : n)
       );
+      if (wasUnread) setUnreadCount(prev => Math.max(prev - 1, 0));
     } catch (error) {
       console.error('Failed to mark as read:', error);
     }
@@ -134,8 +147,9 @@ export default function AdminTopBar({ onMenuToggle }) {
 
   const markAllAsRead = async () => {
     try {
-      await apiRequest('/api/notifications/read-all', { method: 'PUT' });
+      const result = await apiRequest('/api/notifications/read-all', { method: 'PUT' });
       setNotifications(prev => prev.map(n => ({ ...n, read_status: true })));
+      setUnreadCount(result?.unread_count || 0);
     } catch (error) {
       console.error('Failed to mark all as read:', error);
     }
@@ -4,6 +4,7 @@ import { FiSearch, FiBell, FiShoppingCart, FiMenu, FiX, FiChevronDown, FiChevron
 import { useAuth } from '../contexts/AuthContext.jsx'
 import { apiRequest } from '../utils/api.js'
 import { useNotificationRouter } from '../hooks/useNotificationRouter'
+import { useNotificationStream } from '../hooks/useNotificationStream'
 import Notifications from './Notifications.jsx'
 
 const navItems = [
@@ -37,22 +38,30 @@ export default function Header({ showNotificationPanel, setShowNotificationPanel
   useEffect(() => {
     if (isAuthenticated && user) {
       fetchNotifications()
-      // Poll every 60 seconds
-      const interval = setInterval(fetchNotifications, 60000)
-      return () => clearInterval(interval)
     }
   }, [isAuthenticated, user])
 
+  // New notifications are pushed; polling only runs if the stream is unavailable
+  useNotificationStream(
+    (notification) => {
+      setNotifications(prev => [notification, ...prev])
+      setAllNotifications(prev => [notification, ...prev])
+      setUnreadCount(prev => prev + 1)
+    },
+    { enabled: Boolean(isAuthenticated && user), onFallbackPoll: () => fetchNotifications() }
+  )
+
   const fetchNotifications = async () => {
     try {
-      const allNotifs = await apiRequest('/api/notifications/my-notifications')
-      
-      // Filter unread on frontend since API parameter might not work
-      const unreadNotifs = (allNotifs || []).filter(n => !n.read_status)
+      const [feed, counter] = await Promise.all([
+        apiRequest('/api/notifications/feed?limit=50'),
+        apiRequest('/api/notifications/unread-count')
+      ])
+      const allNotifs = feed?.items || []
       
-      setNotifications(unreadNotifs)
-      setAllNotifications(allNotifs || [])
-      setUnreadCount(unreadNotifs.length)
+      setNotifications(allNotifs.filter(n => !n.read_status))
+      setAllNotifications(allNotifs)
+      setUnreadCount(counter?.unread_count || 0)
     } catch (error) {
       console.error('Failed to fetch notifications:', error)
     }
@@ -0,0 +1,76 @@
+/**
+ * Notification Stream Hook
+ * Subscribes to /api/notifications/stream (Server-Sent Events) and calls
+ * onNotification for every new notification pushed by the backend.
+ *
+ * Falls back to polling `onFallbackPoll` when EventSource is unavailable or
+ * the stream is closed by the server (e.g. expired token).
+ */
+
+import { useEffect, useRef } from 'react';
+import { API_BASE_URL } from '../config/api';
+
+const getAuthToken = () => {
+  try {
+    const user = JSON.parse(localStorage.getItem('yamini_user') || '{}');
+    return user.token;
+  } catch (error) {
+    return null;
+  }
+};
+
+export const useNotificationStream = (onNotification, {
+  enabled = true,
+  onFallbackPoll = null,
+  fallbackInterval = 60000
+} = {}) => {
+  // Keep latest callbacks without reopening the stream on every render
+  const handlerRef = useRef(onNotification);
+  const pollRef = useRef(onFallbackPoll);
+  handlerRef.current = onNotification;
+  pollRef.current = onFallbackPoll;
+
+  useEffect(() => {
+    const token = getAuthToken();
+    if (!enabled || !token) return undefined;
+
+    let source = null;
+    let pollTimer = null;
+
+    const startPolling = () => {
+      if (pollTimer || !pollRef.current) return;
+      pollTimer = setInterval(() => pollRef.current && pollRef.current(), fallbackInterval);
+    };
+
+    if (typeof window === 'undefined' || !window.EventSource) {
+      startPolling();
+      return () => clearInterval(pollTimer);
+    }
+
+    source = new EventSource(
+      `${API_BASE_URL}/api/notifications/stream?token=${encodeURIComponent(token)}`
+    );
+
+    source.addEventListener('notification', (event) => {
+      try {
+        handlerRef.current(JSON.parse(event.data));
+      } catch (error) {
+        // Ignore malformed frames
+      }
+    });
+
+    source.onerror = () => {
+      // EventSource reconnects on its own unless the server closed the stream
+      if (source.readyState === EventSource.CLOSED) {
+        startPolling();
+      }
+    };
+
+    return () => {
+      source.close();
+      clearInterval(pollTimer);
+    };
+  }, [enabled, fallbackInterval]);
+};
+
+export default useNotificationStream;
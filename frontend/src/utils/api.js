@@ -179,6 +179,13 @@ export const productAPI = {
 // Notification API
 export const notificationAPI = {
   getMy: (unreadOnly = false) => apiRequest(`/api/notifications/my-notifications?unread_only=${unreadOnly}`),
+  getFeed: (limit = 20, cursor = null, unreadOnly = false) => apiRequest(
+    `/api/notifications/feed?limit=${limit}&unread_only=${unreadOnly}${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`
+  ),
+  getUnreadCount: () => apiRequest('/api/notifications/unread-count'),
+  markAllRead: () => apiRequest('/api/notifications/read-all', {
+    method: 'PUT',
+  }),
   create: (data) => apiRequest('/api/notifications', {
     method: 'POST',
     body: JSON.stringify(data),
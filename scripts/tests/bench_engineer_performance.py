@@ -0,0 +1,124 @@
+"""
+ENGINEER LEADERBOARD QUERY BENCHMARK
+Seeds an in-memory SQLite database with a growing number of service
+engineers and checks that /api/analytics/admin/engineer-performance runs
+the same number of SQL statements regardless of engineer count.
+Daily facts are backfilled first, as the scheduler does on its first run.
+
+Run from the repository root:
+    python scripts/tests/bench_engineer_performance.py
+"""
+
+import os
+import sys
+import time
+import random
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "backend")
+sys.path.insert(0, os.path.abspath(BACKEND_DIR))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import models
+from analytics_rollup import backfill
+from routers.analytics import get_all_engineers_performance
+from sla_utils import get_engineer_sla_stats
+
+ENGINEER_COUNTS = [5, 50, 250]
+JOBS_PER_ENGINEER = 20
+
+
+def seed(db, engineers):
+    now = datetime.utcnow()
+    admin = models.User(
+        username="admin", email="admin@example.com", hashed_password="x",
+        full_name="Admin", role=models.UserRole.ADMIN
+    )
+    db.add(admin)
+    users = [
+        models.User(
+            username=f"eng{i}", email=f"eng{i}@example.com", hashed_password="x",
+            full_name=f"Engineer {i}", role=models.UserRole.SERVICE_ENGINEER
+        )
+        for i in range(engineers)
+    ]
+    db.add_all(users)
+    db.flush()
+
+    for user in users:
+        for j in range(JOBS_PER_ENGINEER):
+            complaint = models.Complaint(
+                ticket_no=f"T{user.id}-{j}",
+                customer_name="Customer",
+                phone="0000000000",
+                fault_description="Test",
+                priority=random.choice(["NORMAL", "URGENT", "CRITICAL"]),
+                status=random.choice(["ASSIGNED", "IN_PROGRESS", "COMPLETED"]),
+                assigned_to=user.id,
+                sla_breach_sent=random.random() < 0.2,
+                created_at=now - timedelta(days=random.randint(0, 25))
+            )
+            db.add(complaint)
+            db.flush()
+            if random.random() < 0.5:
+                db.add(models.Feedback(
+                    service_request_id=complaint.id,
+                    rating=random.randint(1, 5),
+                    created_at=now - timedelta(days=random.randint(0, 25))
+                ))
+        for day in range(0, 30, 2):
+            db.add(models.Attendance(
+                employee_id=user.id,
+                date=now - timedelta(days=day),
+                attendance_date=(now - timedelta(days=day)).date(),
+                status="Present"
+            ))
+    db.commit()
+    return admin
+
+
+def run(engineers):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    models.Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    admin = seed(db, engineers)
+    backfill(db)
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    started = time.perf_counter()
+    result = get_all_engineers_performance(
+        start_date=None, end_date=None, engineer_id=None, priority=None,
+        current_user=admin, db=db
+    )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    event.remove(engine, "before_cursor_execute", listener)
+
+    # Spot-check SLA figures against the per-engineer helper
+    sample = result["engineers"][0]
+    start = datetime.fromisoformat(result["period"]["start_date"])
+    end = datetime.fromisoformat(result["period"]["end_date"])
+    expected = get_engineer_sla_stats(db, sample["engineer_id"], start, end)
+    assert sample["sla_breaches"] == expected["sla_breached"]
+    assert sample["sla_compliance"] == expected["compliance_percentage"]
+
+    db.close()
+    return result["total_engineers"], len(statements), elapsed_ms
+
+
+if __name__ == "__main__":
+    random.seed(7)
+    counts = set()
+    for engineers in ENGINEER_COUNTS:
+        total, queries, elapsed_ms = run(engineers)
+        counts.add(queries)
+        print(f"{total:>4} engineers: {queries} queries, {elapsed_ms:.1f} ms")
+    print("✅ Query count is constant" if len(counts) == 1 else "❌ Query count grows with engineers")
+    sys.exit(0 if len(counts) == 1 else 1)
@@ -0,0 +1,65 @@
+"""
+TAMIL STEMMING CHECK
+Checks that the chatbot's BM25 tokenizer reduces a Tamil base word and its
+inflected forms to the same term, and that a knowledge entry titled with
+the base word is found by a query using an inflected form.
+
+Run from the repository root:
+    python scripts/tests/check_tamil_stemming.py
+"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "backend")
+sys.path.insert(0, os.path.abspath(BACKEND_DIR))
+
+from services.lexical_search import BM25Index, tokenize
+
+# Base word -> inflected forms that must share its term
+WORD_FORMS = {
+    "சேவை": ["சேவைகள்", "சேவைகளுக்கு", "சேவையை", "சேவையில்", "சேவைக்கு", "சேவையின்", "சேவையும்"],
+    "விலை": ["விலைக்கு", "விலையை", "விலையில்", "விலைகள்"],
+    "வேலை": ["வேலைக்கு", "வேலையை", "வேலைகள்"],
+    "பிரிண்டர்": ["பிரிண்டருக்கு", "பிரிண்டரில்", "பிரிண்டரின்", "பிரிண்டர்கள்", "பிரிண்டரோடு"],
+    "வருடம்": ["வருடத்தில்", "வருடத்திற்கு", "வருடத்தின்"],
+    "கணக்கு": ["கணக்குக்கு", "கணக்குகள்"],
+}
+
+
+def check_forms():
+    failures = []
+    for base, forms in WORD_FORMS.items():
+        expected = tokenize(base)
+        if expected != [base]:
+            failures.append(f"{base} -> {expected}")
+        for form in forms:
+            terms = tokenize(form)
+            if terms != expected:
+                failures.append(f"{form} -> {terms}, expected {expected}")
+    return failures
+
+
+def check_search():
+    index = BM25Index()
+    index.build([
+        {"id": 1, "title": "சேவை", "content": "", "category": "service",
+         "metadata": {}, "fields": {"title": "சேவை", "content": "அனைத்து பிரிண்டர் பழுது நீக்கம்"}},
+        {"id": 2, "title": "விலை", "content": "", "category": "pricing",
+         "metadata": {}, "fields": {"title": "விலை", "content": "டோனர் மற்றும் பாகங்கள்"}},
+    ])
+    failures = []
+    for query, doc_id in (("சேவைகளுக்கு", 1), ("சேவையை", 1), ("விலைக்கு", 2)):
+        results = index.search(query, top_k=1)
+        if not results or results[0]["id"] != doc_id:
+            failures.append(f"search {query!r} did not find document {doc_id}")
+    return failures
+
+
+if __name__ == "__main__":
+    failures = check_forms() + check_search()
+    for failure in failures:
+        print(f"  {failure}")
+    print("✅ Tamil base words and inflections share terms" if not failures
+          else f"❌ {len(failures)} Tamil stemming mismatches")
+    sys.exit(0 if not failures else 1)
@@ -0,0 +1,142 @@
+"""
+CONCURRENT ORDER APPROVAL STRESS TEST
+Many admins approve orders for the same product at once, including
+duplicate approvals of the same order. Checks that stock never goes
+negative, every order is applied at most once and the stock ledger
+agrees with Product.stock_quantity.
+
+Uses a temporary SQLite file by default; point STRESS_DATABASE_URL at a
+scratch PostgreSQL database to exercise real row-level concurrency.
+
+Run from the repository root:
+    python scripts/tests/stress_stock_approvals.py
+"""
+
+import os
+import sys
+import random
+import tempfile
+import threading
+from collections import Counter
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "backend")
+sys.path.insert(0, os.path.abspath(BACKEND_DIR))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+import models
+import schemas
+from routers.orders import approve_order
+
+INITIAL_STOCK = 60
+ORDERS = 120
+WORKERS = 8
+
+
+def make_engine():
+    url = os.getenv("STRESS_DATABASE_URL")
+    if url:
+        return create_engine(url, pool_size=WORKERS, max_overflow=WORKERS)
+    path = os.path.join(tempfile.mkdtemp(), "stress.db")
+    return create_engine(
+        f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 60}
+    )
+
+
+def seed(Session):
+    db = Session()
+    admin = models.User(
+        username=f"admin{random.random()}", email=None, hashed_password="x",
+        full_name="Admin", role=models.UserRole.ADMIN
+    )
+    product = models.Product(name="Stress Printer", price=100, stock_quantity=INITIAL_STOCK)
+    db.add_all([admin, product])
+    db.flush()
+    orders = [
+        models.Order(
+            order_id=f"STRESS-{product.id}-{i}",
+            customer_name="Customer",
+            product_id=product.id,
+            product_name=product.name,
+            quantity=random.choice([1, 1, 2, 3]),
+            unit_price=100,
+            total_amount=100,
+            status="PENDING"
+        )
+        for i in range(ORDERS)
+    ]
+    db.add_all(orders)
+    db.commit()
+    ids = (admin.id, product.id, [o.id for o in orders])
+    db.close()
+    return ids
+
+
+def run():
+    engine = make_engine()
+    models.Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    admin_id, product_id, order_ids = seed(Session)
+
+    # Every order is submitted twice, by different workers
+    work = order_ids + order_ids
+    random.shuffle(work)
+    lock = threading.Lock()
+    outcomes = Counter()
+
+    def worker():
+        db = Session()
+        admin = db.get(models.User, admin_id)
+        while True:
+            with lock:
+                if not work:
+                    break
+                order_id = work.pop()
+            try:
+                approve_order(order_id, schemas.OrderApprove(approved=True), db=db, current_user=admin)
+                result = "approved"
+            except HTTPException as e:
+                db.rollback()
+                result = "insufficient" if "Insufficient" in str(e.detail) else "not_pending"
+            with lock:
+                outcomes[result] += 1
+        db.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(WORKERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db = Session()
+    stock = db.get(models.Product, product_id).stock_quantity
+    approved_qty = db.query(func.coalesce(func.sum(models.Order.quantity), 0)).filter(
+        models.Order.product_id == product_id, models.Order.status == "APPROVED"
+    ).scalar()
+    entries = db.query(models.StockLedgerEntry).filter(
+        models.StockLedgerEntry.product_id == product_id
+    ).all()
+    per_order = Counter(e.reference for e in entries)
+    db.close()
+
+    print(f"Outcomes: {dict(outcomes)}")
+    print(f"Stock: {INITIAL_STOCK} -> {stock}, approved quantity {approved_qty}, ledger entries {len(entries)}")
+
+    checks = [
+        ("stock never negative", stock >= 0 and all(e.balance_after >= 0 for e in entries)),
+        ("stock matches approved orders", stock == INITIAL_STOCK - approved_qty),
+        ("ledger matches stock", INITIAL_STOCK + sum(e.change for e in entries) == stock),
+        ("each order deducted once", all(count == 1 for count in per_order.values())),
+        ("every approval recorded", len(entries) == outcomes["approved"]),
+    ]
+    for name, ok in checks:
+        print(f"{'✅' if ok else '❌'} {name}")
+    return all(ok for _, ok in checks)
+
+
+if __name__ == "__main__":
+    random.seed(11)
+    sys.exit(0 if run() else 1)